@@ -0,0 +1,343 @@
+"""
+Asyncio image downloader.
+
+sequential_image_download and concurrent_image_download block a whole thread for every request in flight. Here all the
+downloads run as coroutines on a single thread, talking HTTP/1.1 over asyncio streams:
+
+- at most max_concurrency downloads run at the same time - that many worker coroutines pull jobs from the input, so
+neither the tasks nor the memory grow with the number of URLs,
+- a semaphore per host caps the connections to every host at max_per_host, the connections are kept alive and reused,
+- the response bodies are written to the files chunk by chunk as they arrive, nothing is buffered whole, and the file
+of a failed download is removed,
+- connecting and every read from the connection time out (connect_timeout, read_timeout), so a stalled server can not
+hang a download forever.
+
+download_all returns the aggregate statistics (bytes, time, throughput and the failed downloads).
+"""
+import asyncio
+import os
+import ssl
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from concurrent_image_download.pooled_image_download import (
+    CHUNK_SIZE,
+    CONNECT_TIMEOUT,
+    MAX_REDIRECTS,
+    READ_TIMEOUT,
+    REDIRECT_STATUSES,
+    DownloadError,
+    HostKey,
+    split_url,
+)
+
+NUMBER_OF_IMAGES = 1000
+MAX_CONCURRENCY = 1000
+MAX_PER_HOST = 10
+USER_AGENT = 'Concurrency-course-downloader'
+# Responses to these requests never have a body.
+BODYLESS_STATUSES = (204, 304)
+
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+@dataclass
+class DownloadStatistics:
+    downloads: int = 0
+    bytes_downloaded: int = 0
+    elapsed: float = 0.0
+    failures: List[Tuple[str, BaseException]] = field(default_factory=list)
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_downloaded / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass
+class Response:
+    version: str
+    status: int
+    reason: str
+    headers: Dict[str, str]
+
+    @property
+    def has_body(self) -> bool:
+        return self.status >= 200 and self.status not in BODYLESS_STATUSES
+
+    @property
+    def keep_alive(self) -> bool:
+        """
+        Whether the connection can carry another request once the body was read. A body which is not delimited by a
+        Content-Length or chunked encoding ends when the server closes the connection.
+        """
+        if self.version != 'HTTP/1.1' or self.headers.get('connection', '').lower() == 'close':
+            return False
+        return not self.has_body or 'content-length' in self.headers or self.chunked
+
+    @property
+    def chunked(self) -> bool:
+        return self.headers.get('transfer-encoding', '').lower() == 'chunked'
+
+
+async def read_response_head(reader: asyncio.StreamReader, read_timeout: Optional[float] = None) -> Response:
+    status_line = await asyncio.wait_for(reader.readline(), read_timeout)
+    if not status_line:
+        raise ConnectionResetError('The server closed the connection.')
+    version, status, *reason = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+
+    headers = {}
+    while True:
+        line = await asyncio.wait_for(reader.readline(), read_timeout)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return Response(version=version, status=int(status), reason=reason[0] if reason else '', headers=headers)
+
+
+async def iterate_body(
+    reader: asyncio.StreamReader,
+    response: Response,
+    chunk_size: int = CHUNK_SIZE,
+    read_timeout: Optional[float] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Yield the body of the response as it arrives, every single read fails with a TimeoutError after read_timeout.
+    """
+    if not response.has_body:
+        return
+
+    async def read_line() -> bytes:
+        return await asyncio.wait_for(reader.readline(), read_timeout)
+
+    async def read_exactly(size: int) -> bytes:
+        return await asyncio.wait_for(reader.readexactly(size), read_timeout)
+
+    if response.chunked:
+        while True:
+            size = int((await read_line()).split(b';')[0], 16)
+            if size == 0:
+                # Skip the trailer headers.
+                while await read_line() not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            while size:
+                data = await read_exactly(min(chunk_size, size))
+                size -= len(data)
+                yield data
+            await read_exactly(2)
+
+    elif 'content-length' in response.headers:
+        remaining = int(response.headers['content-length'])
+        while remaining:
+            data = await read_exactly(min(chunk_size, remaining))
+            remaining -= len(data)
+            yield data
+
+    else:
+        while True:
+            data = await asyncio.wait_for(reader.read(chunk_size), read_timeout)
+            if not data:
+                return
+            yield data
+
+
+class AsyncImageDownloader:
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENCY,
+        max_per_host: int = MAX_PER_HOST,
+        chunk_size: int = CHUNK_SIZE,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        connect_timeout: Optional[float] = CONNECT_TIMEOUT,
+        read_timeout: Optional[float] = READ_TIMEOUT,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.chunk_size = chunk_size
+        # Loading the CA certificates is expensive, all the TLS connections share one context.
+        self.ssl_context = ssl_context if ssl_context is not None else ssl.create_default_context()
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        # Only ever touched from the event loop thread, so they need no locks. They belong to the loop in self.loop.
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.host_semaphores: Dict[HostKey, asyncio.Semaphore] = {}
+        self.idle_connections: Dict[HostKey, List[Connection]] = defaultdict(list)
+        self.connections_opened = 0
+
+    def _bind(self, loop: asyncio.AbstractEventLoop):
+        if self.loop is loop:
+            return
+        if self.loop is not None and not self.loop.is_closed():
+            raise RuntimeError('The downloader is bound to another event loop which is still open.')
+        self.loop = loop
+        # The semaphores and the connections of the previous loop can not be used from this one.
+        self.host_semaphores.clear()
+        self.idle_connections.clear()
+
+    def _semaphore_for(self, key: HostKey) -> asyncio.Semaphore:
+        semaphore = self.host_semaphores.get(key)
+        if semaphore is None:
+            semaphore = self.host_semaphores[key] = asyncio.Semaphore(self.max_per_host)
+        return semaphore
+
+    async def _open_connection(self, key: HostKey) -> Connection:
+        scheme, host, port = key
+        ssl_context = self.ssl_context if scheme == 'https' else None
+        connection = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context, limit=self.chunk_size), self.connect_timeout
+        )
+        self.connections_opened += 1
+        return connection
+
+    def _idle_connection(self, key: HostKey) -> Optional[Connection]:
+        idle_connections = self.idle_connections[key]
+        while idle_connections:
+            reader, writer = idle_connections.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer
+            writer.close()
+        return None
+
+    @staticmethod
+    def _request(key: HostKey, path: str) -> bytes:
+        scheme, host, port = key
+        host_header = host if port == (443 if scheme == 'https' else 80) else f'{host}:{port}'
+        return (
+            f'GET {path} HTTP/1.1\r\nHost: {host_header}\r\nUser-Agent: {USER_AGENT}\r\nAccept: */*\r\n'
+            f'Connection: keep-alive\r\n\r\n'
+        ).encode('latin-1')
+
+    async def _request_on(self, connection: Connection, key: HostKey, path: str) -> Response:
+        reader, writer = connection
+        try:
+            writer.write(self._request(key, path))
+            await asyncio.wait_for(writer.drain(), self.read_timeout)
+            return await read_response_head(reader, self.read_timeout)
+        except BaseException:
+            writer.close()
+            raise
+
+    async def _send(self, key: HostKey, path: str) -> Tuple[Connection, Response]:
+        connection = self._idle_connection(key)
+        if connection is not None:
+            try:
+                return connection, await self._request_on(connection, key, path)
+            except (ConnectionResetError, BrokenPipeError):
+                # The server closed the idle connection in the meantime, try again on a fresh one.
+                pass
+
+        connection = await self._open_connection(key)
+        return connection, await self._request_on(connection, key, path)
+
+    async def _get(self, url: str, file_name: str) -> Tuple[Optional[str], int]:
+        """
+        Request the url and stream a 200 response to the file, which is removed again if the download fails. Return the
+        location to follow for a redirect and the number of bytes written.
+        """
+        key, path = split_url(url)
+        async with self._semaphore_for(key):
+            (reader, writer), response = await self._send(key, path)
+            try:
+                bytes_written = 0
+                if response.status == 200:
+                    try:
+                        with open(file_name, 'wb') as image_file:
+                            async for data in iterate_body(reader, response, self.chunk_size, self.read_timeout):
+                                image_file.write(data)
+                                bytes_written += len(data)
+                    except BaseException:
+                        # Do not leave a truncated image behind.
+                        if os.path.exists(file_name):
+                            os.remove(file_name)
+                        raise
+                else:
+                    # The body has to be consumed before the connection can be used again.
+                    async for _ in iterate_body(reader, response, self.chunk_size, self.read_timeout):
+                        pass
+            except BaseException:
+                writer.close()
+                raise
+
+            if response.keep_alive:
+                self.idle_connections[key].append((reader, writer))
+            else:
+                writer.close()
+
+        if response.status == 200:
+            return None, bytes_written
+        if response.status in REDIRECT_STATUSES and 'location' in response.headers:
+            return urljoin(url, response.headers['location']), 0
+        raise DownloadError(f'GET {url} failed with {response.status} {response.reason}')
+
+    async def download(self, url: str, file_name: str) -> int:
+        """
+        Download url into file_name following redirects, return the number of bytes written.
+        """
+        self._bind(asyncio.get_running_loop())
+        for _ in range(MAX_REDIRECTS + 1):
+            location, bytes_written = await self._get(url, file_name)
+            if location is None:
+                return bytes_written
+            url = location
+        raise DownloadError(f'Too many redirects, last location: {url}')
+
+    async def download_all(self, jobs: Iterable[Tuple[str, str]]) -> DownloadStatistics:
+        """
+        Download every (url, file name) pair. The jobs are pulled from the iterable only as the workers get to them, so
+        it can be a generator of any length.
+        """
+        statistics = DownloadStatistics()
+        jobs = iter(jobs)
+
+        async def worker():
+            for url, file_name in jobs:
+                try:
+                    # Awaited first, += would read the total before the await and lose the updates of other workers.
+                    bytes_written = await self.download(url, file_name)
+                    statistics.bytes_downloaded += bytes_written
+                    statistics.downloads += 1
+                # asyncio.TimeoutError is only an OSError from Python 3.11 on.
+                except (OSError, asyncio.TimeoutError, DownloadError, asyncio.IncompleteReadError, ValueError) as error:
+                    statistics.failures.append((url, error))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+        statistics.elapsed = time.perf_counter() - start
+        return statistics
+
+    async def close(self):
+        self._bind(asyncio.get_running_loop())
+        writers = [writer for connections in self.idle_connections.values() for _, writer in connections]
+        self.idle_connections.clear()
+        for writer in writers:
+            writer.close()
+        for writer in writers:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+async def main():
+    os.makedirs('temp', exist_ok=True)
+    downloader = AsyncImageDownloader()
+    try:
+        statistics = await downloader.download_all(
+            ('https://picsum.photos/400/200', f'temp/image-{i}.jpg') for i in range(NUMBER_OF_IMAGES)
+        )
+    finally:
+        await downloader.close()
+
+    print(f'Downloaded {statistics.downloads} images ({statistics.bytes_downloaded} bytes) in {statistics.elapsed}')
+    print(f'Throughput: {statistics.bytes_per_second / 1024:.1f} KiB/s')
+    print(f'Connections opened: {downloader.connections_opened}')
+    for url, error in statistics.failures:
+        print(f'Failed to download {url}: {error}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
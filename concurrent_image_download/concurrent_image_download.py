@@ -1,14 +1,32 @@
+"""
+Downloads the images on a thread each, through the shared download cache.
+
+Run it from the repository root with:
+python -m concurrent_image_download.concurrent_image_download
+"""
 import threading
-import urllib.request
 import time
+from typing import Optional
 
+from concurrent_image_download.download_cache import DownloadCache
+from concurrent_image_download.pooled_image_download import PooledImageDownloader
 
 NUMBER_OF_THREADS = 10
+CACHE_DIRECTORY = 'temp/.cache'
+
+# Shared by all the threads: its connections are reused between downloads, every download times out on connect and read
+# and transient failures are retried, resuming from the bytes already downloaded.
+downloader = PooledImageDownloader(max_workers=NUMBER_OF_THREADS)
+# Set up by main, repeated runs then only download the images which changed since the previous one.
+download_cache: Optional[DownloadCache] = None
 
 
 def download_image(image_path, file_name):
     print(f'Downloading image from: {image_path}')
-    urllib.request.urlretrieve(image_path, file_name)
+    if download_cache is not None:
+        download_cache.fetch(image_path, file_name)
+    else:
+        downloader.download(image_path, file_name)
     print('Completed Download')
 
 
@@ -18,25 +36,31 @@ def execute_thread(thread_number):
 
 
 def main():
+    global download_cache
+    download_cache = DownloadCache(CACHE_DIRECTORY, downloader=downloader)
     start = time.time()
-    # create an array to store references to our threads
-    threads = []
-
-    # create the threads first and append them to the array to have their references
-    for i in range(NUMBER_OF_THREADS):
-        thread = threading.Thread(target=execute_thread, kwargs={'thread_number': i})
-        threads.append(thread)
-        # This starts each thread
-        thread.start()
-        # Although it is tempting to put join() here as it looks like the loop below is redundant we must understand
-        # that the join() blocks until thread completes which means that each iteration of the loop would stop and wait
-        # for each thread to complete instead of starting them all at once - there would be no benefit to using
-        # threading with such an approach.
-
-    for thread in threads:
-        # calling join() on the thread blocks until it completes. Doing this in a loop makes sure that we stop execution
-        # of the further part of the code until all threads have completed their execution first.
-        thread.join()
+    try:
+        # create an array to store references to our threads
+        threads = []
+
+        # create the threads first and append them to the array to have their references
+        for i in range(NUMBER_OF_THREADS):
+            thread = threading.Thread(target=execute_thread, kwargs={'thread_number': i})
+            threads.append(thread)
+            # This starts each thread
+            thread.start()
+            # Although it is tempting to put join() here as it looks like the loop below is redundant we must
+            # understand that the join() blocks until thread completes which means that each iteration of the loop
+            # would stop and wait for each thread to complete instead of starting them all at once - there would be no
+            # benefit to using threading with such an approach.
+
+        for thread in threads:
+            # calling join() on the thread blocks until it completes. Doing this in a loop makes sure that we stop
+            # execution of the further part of the code until all threads have completed their execution first.
+            thread.join()
+    finally:
+        download_cache.close()
+        downloader.close()
 
     stop = time.time()
     total_time = stop - start
@@ -0,0 +1,10 @@
+import pytest
+
+from concurrent_image_download.image_server import ImageServer
+from test_support.http_server import serving
+
+
+@pytest.fixture
+def image_server():
+    with serving(ImageServer()) as server:
+        yield server
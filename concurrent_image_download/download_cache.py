@@ -0,0 +1,237 @@
+"""
+On-disk download cache keyed by URL.
+
+Downloading the same URLs on every run pays for all the bytes again. The cache keeps, for every URL, the ETag and
+Last-Modified of the last response and sends them back as If-None-Match / If-Modified-Since. A 304 Not Modified answer
+costs no body at all, the file is then restored from the cache.
+
+The payloads are stored content-addressed, by their SHA-256 digest, so identical images served under different URLs
+are stored once. The files handed out are hardlinks to the stored payloads (copies where hardlinks are not supported),
+which is why the payloads are made read-only - writing to a handed out file would change the cached copy.
+
+The index lives in an SQLite database next to the payloads. When the payloads grow above max_size the least recently
+used ones are evicted, together with the URLs pointing to them. Evicting a payload does not affect the files already
+handed out, they are links of their own.
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from concurrent_image_download.pooled_image_download import CHUNK_SIZE, DownloadError, PooledImageDownloader
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+DOWNLOADED = 'downloaded'
+REVALIDATED = 'revalidated'
+DEDUPLICATED = 'deduplicated'
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    digest: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+@dataclass
+class CacheStatistics:
+    downloaded: int = 0
+    revalidated: int = 0
+    deduplicated: int = 0
+    evictions: int = 0
+    bytes_downloaded: int = 0
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as payload_file:
+        for block in iter(lambda: payload_file.read(CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def link_or_copy(source: str, destination: str):
+    """
+    Put a hardlink to source at destination, replacing whatever was there atomically.
+    """
+    temporary_name = f'{destination}.{uuid.uuid4().hex}.tmp'
+    try:
+        os.link(source, temporary_name)
+    except OSError:
+        # A different file system, or one without hardlinks.
+        shutil.copyfile(source, temporary_name)
+    os.replace(temporary_name, destination)
+
+
+class DownloadCache:
+    def __init__(
+        self,
+        directory: str,
+        downloader: Optional[PooledImageDownloader] = None,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ):
+        self.directory = directory
+        self.downloader = downloader or PooledImageDownloader()
+        self.max_size = max_size
+        self.objects_directory = os.path.join(directory, 'objects')
+        self.temporary_directory = os.path.join(directory, 'tmp')
+        os.makedirs(self.objects_directory, exist_ok=True)
+        os.makedirs(self.temporary_directory, exist_ok=True)
+
+        # One connection shared by the threads, the lock keeps the index and the payload files consistent.
+        self.lock = threading.Lock()
+        self.database = sqlite3.connect(
+            os.path.join(directory, 'index.sqlite3'), check_same_thread=False, isolation_level=None
+        )
+        self.database.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY, digest TEXT NOT NULL, etag TEXT, last_modified TEXT
+            );
+            CREATE TABLE IF NOT EXISTS payloads (
+                digest TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used INTEGER NOT NULL
+            );
+            """
+        )
+        # Logical clock for the LRU order, wall clock timestamps can tie.
+        self.clock = self.database.execute('SELECT COALESCE(MAX(last_used), 0) FROM payloads').fetchone()[0]
+        self.statistics = CacheStatistics()
+
+    def payload_path(self, digest: str) -> str:
+        return os.path.join(self.objects_directory, digest[:2], digest)
+
+    def entry(self, url: str) -> Optional[CacheEntry]:
+        with self.lock:
+            row = self.database.execute(
+                'SELECT url, digest, etag, last_modified FROM entries WHERE url = ?', (url,)
+            ).fetchone()
+        return CacheEntry(*row) if row is not None else None
+
+    def size(self) -> int:
+        with self.lock:
+            return self.database.execute('SELECT COALESCE(SUM(size), 0) FROM payloads').fetchone()[0]
+
+    def _touch(self, digest: str, size: int):
+        self.clock += 1
+        self.database.execute(
+            'INSERT INTO payloads (digest, size, last_used) VALUES (?, ?, ?) '
+            'ON CONFLICT (digest) DO UPDATE SET last_used = excluded.last_used',
+            (digest, size, self.clock),
+        )
+
+    def _store(self, download_path: str) -> Tuple[str, bool]:
+        """
+        Move a downloaded file into the payloads, return its digest and whether an identical payload was stored already.
+        """
+        digest = file_digest(download_path)
+        payload_path = self.payload_path(digest)
+        with self.lock:
+            if os.path.exists(payload_path):
+                os.remove(download_path)
+                return digest, True
+            os.makedirs(os.path.dirname(payload_path), exist_ok=True)
+            os.chmod(download_path, 0o444)
+            os.replace(download_path, payload_path)
+        return digest, False
+
+    def _evict(self, keep_digest: str):
+        total_size = self.database.execute('SELECT COALESCE(SUM(size), 0) FROM payloads').fetchone()[0]
+        if total_size <= self.max_size:
+            return
+
+        rows = self.database.execute(
+            'SELECT digest, size FROM payloads WHERE digest != ? ORDER BY last_used', (keep_digest,)
+        ).fetchall()
+        for digest, size in rows:
+            if total_size <= self.max_size:
+                break
+            self.database.execute('DELETE FROM entries WHERE digest = ?', (digest,))
+            self.database.execute('DELETE FROM payloads WHERE digest = ?', (digest,))
+            try:
+                os.remove(self.payload_path(digest))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            self.statistics.evictions += 1
+
+    def _remove_download(self, download_path: str):
+        # The downloader streams into a .part file and renames it once complete, a failure can leave either behind.
+        for path in (download_path, f'{download_path}.part'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def fetch(self, url: str, file_name: str, revalidate: bool = True) -> str:
+        """
+        Put the current content of url at file_name, downloading it only when the cached copy is missing or stale.
+        Return how it was obtained: DOWNLOADED, REVALIDATED (304 Not Modified) or DEDUPLICATED (downloaded, but the
+        same payload was already cached for another URL). With revalidate=False the cached copy is not offered to the
+        server and the content is downloaded in full.
+        """
+        entry = self.entry(url) if revalidate else None
+        if entry is not None and not os.path.exists(self.payload_path(entry.digest)):
+            entry = None
+
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        download_path = os.path.join(self.temporary_directory, uuid.uuid4().hex)
+        # Bytes downloaded, nothing for a 304.
+        size = 0
+        try:
+            download = self.downloader.fetch(url, download_path, headers=headers)
+            if download.not_modified:
+                if entry is None:
+                    # Nothing cached to restore, a 304 is only a valid answer to the conditional headers.
+                    if not revalidate:
+                        raise DownloadError(f'GET {url} answered 304 Not Modified to an unconditional request')
+                    return self.fetch(url, file_name, revalidate=False)
+                digest, outcome = entry.digest, REVALIDATED
+            else:
+                size = os.path.getsize(download_path)
+                digest, deduplicated = self._store(download_path)
+                outcome = DEDUPLICATED if deduplicated else DOWNLOADED
+        finally:
+            # Stored payloads were moved away already, this only removes what a failed download left behind.
+            self._remove_download(download_path)
+
+        with self.lock:
+            payload_path = self.payload_path(digest)
+            if not os.path.exists(payload_path):
+                # Evicted while we were revalidating it, download it again without the conditional headers.
+                self.database.execute('DELETE FROM entries WHERE url = ?', (url,))
+            else:
+                if outcome == REVALIDATED:
+                    self.statistics.revalidated += 1
+                    # A 304 can carry new validators, the old ones would never match again.
+                    self.database.execute(
+                        'UPDATE entries SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) '
+                        'WHERE url = ?',
+                        (download.etag, download.last_modified, url),
+                    )
+                else:
+                    self.statistics.downloaded += 1
+                    self.statistics.deduplicated += outcome == DEDUPLICATED
+                    self.statistics.bytes_downloaded += size
+                    self.database.execute(
+                        'INSERT OR REPLACE INTO entries (url, digest, etag, last_modified) VALUES (?, ?, ?, ?)',
+                        (url, digest, download.etag, download.last_modified),
+                    )
+                self._touch(digest, os.path.getsize(payload_path))
+                link_or_copy(payload_path, file_name)
+                self._evict(keep_digest=digest)
+                return outcome
+        return self.fetch(url, file_name, revalidate=False)
+
+    def close(self):
+        with self.lock:
+            self.database.close()
@@ -0,0 +1,120 @@
+"""
+Local stand-in for the image host used by the tests, see the image_server fixture in conftest.py.
+"""
+import hashlib
+import time
+from typing import Dict, List, Set
+
+from test_support.http_server import LocalHTTPServer, QuietRequestHandler
+
+# Faults which can be queued for a path in ImageServer.faults, each one is used up by a single request.
+UNAVAILABLE = 'unavailable'
+TRUNCATE = 'truncate'
+STALL = 'stall'
+
+
+class ImageRequestHandler(QuietRequestHandler):
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append(self.path)
+            self.server.request_headers.append(dict(self.headers))
+            faults = self.server.faults.get(self.path)
+            fault = faults.pop(0) if faults else None
+
+        if self.path in self.server.redirects:
+            self.send_response(302)
+            self.send_header('Location', self.server.redirects[self.path])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if fault == UNAVAILABLE:
+            self.send_error(503)
+            return
+        if fault == STALL:
+            time.sleep(self.server.stall_time)
+
+        body = self.server.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        last_modified = self.server.last_modified.get(self.path)
+        if self.headers.get('If-None-Match') == etag or (
+            last_modified and self.headers.get('If-Modified-Since') == last_modified
+        ):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        start = self._range_start(etag)
+        if start is not None and start >= len(body):
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{len(body)}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if start is None:
+            self.send_response(200)
+            start = 0
+        else:
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('ETag', etag)
+        if last_modified:
+            self.send_header('Last-Modified', last_modified)
+        body = body[start:]
+
+        if self.path in self.server.chunked_paths:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk_start in range(0, len(body), 1000):
+                chunk = body[chunk_start:chunk_start + 1000]
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+            return
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if fault == TRUNCATE:
+            # Send half of the body and drop the connection.
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def _range_start(self, etag: str):
+        range_header = self.headers.get('Range')
+        if not range_header or not range_header.startswith('bytes=') or not range_header.endswith('-'):
+            return None
+        if self.headers.get('If-Range', etag) != etag:
+            return None
+        return int(range_header[len('bytes='):-1])
+
+
+class ImageServer(LocalHTTPServer):
+    """
+    Serves the bytes in files by path and counts the connections and requests.
+    """
+    def __init__(self):
+        super().__init__(ImageRequestHandler)
+        self.files: Dict[str, bytes] = {}
+        self.redirects: Dict[str, str] = {}
+        # Paths served with Transfer-Encoding: chunked instead of a Content-Length.
+        self.chunked_paths: Set[str] = set()
+        # Last-Modified dates of the paths, only the paths listed here send the header.
+        self.last_modified: Dict[str, str] = {}
+        self.faults: Dict[str, List[str]] = {}
+        self.stall_time = 1.0
+        self.requests: List[str] = []
+        self.request_headers: List[Dict[str, str]] = []
+        self.connections = 0
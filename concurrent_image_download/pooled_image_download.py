@@ -0,0 +1,378 @@
+"""
+Image downloader built on a bounded thread pool and keep-alive HTTP connections.
+
+concurrent_image_download starts a thread per image and urlretrieve opens a new TCP (and TLS) connection for every
+file. Here a fixed number of worker threads share a pool of persistent http.client connections, kept per host, so
+thousands of downloads go through at most max_workers connections to each host and the handshakes are paid only once
+per connection.
+
+Every download is bounded in time and survives transient failures:
+- connecting and every read from the socket time out (connect_timeout, read_timeout), so a stalled server can not hang
+a thread forever,
+- timeouts, dropped connections and 429/5xx responses are retried with exponential backoff (see RetryPolicy),
+- the body is streamed into a file_name.part file. A retry asks only for the missing bytes with a Range request, guarded
+by If-Range so that a changed image is downloaded again in full, and the part file is renamed to file_name once
+complete, so file_name never holds a partial image. Responses without an ETag or Last-Modified header can not be
+resumed safely, they are downloaded again from the start.
+"""
+import http.client
+import os
+import random
+import shutil
+import socket
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from tracing.trace_sink import get_tracer
+
+tracer = get_tracer(__name__)
+
+NUMBER_OF_IMAGES = 100
+NUMBER_OF_WORKERS = 10
+# Size of the blocks copied from the response to the file.
+CHUNK_SIZE = 64 * 1024
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 30.0
+
+HostKey = Tuple[str, str, int]
+
+
+class DownloadError(Exception):
+    pass
+
+
+class RetryableDownloadError(DownloadError):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Failures worth another attempt, timeouts included (socket.timeout is an alias of TimeoutError from Python 3.10 on).
+RETRYABLE_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    socket.timeout,
+    socket.gaierror,
+    http.client.HTTPException,
+    RetryableDownloadError,
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    The n-th retry waits backoff * 2^n seconds, capped at max_backoff and scaled by a random factor between 0.5 and 1
+    so that the downloads which failed together do not all retry at the same moment.
+    """
+    attempts: int = 5
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+
+    def delay(self, retry: int) -> float:
+        return min(self.max_backoff, self.backoff * 2 ** retry) * random.uniform(0.5, 1.0)
+
+
+class ConnectionPool:
+    """
+    Idle keep-alive connections per (scheme, host, port).
+
+    A connection is handed out to one thread at a time and returned once its response has been read to the end, so the
+    next request can reuse it. At most max_idle_per_host idle connections are kept for each host, the rest are closed.
+    """
+    def __init__(
+        self,
+        max_idle_per_host: int = NUMBER_OF_WORKERS,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+    ):
+        self.max_idle_per_host = max_idle_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.lock = threading.Lock()
+        self.idle_connections: Dict[HostKey, List[http.client.HTTPConnection]] = defaultdict(list)
+        self.connections_opened = 0
+
+    def _connect(self, connection: http.client.HTTPConnection):
+        # http.client has a single timeout, used for connecting and then for every socket operation. Connect with one
+        # and switch the socket over to the other.
+        connection.connect()
+        connection.sock.settimeout(self.read_timeout)
+        with self.lock:
+            self.connections_opened += 1
+
+    def _new_connection(self, key: HostKey) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(host, port, timeout=self.connect_timeout)
+        self._connect(connection)
+        return connection
+
+    def reconnect(self, connection: http.client.HTTPConnection):
+        """
+        Replace the socket of a connection which went stale with a new one.
+        """
+        connection.close()
+        self._connect(connection)
+
+    @contextmanager
+    def connection(self, key: HostKey) -> Iterator[Tuple[http.client.HTTPConnection, bool]]:
+        """
+        Yield a connection to the host and whether it is a reused one. The connection goes back to the pool unless the
+        block raised (its state is unknown then) or the server asked to close it.
+        """
+        with self.lock:
+            idle_connections = self.idle_connections[key]
+            connection = idle_connections.pop() if idle_connections else None
+        reused = connection is not None
+        if connection is None:
+            connection = self._new_connection(key)
+
+        try:
+            yield connection, reused
+        except BaseException:
+            connection.close()
+            raise
+
+        with self.lock:
+            # http.client drops the socket when the response said Connection: close.
+            if connection.sock is not None and len(self.idle_connections[key]) < self.max_idle_per_host:
+                self.idle_connections[key].append(connection)
+                return
+        connection.close()
+
+    def get(
+        self, connection: http.client.HTTPConnection, reused: bool, path: str, headers: Dict[str, str]
+    ) -> http.client.HTTPResponse:
+        """
+        Send a GET request on a connection handed out by connection() and return the response.
+        """
+        try:
+            connection.request('GET', path, headers=headers)
+            return connection.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            if not reused:
+                raise
+        # The server closed the idle connection in the meantime, try again once on a fresh one.
+        self.reconnect(connection)
+        connection.request('GET', path, headers=headers)
+        return connection.getresponse()
+
+    def close(self):
+        with self.lock:
+            idle_connections = [
+                connection for connections in self.idle_connections.values() for connection in connections
+            ]
+            self.idle_connections.clear()
+        for connection in idle_connections:
+            connection.close()
+
+
+def split_url(url: str) -> Tuple[HostKey, str]:
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise DownloadError(f'Unsupported URL: {url}')
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path = f'{path}?{parts.query}'
+    return (parts.scheme, parts.hostname, port), path
+
+
+@dataclass
+class PartialDownload:
+    """
+    The part file of a download and the validator (strong ETag or Last-Modified) of the bytes in it, kept across the
+    attempts so a retry can resume it, plus what the server said about the image.
+    """
+    part_name: str
+    validator: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    not_modified: bool = False
+
+    def offset(self) -> int:
+        if self.validator is None or not os.path.exists(self.part_name):
+            return 0
+        return os.path.getsize(self.part_name)
+
+    def discard(self):
+        self.validator = None
+        if os.path.exists(self.part_name):
+            os.remove(self.part_name)
+
+
+def content_range_start(response: http.client.HTTPResponse) -> Optional[int]:
+    # Content-Range: bytes 100-999/1000
+    content_range = response.getheader('Content-Range', '')
+    if not content_range.startswith('bytes ') or '-' not in content_range:
+        return None
+    return int(content_range[len('bytes '):].split('-', 1)[0])
+
+
+def content_range_length(response: http.client.HTTPResponse) -> Optional[int]:
+    # Content-Range: bytes */1000
+    length = response.getheader('Content-Range', '').rpartition('/')[2]
+    return int(length) if length.isdigit() else None
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Only the delay in seconds form, the HTTP date form is rare for 429 and 503 responses.
+    return float(value) if value and value.isdigit() else None
+
+
+class PooledImageDownloader:
+    def __init__(
+        self,
+        max_workers: int = NUMBER_OF_WORKERS,
+        connect_timeout: Optional[float] = CONNECT_TIMEOUT,
+        read_timeout: Optional[float] = READ_TIMEOUT,
+        retry_policy: RetryPolicy = RetryPolicy(),
+        connection_pool: Optional[ConnectionPool] = None,
+    ):
+        self.max_workers = max_workers
+        self.retry_policy = retry_policy
+        self.connection_pool = connection_pool or ConnectionPool(
+            max_idle_per_host=max_workers, connect_timeout=connect_timeout, read_timeout=read_timeout
+        )
+
+    def _get(self, url: str, partial_download: PartialDownload, headers: Dict[str, str]) -> Optional[str]:
+        """
+        Request the url and stream the response into the part file, resuming it when the validator of the bytes already
+        in it is known. Return the location to follow for a redirect.
+        """
+        key, path = split_url(url)
+        offset = partial_download.offset()
+        if offset:
+            headers = {**headers, 'Range': f'bytes={offset}-', 'If-Range': partial_download.validator}
+
+        with self.connection_pool.connection(key) as (connection, reused):
+            response = self.connection_pool.get(connection, reused, path, headers)
+
+            if response.status == 200 or (response.status == 206 and content_range_start(response) == offset):
+                if response.status == 200:
+                    partial_download.etag = response.getheader('ETag')
+                    partial_download.last_modified = response.getheader('Last-Modified')
+                    # If-Range only accepts strong validators.
+                    etag = partial_download.etag
+                    strong_etag = etag if etag and not etag.startswith('W/') else None
+                    partial_download.validator = strong_etag or partial_download.last_modified
+                with open(partial_download.part_name, 'ab' if response.status == 206 else 'wb') as image_file:
+                    shutil.copyfileobj(response, image_file, CHUNK_SIZE)
+                # Reading in blocks, http.client signals a connection closed before the end of the body just by
+                # returning no more data, the length it still expected is left behind.
+                if response.length:
+                    raise http.client.IncompleteRead(b'', response.length)
+                return None
+
+            # The body has to be consumed before the connection can be used again.
+            response.read()
+
+        if response.status == 304:
+            # Answer to a conditional request (If-None-Match / If-Modified-Since), the copy of the caller is current.
+            # The validators may still have changed, a 304 carries the current ones.
+            partial_download.not_modified = True
+            partial_download.etag = response.getheader('ETag')
+            partial_download.last_modified = response.getheader('Last-Modified')
+            return None
+        if response.status == 206:
+            partial_download.discard()
+            raise RetryableDownloadError(f'GET {url} returned {response.getheader("Content-Range")} for {offset}-')
+        if response.status == 416:
+            if content_range_length(response) == offset:
+                # The part file was complete already, only the rename was missing.
+                return None
+            partial_download.discard()
+            raise RetryableDownloadError(f'GET {url} could not resume at byte {offset}')
+        if response.status in REDIRECT_STATUSES and response.getheader('Location'):
+            return urljoin(url, response.getheader('Location'))
+        if response.status in RETRYABLE_STATUSES:
+            raise RetryableDownloadError(
+                f'GET {url} failed with {response.status} {response.reason}',
+                retry_after=parse_retry_after(response.getheader('Retry-After')),
+            )
+        raise DownloadError(f'GET {url} failed with {response.status} {response.reason}')
+
+    def _fetch(self, url: str, partial_download: PartialDownload, headers: Dict[str, str]):
+        for _ in range(MAX_REDIRECTS + 1):
+            location = self._get(url, partial_download, headers)
+            if location is None:
+                return
+            url = location
+        raise DownloadError(f'Too many redirects, last location: {url}')
+
+    def fetch(self, url: str, file_name: str, headers: Optional[Dict[str, str]] = None) -> PartialDownload:
+        """
+        Download url into file_name following redirects and retrying transient failures, sending the extra request
+        headers (e.g. the conditional If-None-Match). file_name is left untouched when the server answers
+        304 Not Modified, check not_modified of the returned download.
+        """
+        # A part file left behind by an earlier run has no validator, so it is downloaded again in full - it might
+        # hold the beginning of a different image.
+        partial_download = PartialDownload(part_name=f'{file_name}.part')
+        for attempt in range(self.retry_policy.attempts):
+            try:
+                self._fetch(url, partial_download, headers or {})
+                break
+            except RETRYABLE_ERRORS as error:
+                if attempt + 1 == self.retry_policy.attempts:
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                if isinstance(error, RetryableDownloadError) and error.retry_after is not None:
+                    delay = max(delay, min(error.retry_after, self.retry_policy.max_backoff))
+                tracer.debug('Retrying %s in %.2fs after: %r', url, delay, error)
+                time.sleep(delay)
+
+        if partial_download.not_modified:
+            partial_download.discard()
+        else:
+            os.replace(partial_download.part_name, file_name)
+        return partial_download
+
+    def download(self, url: str, file_name: str) -> str:
+        """
+        Download url into file_name following redirects and retrying transient failures, return file_name.
+        """
+        self.fetch(url, file_name)
+        return file_name
+
+    def download_all(self, jobs: Iterable[Tuple[str, str]]) -> List[str]:
+        """
+        Download every (url, file name) pair, at most max_workers at a time. The first failure is raised once all the
+        downloads are done.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.download, url, file_name) for url, file_name in jobs]
+        return [future.result() for future in futures]
+
+    def close(self):
+        self.connection_pool.close()
+
+
+def main():
+    os.makedirs('temp', exist_ok=True)
+    start = time.time()
+
+    downloader = PooledImageDownloader()
+    try:
+        downloader.download_all(
+            ('https://picsum.photos/400/200', f'temp/image-{i}.jpg') for i in range(NUMBER_OF_IMAGES)
+        )
+    finally:
+        downloader.close()
+
+    stop = time.time()
+    print(f'Downloaded {NUMBER_OF_IMAGES} images over {downloader.connection_pool.connections_opened} connections')
+    print(f'Total execution time: {stop - start}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,35 @@
-import urllib.request
+"""
+Downloads the images one after the other, through the download cache.
+
+Run it from the repository root with:
+python -m concurrent_image_download.sequential_image_download
+"""
 import time
 
+from concurrent_image_download.download_cache import DownloadCache
+from concurrent_image_download.pooled_image_download import PooledImageDownloader
 
 NUMBER_OF_IMAGES_TO_DOWNLOAD = 10
+CACHE_DIRECTORY = 'temp/.cache'
 
 
-def download_image(image_path, file_name):
+def download_image(image_path, file_name, download_cache: DownloadCache):
     print(f'Downloading image from: {image_path}')
-    urllib.request.urlretrieve(image_path, file_name)
+    download_cache.fetch(image_path, file_name)
 
 
 def main():
+    # Repeated runs only download the images which changed since the previous one.
+    downloader = PooledImageDownloader(max_workers=1)
+    download_cache = DownloadCache(CACHE_DIRECTORY, downloader=downloader)
     start = time.time()
-    for i in range(NUMBER_OF_IMAGES_TO_DOWNLOAD):
-        image_name = f'temp/image-{i}.jpg'
-        download_image('https://picsum.photos/400/200', image_name)
+    try:
+        for i in range(NUMBER_OF_IMAGES_TO_DOWNLOAD):
+            image_name = f'temp/image-{i}.jpg'
+            download_image('https://picsum.photos/400/200', image_name, download_cache)
+    finally:
+        download_cache.close()
+        downloader.close()
 
     stop = time.time()
     total_time = stop - start
@@ -0,0 +1,134 @@
+import asyncio
+import time
+
+import pytest
+
+from concurrent_image_download.asyncio_image_download import AsyncImageDownloader
+from concurrent_image_download.image_server import STALL, TRUNCATE
+from concurrent_image_download.pooled_image_download import DownloadError
+
+
+def download_all(downloader, jobs):
+    async def run():
+        try:
+            return await downloader.download_all(jobs)
+        finally:
+            await downloader.close()
+
+    return asyncio.run(run())
+
+
+class TestAsyncImageDownloader:
+    def test_downloads_with_bounded_connections_per_host(self, image_server, tmp_path):
+        for i in range(200):
+            image_server.files[f'/image-{i}.jpg'] = bytes([i]) * (500 + i)
+        downloader = AsyncImageDownloader(max_concurrency=50, max_per_host=3, chunk_size=256)
+
+        statistics = download_all(
+            downloader, ((image_server.url(f'/image-{i}.jpg'), str(tmp_path / f'image-{i}.jpg')) for i in range(200))
+        )
+
+        assert statistics.downloads == 200
+        assert statistics.failures == []
+        assert statistics.bytes_downloaded == sum(500 + i for i in range(200))
+        assert statistics.bytes_per_second > 0
+        for i in range(200):
+            assert (tmp_path / f'image-{i}.jpg').read_bytes() == bytes([i]) * (500 + i)
+        assert image_server.connections <= 3
+        assert downloader.connections_opened == image_server.connections
+
+    def test_chunked_responses_and_redirects(self, image_server, tmp_path):
+        image_server.files['/id/1/400/200.jpg'] = bytes(range(256)) * 20
+        image_server.chunked_paths.add('/id/1/400/200.jpg')
+        image_server.redirects['/400/200'] = '/id/1/400/200.jpg'
+        image_server.files['/after.jpg'] = b'after'
+        downloader = AsyncImageDownloader(max_concurrency=1, max_per_host=1)
+
+        statistics = download_all(
+            downloader,
+            [
+                (image_server.url('/400/200'), str(tmp_path / 'image.jpg')),
+                (image_server.url('/after.jpg'), str(tmp_path / 'after.jpg')),
+            ],
+        )
+
+        assert statistics.downloads == 2
+        assert (tmp_path / 'image.jpg').read_bytes() == bytes(range(256)) * 20
+        assert (tmp_path / 'after.jpg').read_bytes() == b'after'
+        assert image_server.connections == 1
+
+    def test_failures_are_reported_without_stopping_other_downloads(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        downloader = AsyncImageDownloader(max_concurrency=2)
+
+        statistics = download_all(
+            downloader,
+            [
+                (image_server.url('/missing.jpg'), str(tmp_path / 'missing.jpg')),
+                (image_server.url('/image.jpg'), str(tmp_path / 'image.jpg')),
+            ],
+        )
+
+        assert statistics.downloads == 1
+        [(url, error)] = statistics.failures
+        assert url == image_server.url('/missing.jpg')
+        assert isinstance(error, DownloadError)
+
+    def test_stalled_reads_time_out(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        image_server.faults['/image.jpg'] = [STALL]
+        image_server.stall_time = 1.0
+        downloader = AsyncImageDownloader(max_concurrency=1, read_timeout=0.2)
+
+        start = time.perf_counter()
+        statistics = download_all(downloader, [(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg'))])
+
+        assert time.perf_counter() - start < image_server.stall_time
+        [(_, error)] = statistics.failures
+        assert isinstance(error, asyncio.TimeoutError)
+        assert not (tmp_path / 'image.jpg').exists()
+
+    def test_failed_download_removes_the_partial_file(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image' * 1000
+        image_server.faults['/image.jpg'] = [TRUNCATE]
+        downloader = AsyncImageDownloader(max_concurrency=1)
+
+        statistics = download_all(downloader, [(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg'))])
+
+        [(_, error)] = statistics.failures
+        assert isinstance(error, asyncio.IncompleteReadError)
+        assert not (tmp_path / 'image.jpg').exists()
+
+    def test_failed_connects_are_not_counted(self, tmp_path):
+        downloader = AsyncImageDownloader(max_concurrency=1)
+        # Nothing listens on port 9 of the loopback interface (discard), the connect is refused.
+        statistics = download_all(downloader, [('http://127.0.0.1:9/image.jpg', str(tmp_path / 'image.jpg'))])
+
+        assert len(statistics.failures) == 1
+        assert downloader.connections_opened == 0
+
+    def test_downloader_outlives_its_event_loop(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        # Two downloads waiting for one connection tie the host semaphore to the loop of the first run.
+        downloader = AsyncImageDownloader(max_concurrency=2, max_per_host=1)
+        jobs = [(image_server.url('/image.jpg'), str(tmp_path / f'image-{i}.jpg')) for i in range(2)]
+
+        first_run = download_all(downloader, jobs)
+        second_run = download_all(downloader, jobs)
+
+        assert first_run.downloads == second_run.downloads == 2
+        assert second_run.failures == []
+
+    def test_downloading_from_another_open_loop_raises(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        downloader = AsyncImageDownloader(max_concurrency=1)
+        first_loop = asyncio.new_event_loop()
+        try:
+            first_loop.run_until_complete(downloader.download(image_server.url('/image.jpg'), str(tmp_path / 'a.jpg')))
+
+            with pytest.raises(RuntimeError):
+                asyncio.run(downloader.download(image_server.url('/image.jpg'), str(tmp_path / 'b.jpg')))
+        finally:
+            first_loop.run_until_complete(downloader.close())
+            first_loop.close()
+
@@ -0,0 +1,154 @@
+import http.client
+import os
+
+import pytest
+
+from concurrent_image_download.download_cache import DEDUPLICATED, DOWNLOADED, REVALIDATED, DownloadCache
+from concurrent_image_download.image_server import TRUNCATE
+from concurrent_image_download.pooled_image_download import (
+    DownloadError,
+    PartialDownload,
+    PooledImageDownloader,
+    RetryPolicy,
+)
+
+
+def make_cache(directory, max_size=1024 * 1024):
+    downloader = PooledImageDownloader(max_workers=1, retry_policy=RetryPolicy(attempts=1))
+    return DownloadCache(str(directory), downloader=downloader, max_size=max_size)
+
+
+class NotModifiedOnceDownloader:
+    """
+    Answers the first request with 304 Not Modified whatever its headers, like a misbehaving server or proxy.
+    """
+    def __init__(self, downloader: PooledImageDownloader):
+        self.downloader = downloader
+        self.headers = []
+
+    def fetch(self, url, file_name, headers=None):
+        self.headers.append(dict(headers or {}))
+        if len(self.headers) == 1:
+            return PartialDownload(part_name=f'{file_name}.part', not_modified=True)
+        return self.downloader.fetch(url, file_name, headers=headers)
+
+
+class NewEtagOnRevalidationDownloader:
+    """
+    Answers the conditional requests with 304 Not Modified and a new ETag, as RFC 9110 allows.
+    """
+    def __init__(self, downloader: PooledImageDownloader):
+        self.downloader = downloader
+
+    def fetch(self, url, file_name, headers=None):
+        if headers:
+            return PartialDownload(part_name=f'{file_name}.part', not_modified=True, etag='"new"')
+        return self.downloader.fetch(url, file_name, headers=headers)
+
+
+class TestDownloadCache:
+    def test_revalidates_with_etag(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image' * 100
+        cache = make_cache(tmp_path / 'cache')
+
+        assert cache.fetch(image_server.url('/image.jpg'), str(tmp_path / 'first.jpg')) == DOWNLOADED
+        assert cache.fetch(image_server.url('/image.jpg'), str(tmp_path / 'second.jpg')) == REVALIDATED
+
+        assert (tmp_path / 'second.jpg').read_bytes() == b'image' * 100
+        assert 'If-None-Match' not in image_server.request_headers[0]
+        assert image_server.request_headers[1]['If-None-Match'] == cache.entry(image_server.url('/image.jpg')).etag
+        assert cache.statistics.bytes_downloaded == 500
+
+    def test_revalidates_with_last_modified(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        image_server.last_modified['/image.jpg'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        cache = make_cache(tmp_path / 'cache')
+        cache.fetch(image_server.url('/image.jpg'), str(tmp_path / 'first.jpg'))
+
+        assert cache.fetch(image_server.url('/image.jpg'), str(tmp_path / 'second.jpg')) == REVALIDATED
+        assert image_server.request_headers[1]['If-Modified-Since'] == 'Wed, 21 Oct 2015 07:28:00 GMT'
+
+    def test_changed_image_is_downloaded_again(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'old image'
+        cache = make_cache(tmp_path / 'cache')
+        cache.fetch(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg'))
+        image_server.files['/image.jpg'] = b'new image'
+
+        assert cache.fetch(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg')) == DOWNLOADED
+        assert (tmp_path / 'image.jpg').read_bytes() == b'new image'
+
+    def test_identical_payloads_are_stored_once_and_hardlinked(self, image_server, tmp_path):
+        image_server.files['/a.jpg'] = b'same image'
+        image_server.files['/b.jpg'] = b'same image'
+        cache = make_cache(tmp_path / 'cache')
+
+        assert cache.fetch(image_server.url('/a.jpg'), str(tmp_path / 'a.jpg')) == DOWNLOADED
+        assert cache.fetch(image_server.url('/b.jpg'), str(tmp_path / 'b.jpg')) == DEDUPLICATED
+
+        digest = cache.entry(image_server.url('/a.jpg')).digest
+        assert cache.entry(image_server.url('/b.jpg')).digest == digest
+        assert cache.size() == len(b'same image')
+        assert os.path.samefile(tmp_path / 'a.jpg', cache.payload_path(digest))
+        assert os.path.samefile(tmp_path / 'b.jpg', cache.payload_path(digest))
+
+    def test_evicts_least_recently_used_payloads(self, image_server, tmp_path):
+        for name in 'abc':
+            image_server.files[f'/{name}.jpg'] = name.encode() * 100
+        cache = make_cache(tmp_path / 'cache', max_size=250)
+        cache.fetch(image_server.url('/a.jpg'), str(tmp_path / 'a.jpg'))
+        cache.fetch(image_server.url('/b.jpg'), str(tmp_path / 'b.jpg'))
+        cache.fetch(image_server.url('/a.jpg'), str(tmp_path / 'a.jpg'))
+
+        cache.fetch(image_server.url('/c.jpg'), str(tmp_path / 'c.jpg'))
+
+        assert cache.entry(image_server.url('/b.jpg')) is None
+        assert cache.entry(image_server.url('/a.jpg')) is not None
+        assert cache.size() == 200
+        assert cache.statistics.evictions == 1
+        # The file handed out survives the eviction of its payload.
+        assert (tmp_path / 'b.jpg').read_bytes() == b'b' * 100
+
+    def test_index_persists_between_runs(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        first_run = make_cache(tmp_path / 'cache')
+        first_run.fetch(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg'))
+        first_run.close()
+
+        second_run = make_cache(tmp_path / 'cache')
+
+        assert second_run.fetch(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg')) == REVALIDATED
+
+    def test_failed_download_leaves_no_temporary_files(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image' * 1000
+        image_server.faults['/image.jpg'] = [TRUNCATE]
+        cache = make_cache(tmp_path / 'cache')
+
+        with pytest.raises(http.client.IncompleteRead):
+            cache.fetch(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg'))
+        with pytest.raises(DownloadError):
+            cache.fetch(image_server.url('/missing.jpg'), str(tmp_path / 'missing.jpg'))
+
+        assert os.listdir(cache.temporary_directory) == []
+
+    def test_not_modified_without_cached_entry_is_downloaded_again(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        cache = make_cache(tmp_path / 'cache')
+        cache.downloader = NotModifiedOnceDownloader(cache.downloader)
+
+        assert cache.fetch(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg')) == DOWNLOADED
+
+        assert (tmp_path / 'image.jpg').read_bytes() == b'image'
+        assert cache.downloader.headers == [{}, {}]
+
+    def test_revalidation_stores_new_validators(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        image_server.last_modified['/image.jpg'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        cache = make_cache(tmp_path / 'cache')
+        cache.downloader = NewEtagOnRevalidationDownloader(cache.downloader)
+        cache.fetch(image_server.url('/image.jpg'), str(tmp_path / 'first.jpg'))
+
+        assert cache.fetch(image_server.url('/image.jpg'), str(tmp_path / 'second.jpg')) == REVALIDATED
+
+        entry = cache.entry(image_server.url('/image.jpg'))
+        assert entry.etag == '"new"'
+        assert entry.last_modified == 'Wed, 21 Oct 2015 07:28:00 GMT'
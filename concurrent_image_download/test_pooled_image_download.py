@@ -0,0 +1,160 @@
+import pytest
+
+from concurrent_image_download.image_server import STALL, TRUNCATE, UNAVAILABLE
+from concurrent_image_download.pooled_image_download import (
+    DownloadError,
+    PooledImageDownloader,
+    RetryableDownloadError,
+    RetryPolicy,
+    split_url,
+)
+
+NO_BACKOFF = RetryPolicy(attempts=3, backoff=0)
+
+
+class TestPooledImageDownloader:
+    def test_split_url(self):
+        assert split_url('https://picsum.photos/400/200?blur') == (('https', 'picsum.photos', 443), '/400/200?blur')
+        assert split_url('http://localhost:8000') == (('http', 'localhost', 8000), '/')
+        with pytest.raises(DownloadError):
+            split_url('ftp://example.com/image.jpg')
+
+    def test_downloads_reuse_connections(self, image_server, tmp_path):
+        for i in range(100):
+            image_server.files[f'/image-{i}.jpg'] = bytes([i]) * (1000 + i)
+        downloader = PooledImageDownloader(max_workers=4)
+
+        file_names = downloader.download_all(
+            (image_server.url(f'/image-{i}.jpg'), str(tmp_path / f'image-{i}.jpg')) for i in range(100)
+        )
+        downloader.close()
+
+        for i, file_name in enumerate(file_names):
+            assert open(file_name, 'rb').read() == bytes([i]) * (1000 + i)
+        assert len(image_server.requests) == 100
+        assert image_server.connections <= 4
+        assert downloader.connection_pool.connections_opened == image_server.connections
+
+    def test_follows_redirects(self, image_server, tmp_path):
+        image_server.files['/id/7/400/200.jpg'] = b'image'
+        image_server.redirects['/400/200'] = '/id/7/400/200.jpg'
+        downloader = PooledImageDownloader(max_workers=1)
+
+        downloader.download(image_server.url('/400/200'), str(tmp_path / 'image.jpg'))
+
+        assert (tmp_path / 'image.jpg').read_bytes() == b'image'
+        assert image_server.connections == 1
+
+    def test_missing_image_raises_and_keeps_connection_usable(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        downloader = PooledImageDownloader(max_workers=1)
+
+        with pytest.raises(DownloadError, match='404'):
+            downloader.download(image_server.url('/missing.jpg'), str(tmp_path / 'missing.jpg'))
+        downloader.download(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg'))
+
+        assert (tmp_path / 'image.jpg').read_bytes() == b'image'
+
+    def test_reconnects_when_the_server_closed_an_idle_connection(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        downloader = PooledImageDownloader(max_workers=1)
+        downloader.download(image_server.url('/image.jpg'), str(tmp_path / 'first.jpg'))
+        host_key = ('http', '127.0.0.1', image_server.server_port)
+        idle_connection = downloader.connection_pool.idle_connections[host_key][0]
+        # Simulate the server timing out the keep-alive connection.
+        idle_connection.sock.shutdown(2)
+
+        downloader.download(image_server.url('/image.jpg'), str(tmp_path / 'second.jpg'))
+
+        assert (tmp_path / 'second.jpg').read_bytes() == b'image'
+        assert downloader.connection_pool.connections_opened == 2
+
+
+class TestRetriesAndResume:
+    def test_retry_delay_grows_exponentially_up_to_the_cap(self):
+        retry_policy = RetryPolicy(backoff=1.0, max_backoff=5.0)
+
+        assert 0.5 <= retry_policy.delay(0) <= 1.0
+        assert 2.0 <= retry_policy.delay(2) <= 4.0
+        assert 2.5 <= retry_policy.delay(10) <= 5.0
+
+    def test_retries_unavailable_server(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        image_server.faults['/image.jpg'] = [UNAVAILABLE, UNAVAILABLE]
+        downloader = PooledImageDownloader(retry_policy=NO_BACKOFF)
+
+        downloader.download(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg'))
+
+        assert (tmp_path / 'image.jpg').read_bytes() == b'image'
+        assert len(image_server.requests) == 3
+
+    def test_gives_up_after_the_last_attempt(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        image_server.faults['/image.jpg'] = [UNAVAILABLE] * 3
+        downloader = PooledImageDownloader(retry_policy=NO_BACKOFF)
+
+        with pytest.raises(RetryableDownloadError, match='503'):
+            downloader.download(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg'))
+
+        assert not (tmp_path / 'image.jpg').exists()
+
+    def test_client_errors_are_not_retried(self, image_server, tmp_path):
+        downloader = PooledImageDownloader(retry_policy=NO_BACKOFF)
+
+        with pytest.raises(DownloadError, match='404'):
+            downloader.download(image_server.url('/missing.jpg'), str(tmp_path / 'missing.jpg'))
+
+        assert len(image_server.requests) == 1
+
+    def test_resumes_truncated_download_with_a_range_request(self, image_server, tmp_path):
+        image = bytes(range(256)) * 100
+        image_server.files['/image.jpg'] = image
+        image_server.faults['/image.jpg'] = [TRUNCATE]
+        downloader = PooledImageDownloader(retry_policy=NO_BACKOFF)
+
+        downloader.download(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg'))
+
+        assert (tmp_path / 'image.jpg').read_bytes() == image
+        assert not (tmp_path / 'image.jpg.part').exists()
+        first_request, second_request = image_server.request_headers
+        assert 'Range' not in first_request
+        assert second_request['Range'] == f'bytes={len(image) // 2}-'
+        assert second_request['If-Range'].startswith('"')
+
+    def test_changed_image_is_downloaded_again_in_full(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'old image' * 100
+        image_server.faults['/image.jpg'] = [TRUNCATE]
+        downloader = PooledImageDownloader(retry_policy=NO_BACKOFF)
+        original_fetch = downloader._fetch
+
+        def fetch_and_change_image(url, partial_download, headers):
+            try:
+                original_fetch(url, partial_download, headers)
+            finally:
+                image_server.files['/image.jpg'] = b'new image'
+
+        downloader._fetch = fetch_and_change_image
+        downloader.download(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg'))
+
+        assert (tmp_path / 'image.jpg').read_bytes() == b'new image'
+
+    def test_stalled_response_times_out_and_is_retried(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        image_server.faults['/image.jpg'] = [STALL]
+        image_server.stall_time = 0.5
+        downloader = PooledImageDownloader(read_timeout=0.1, retry_policy=NO_BACKOFF)
+
+        downloader.download(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg'))
+
+        assert (tmp_path / 'image.jpg').read_bytes() == b'image'
+        assert len(image_server.requests) == 2
+
+    def test_part_file_of_an_earlier_run_is_not_trusted(self, image_server, tmp_path):
+        image_server.files['/image.jpg'] = b'image'
+        (tmp_path / 'image.jpg.part').write_bytes(b'something else')
+        downloader = PooledImageDownloader(retry_policy=NO_BACKOFF)
+
+        downloader.download(image_server.url('/image.jpg'), str(tmp_path / 'image.jpg'))
+
+        assert (tmp_path / 'image.jpg').read_bytes() == b'image'
+        assert 'Range' not in image_server.request_headers[0]
@@ -0,0 +1,10 @@
+import pytest
+
+from io_bottleneck.site_server import SiteServer
+from test_support.http_server import serving
+
+
+@pytest.fixture
+def site_server():
+    with serving(SiteServer()) as server:
+        yield server
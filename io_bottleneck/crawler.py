@@ -0,0 +1,375 @@
+"""
+Concurrent link crawler.
+
+io_bottleneck.py fetches a single page and prints its links. The crawler follows them: a pool of worker threads takes
+URLs from the frontier, fetches them over keep-alive connections and adds the links it has not seen yet back to it.
+
+- URLs are normalized (see normalize_url) before they are compared, so the same page is not crawled twice under
+slightly different spellings.
+- The frontier is bounded, the links found while it is full are dropped (and counted) instead of queueing without limit.
+- Politeness: at most max_per_host requests to a host at the same time, started at least per_host_delay seconds apart.
+- The seen set stores a 64 bit digest per URL instead of the URL itself. For millions of URLs a BloomFilter keeps the
+memory fixed up front, at the price of skipping a small, configurable fraction of the pages.
+
+Only the hosts of the seed URLs are crawled unless allowed_hosts says otherwise.
+
+Run it with:
+python -m io_bottleneck.crawler http://www.example.com --max-pages 100
+"""
+import argparse
+import hashlib
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from concurrent_image_download.pooled_image_download import (
+    REDIRECT_STATUSES,
+    ConnectionPool,
+    split_url,
+)
+from io_bottleneck.link_extractor import DEFAULT_BACKEND, iter_links, read_chunks
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+# Pages are read up to this size, the rest is ignored.
+MAX_PAGE_SIZE = 5 * 1024 * 1024
+USER_AGENT = 'Concurrency-course-crawler'
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Resolve url against base and bring it to a canonical form: lower case scheme and host, no default port, no
+    fragment, / for an empty path. Return None for anything which is not an http(s) URL.
+    """
+    try:
+        parts = urlsplit(urljoin(base, url.strip()) if base else url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    host = parts.hostname
+    if port is not None and port != DEFAULT_PORTS[scheme]:
+        host = f'{host}:{port}'
+    return urlunsplit((scheme, host, parts.path or '/', parts.query, ''))
+
+
+def url_digest(url: str) -> bytes:
+    return hashlib.blake2b(url.encode(), digest_size=16).digest()
+
+
+class ExactSeenSet:
+    """
+    Remembers the 64 bit digest of every URL, a fraction of the memory of the URLs themselves and no false positives in
+    practice.
+    """
+    def __init__(self):
+        self.digests: Set[int] = set()
+
+    def add(self, url: str) -> bool:
+        """
+        Add the url, return whether it was new.
+        """
+        digest = int.from_bytes(url_digest(url)[:8], 'little')
+        if digest in self.digests:
+            return False
+        self.digests.add(digest)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+
+class BloomFilter:
+    """
+    Fixed size seen set: sized for capacity URLs with the given false positive rate, it never uses more memory however
+    many URLs are added. A false positive makes the crawler skip a page it has not seen, never crawl one twice.
+    """
+    def __init__(self, capacity: int = 10_000_000, false_positive_rate: float = 0.001):
+        self.number_of_bits = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.number_of_hashes = max(1, round(self.number_of_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.number_of_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, url: str) -> Iterable[int]:
+        # Double hashing: the k positions are h1 + i * h2, which works as well as k independent hashes.
+        digest = url_digest(url)
+        first_hash = int.from_bytes(digest[:8], 'little')
+        second_hash = int.from_bytes(digest[8:], 'little') | 1
+        return ((first_hash + i * second_hash) % self.number_of_bits for i in range(self.number_of_hashes))
+
+    def add(self, url: str) -> bool:
+        """
+        Add the url, return whether it was new (False for the false positives too).
+        """
+        new = False
+        for position in self._positions(url):
+            byte_index, mask = position >> 3, 1 << (position & 7)
+            if not self.bits[byte_index] & mask:
+                self.bits[byte_index] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class Frontier:
+    """
+    Bounded queue of URLs to crawl, handing them out round robin over the hosts while respecting the politeness
+    limits. pop blocks until a URL can be crawled and returns None once the crawl is over: nothing is queued and nothing
+    is in flight (so no more links can come), or close was called.
+    """
+    def __init__(self, max_size: int, max_per_host: int = 2, per_host_delay: float = 0.0):
+        self.max_size = max_size
+        self.max_per_host = max_per_host
+        self.per_host_delay = per_host_delay
+        self.condition = threading.Condition()
+        self.queues: Dict[str, Deque[str]] = {}
+        # Hosts with queued URLs, rotated so every host gets its turn.
+        self.hosts: Deque[str] = deque()
+        self.in_flight: Dict[str, int] = {}
+        self.next_request_time: Dict[str, float] = {}
+        self.size = 0
+        self.total_in_flight = 0
+        self.closed = False
+
+    def push(self, url: str) -> bool:
+        """
+        Queue the url, return False (dropping it) when the frontier is full.
+        """
+        host = urlsplit(url).netloc
+        with self.condition:
+            if self.size >= self.max_size:
+                return False
+            queue = self.queues.get(host)
+            if queue is None:
+                queue = self.queues[host] = deque()
+                self.hosts.append(host)
+            queue.append(url)
+            self.size += 1
+            self.condition.notify()
+            return True
+
+    def _pop_ready(self, now: float) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Pop a URL of a host which can take a request now, or return how long until one can.
+        """
+        wait_time = None
+        for _ in range(len(self.hosts)):
+            host = self.hosts[0]
+            self.hosts.rotate(-1)
+            if self.in_flight.get(host, 0) >= self.max_per_host:
+                continue
+            ready_in = self.next_request_time.get(host, 0.0) - now
+            if ready_in > 0:
+                wait_time = ready_in if wait_time is None else min(wait_time, ready_in)
+                continue
+
+            queue = self.queues[host]
+            url = queue.popleft()
+            if not queue:
+                del self.queues[host]
+                self.hosts.remove(host)
+            self.size -= 1
+            self.in_flight[host] = self.in_flight.get(host, 0) + 1
+            self.total_in_flight += 1
+            self.next_request_time[host] = now + self.per_host_delay
+            return url, None
+        return None, wait_time
+
+    def pop(self) -> Optional[str]:
+        with self.condition:
+            while not self.closed:
+                if not self.size and not self.total_in_flight:
+                    self.condition.notify_all()
+                    return None
+                url, wait_time = self._pop_ready(time.monotonic())
+                if url is not None:
+                    return url
+                self.condition.wait(wait_time)
+            return None
+
+    def done(self, url: str):
+        """
+        Must be called for every popped url once its links were pushed.
+        """
+        host = urlsplit(url).netloc
+        with self.condition:
+            self.in_flight[host] -= 1
+            if not self.in_flight[host]:
+                del self.in_flight[host]
+            self.total_in_flight -= 1
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+@dataclass
+class CrawlStatistics:
+    pages: int = 0
+    failures: int = 0
+    links_found: int = 0
+    dropped: int = 0
+    elapsed: float = 0.0
+    errors: List[Tuple[str, BaseException]] = field(default_factory=list)
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.elapsed if self.elapsed else 0.0
+
+
+class Crawler:
+    def __init__(
+        self,
+        max_workers: int = 16,
+        max_pages: int = 1000,
+        max_frontier: int = 100000,
+        max_per_host: int = 2,
+        per_host_delay: float = 0.0,
+        seen: Optional[Union[ExactSeenSet, BloomFilter]] = None,
+        allowed_hosts: Optional[Iterable[str]] = None,
+        timeout: float = 10.0,
+        backend: str = DEFAULT_BACKEND,
+        on_page: Optional[Callable[[str, int, List[str]], None]] = None,
+    ):
+        """
+        on_page is called with the URL, the status and the links of every fetched page. backend is the link extraction
+        backend, see link_extractor.
+        """
+        self.max_workers = max_workers
+        self.max_pages = max_pages
+        self.frontier = Frontier(max_size=max_frontier, max_per_host=max_per_host, per_host_delay=per_host_delay)
+        self.seen = seen if seen is not None else ExactSeenSet()
+        self.allowed_hosts = set(allowed_hosts) if allowed_hosts is not None else None
+        self.backend = backend
+        self.on_page = on_page
+        self.connection_pool = ConnectionPool(
+            max_idle_per_host=max_per_host, connect_timeout=timeout, read_timeout=timeout
+        )
+        # Guards the seen set and the statistics.
+        self.lock = threading.Lock()
+        self.statistics = CrawlStatistics()
+
+    def fetch(self, url: str) -> Tuple[int, List[str]]:
+        """
+        Fetch the page, return the status and the (not yet normalized) links - the links of an HTML page, or the
+        target of a redirect. The page is parsed as it is read, it is never held in memory whole.
+        """
+        key, path = split_url(url)
+        headers = {'User-Agent': USER_AGENT, 'Accept': 'text/html'}
+        with self.connection_pool.connection(key) as (connection, reused):
+            response = self.connection_pool.get(connection, reused, path, headers)
+            body = read_chunks(response, limit=MAX_PAGE_SIZE)
+            if response.status == 200 and 'html' in response.getheader('Content-Type', ''):
+                links = list(iter_links(body, encoding=response.headers.get_content_charset(), backend=self.backend))
+            else:
+                links = []
+                for _ in body:
+                    pass
+            if not response.isclosed():
+                # The rest of a too large page is still on the way, the connection can not be reused.
+                connection.close()
+
+        if response.status in REDIRECT_STATUSES and response.getheader('Location'):
+            return response.status, [response.getheader('Location')]
+        return response.status, links
+
+    def _allowed(self, url: str) -> bool:
+        return self.allowed_hosts is None or urlsplit(url).netloc in self.allowed_hosts
+
+    def _add_links(self, page_url: str, links: List[str]):
+        for link in links:
+            url = normalize_url(link, base=page_url)
+            if url is None or not self._allowed(url):
+                continue
+            with self.lock:
+                new = self.seen.add(url)
+            if new and not self.frontier.push(url):
+                with self.lock:
+                    self.statistics.dropped += 1
+
+    def _crawl_page(self, url: str):
+        status, links = self.fetch(url)
+        with self.lock:
+            self.statistics.pages += 1
+            self.statistics.links_found += len(links)
+            if self.statistics.pages >= self.max_pages:
+                self.frontier.close()
+        if self.on_page is not None:
+            self.on_page(url, status, links)
+        self._add_links(url, links)
+
+    def _worker(self):
+        while True:
+            url = self.frontier.pop()
+            if url is None:
+                return
+            try:
+                self._crawl_page(url)
+            except Exception as error:
+                # Whatever goes wrong (a broken response, an error in on_page), the worker must go on.
+                with self.lock:
+                    self.statistics.failures += 1
+                    self.statistics.errors.append((url, error))
+            finally:
+                # The other workers wait in pop until nothing is in flight, the url must be marked done.
+                self.frontier.done(url)
+
+    def crawl(self, seeds: Iterable[str]) -> CrawlStatistics:
+        seed_urls = [url for url in (normalize_url(seed) for seed in seeds) if url is not None]
+        if self.allowed_hosts is None:
+            self.allowed_hosts = {urlsplit(url).netloc for url in seed_urls}
+        for url in seed_urls:
+            if self.seen.add(url):
+                self.frontier.push(url)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for _ in range(self.max_workers):
+                executor.submit(self._worker)
+        self.statistics.elapsed = time.perf_counter() - start
+        self.connection_pool.close()
+        return self.statistics
+
+
+def main(arguments: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Crawl the links of a site.')
+    parser.add_argument('seeds', nargs='+')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--max-pages', type=int, default=1000)
+    parser.add_argument('--max-frontier', type=int, default=100000)
+    parser.add_argument('--max-per-host', type=int, default=2)
+    parser.add_argument('--per-host-delay', type=float, default=0.1, help='Seconds between requests to a host.')
+    parser.add_argument('--bloom-filter', type=int, default=0, help='Use a Bloom filter sized for this many URLs.')
+    parsed_arguments = parser.parse_args(arguments)
+
+    crawler = Crawler(
+        max_workers=parsed_arguments.workers,
+        max_pages=parsed_arguments.max_pages,
+        max_frontier=parsed_arguments.max_frontier,
+        max_per_host=parsed_arguments.max_per_host,
+        per_host_delay=parsed_arguments.per_host_delay,
+        seen=BloomFilter(capacity=parsed_arguments.bloom_filter) if parsed_arguments.bloom_filter else None,
+        on_page=lambda url, status, links: print(f'{status} {url} ({len(links)} links)'),
+    )
+    statistics = crawler.crawl(parsed_arguments.seeds)
+    print(
+        f'Crawled {statistics.pages} pages in {statistics.elapsed:.2f}s ({statistics.pages_per_second:.1f} pages/s), '
+        f'{statistics.failures} failures, {statistics.dropped} links dropped by the full frontier'
+    )
+
+
+if __name__ == '__main__':
+    main()
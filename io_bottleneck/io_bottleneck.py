@@ -1,19 +1,31 @@
+"""
+Fetches a single page and prints its links.
+
+Run it from the repository root with:
+python -m io_bottleneck.io_bottleneck
+"""
 import urllib.request
 import time
-from bs4 import BeautifulSoup
+
+from io_bottleneck.link_extractor import iter_links, read_chunks
+
+
+def timed_chunks(response, timings):
+    # The page is parsed while it arrives, so the fetch is over once the last chunk was read.
+    yield from read_chunks(response)
+    timings.append(time.time())
 
 
 start = time.time()
-request = urllib.request.urlopen('http://www.example.com')
-page_html = request.read()
-stop_fetching_main_page = time.time()
+fetch_timings = []
+with urllib.request.urlopen('http://www.example.com') as response:
+    # The links are parsed out of every chunk as it arrives, the page is never held or turned into a tree whole.
+    for link in iter_links(timed_chunks(response, fetch_timings), encoding=response.headers.get_content_charset()):
+        print(link)
+
+stop_fetching_main_page, = fetch_timings
 total_time = stop_fetching_main_page - start
 print(f'Total time to fetch the page: {total_time}')
 
-soup = BeautifulSoup(page_html, 'html.parser')
-
-for link in soup.find_all('a'):
-    print(link.get('href'))
-
 stop_fetching_all_links = time.time()
 print(f'Total execution time: {stop_fetching_all_links - start}')
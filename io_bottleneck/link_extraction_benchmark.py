@@ -0,0 +1,145 @@
+"""
+Link extraction benchmark.
+
+Compares, on a generated page of the given size, the BeautifulSoup approach of io_bottleneck.py (parse the whole page
+into a tree, then find_all('a')) with the streaming backends of link_extractor, fed the page in CHUNK_SIZE chunks as
+they would arrive from the network.
+
+For every approach we report the best time out of the repeats, the throughput and the peak memory allocated by Python
+while extracting (measured with tracemalloc in a separate run, tracing slows everything down). The memory of lxml's own
+C buffers is not seen by tracemalloc.
+
+BeautifulSoup and lxml are optional, the approaches which are not installed are skipped.
+
+Run it with:
+python -m io_bottleneck.link_extraction_benchmark --links 100000
+"""
+import argparse
+import math
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+from concurrent_image_download.pooled_image_download import CHUNK_SIZE
+from io_bottleneck.link_extractor import HTML_PARSER, LXML, etree, iter_links
+
+BEAUTIFUL_SOUP = 'beautifulsoup'
+APPROACHES = (BEAUTIFUL_SOUP, HTML_PARSER, LXML)
+
+
+@dataclass
+class ExtractionResult:
+    approach: str
+    links: int
+    elapsed: float
+    peak_memory: int
+
+    def megabytes_per_second(self, page_size: int) -> float:
+        return page_size / self.elapsed / 1024 ** 2 if self.elapsed else 0.0
+
+
+def generate_page(number_of_links: int, seed: int = 0) -> bytes:
+    """
+    An HTML page with number_of_links links spread over nested lists and paragraphs of text, with some of the noise of
+    a real page: attributes, entities, comments and scripts.
+    """
+    generator = random.Random(seed)
+    words = ['concurrency', 'thread', 'process', 'asyncio', 'queue', 'lock', 'żółć', '&amp;', 'GIL']
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>Links</title>',
+             '<script>var links = "<a href=\\"/not-a-link\\">";</script></head><body>']
+    for i in range(number_of_links):
+        if i % 50 == 0:
+            parts.append('<div class="section"><!-- section --><ul>')
+        text = ' '.join(generator.choice(words) for _ in range(generator.randint(5, 20)))
+        parts.append(
+            f'<li class="item" data-index="{i}"><p>{text}</p>'
+            f'<a href="/articles/{i}?ref=list&amp;page={i // 50}" title="Article {i}">Article {i}</a></li>'
+        )
+        if i % 50 == 49 or i == number_of_links - 1:
+            parts.append('</ul></div>')
+    parts.append('</body></html>')
+    return ''.join(parts).encode()
+
+
+def chunks_of(page: bytes, chunk_size: int = CHUNK_SIZE) -> List[bytes]:
+    return [page[start:start + chunk_size] for start in range(0, len(page), chunk_size)]
+
+
+def extract_with_beautiful_soup(page: bytes) -> List[str]:
+    soup = BeautifulSoup(page, 'html.parser')
+    return [link.get('href') for link in soup.find_all('a') if link.get('href')]
+
+
+def available_approaches() -> List[str]:
+    approaches = [HTML_PARSER]
+    if BeautifulSoup is not None:
+        approaches.insert(0, BEAUTIFUL_SOUP)
+    if etree is not None:
+        approaches.append(LXML)
+    return approaches
+
+
+def extractor(approach: str) -> Callable[[bytes], List[str]]:
+    if approach == BEAUTIFUL_SOUP:
+        if BeautifulSoup is None:
+            raise ImportError('The beautifulsoup approach requires bs4, install it with: pip install beautifulsoup4')
+        return extract_with_beautiful_soup
+    return lambda page: list(iter_links(chunks_of(page), encoding='utf-8', backend=approach))
+
+
+def measure(approach: str, page: bytes, repeats: int) -> ExtractionResult:
+    extract = extractor(approach)
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        links = extract(page)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        extract(page)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return ExtractionResult(approach=approach, links=len(links), elapsed=best, peak_memory=peak_memory)
+
+
+def format_result(result: ExtractionResult, page_size: int) -> str:
+    return (
+        f'{result.approach:<16}{result.links:>10}{result.elapsed:>12.3f}{result.megabytes_per_second(page_size):>10.1f}'
+        f'{result.peak_memory / 1024 ** 2:>20.1f}'
+    )
+
+
+HEADER = f'{"approach":<16}{"links":>10}{"time [s]":>12}{"MiB/s":>10}{"peak memory [MiB]":>20}'
+
+
+def main(arguments: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Compare BeautifulSoup with the streaming link extractors.')
+    parser.add_argument('--approaches', nargs='+', choices=APPROACHES, default=None)
+    parser.add_argument('--links', type=int, default=100000, help='Number of links on the generated page.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=3, help='The best time out of the repeats is reported.')
+    parsed_arguments = parser.parse_args(arguments)
+
+    page = generate_page(parsed_arguments.links, seed=parsed_arguments.seed)
+    results = [
+        measure(approach, page, parsed_arguments.repeats)
+        for approach in parsed_arguments.approaches or available_approaches()
+    ]
+
+    print(f'Page of {len(page) / 1024 ** 2:.1f} MiB with {parsed_arguments.links} links')
+    print(HEADER)
+    for result in results:
+        print(format_result(result, len(page)))
+
+
+if __name__ == '__main__':
+    main()
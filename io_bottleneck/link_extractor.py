@@ -0,0 +1,158 @@
+"""
+Streaming link extraction.
+
+io_bottleneck.py builds a whole BeautifulSoup tree of the page only to call find_all('a') on it. All we need are the
+href attributes of the <a> tags, so here the page goes through an event based parser instead: the start tags are
+reported as they are parsed and nothing else is kept, the memory does not grow with the page.
+
+The parsers are fed the response as the bytes arrive and iter_links yields the links found in every chunk before the
+next one is read, so the parsing overlaps with the download instead of waiting for the whole body.
+
+Two backends:
+- html.parser - the HTMLParser of the standard library, always available.
+- lxml - the libxml2 HTML parser with a parser target (no tree is built either), several times faster. lxml is an
+optional dependency, it is used by default when it is installed.
+
+See link_extraction_benchmark.py for how they compare with BeautifulSoup.
+"""
+import codecs
+from html.parser import HTMLParser
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+from concurrent_image_download.pooled_image_download import CHUNK_SIZE
+
+HTML_PARSER = 'html.parser'
+LXML = 'lxml'
+BACKENDS = (HTML_PARSER, LXML)
+DEFAULT_BACKEND = LXML if etree is not None else HTML_PARSER
+
+
+class LinkParser(HTMLParser):
+    """
+    Collects the href of every <a> tag, take them with pop_links after every feed.
+    """
+    def __init__(self):
+        super().__init__()
+        self.links: List[str] = []
+
+    def handle_starttag(self, tag: str, attributes: List[Tuple[str, Optional[str]]]):
+        if tag == 'a':
+            for name, value in attributes:
+                if name == 'href' and value:
+                    self.links.append(value)
+                    return
+
+    def pop_links(self) -> List[str]:
+        links, self.links = self.links, []
+        return links
+
+
+class LinkTarget:
+    """
+    lxml parser target: lxml calls start for every start tag, the tree is never built.
+    """
+    def __init__(self):
+        self.links: List[str] = []
+
+    def start(self, tag: str, attributes):
+        if tag == 'a':
+            href = attributes.get('href')
+            if href:
+                self.links.append(href)
+
+    def close(self):
+        pass
+
+    def pop_links(self) -> List[str]:
+        links, self.links = self.links, []
+        return links
+
+
+def read_chunks(file: BinaryIO, chunk_size: int = CHUNK_SIZE, limit: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Read a file (or an HTTP response) chunk by chunk, up to limit bytes.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        chunk = file.read(chunk_size if remaining is None else min(chunk_size, remaining))
+        if not chunk:
+            return
+        if remaining is not None:
+            remaining -= len(chunk)
+        yield chunk
+
+
+def _iter_html_parser_links(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[str]:
+    # The incremental decoder keeps the bytes of a character split between two chunks for the next one.
+    decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+    parser = LinkParser()
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        yield from parser.pop_links()
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    yield from parser.pop_links()
+
+
+def _iter_lxml_links(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[str]:
+    if etree is None:
+        raise ImportError('The lxml backend requires lxml, install it with: pip install lxml')
+
+    target = LinkTarget()
+    decoder = None
+    try:
+        # Without an encoding lxml detects it from the page (a BOM or a <meta charset>).
+        parser = etree.HTMLParser(target=target, encoding=encoding)
+    except LookupError:
+        # libxml2 knows fewer names of the encodings than Python (latin-1 for one), decode the chunks here instead.
+        parser = etree.HTMLParser(target=target)
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+
+    fed = False
+    for chunk in chunks:
+        data = decoder.decode(chunk) if decoder is not None else chunk
+        if data:
+            parser.feed(data)
+            fed = True
+            yield from target.pop_links()
+    if decoder is not None:
+        data = decoder.decode(b'', final=True)
+        if data:
+            parser.feed(data)
+            fed = True
+    if fed:
+        # lxml refuses to close a parser which was never fed.
+        parser.close()
+    yield from target.pop_links()
+
+
+def iter_links(
+    chunks: Iterable[bytes], encoding: Optional[str] = None, backend: str = DEFAULT_BACKEND
+) -> Iterator[str]:
+    """
+    Yield the href of every <a> tag in the HTML, read from chunks of bytes. The links found in a chunk are yielded
+    before the next chunk is taken, so chunks can be the body of a response still being downloaded.
+    """
+    if encoding is not None:
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            # A charset we do not know, let the parser fall back to its default.
+            encoding = None
+    if backend == HTML_PARSER:
+        return _iter_html_parser_links(chunks, encoding)
+    if backend == LXML:
+        return _iter_lxml_links(chunks, encoding)
+    raise ValueError(f'Unknown backend {backend}, use one of {BACKENDS}')
+
+
+def extract_links(page_html: str, backend: str = DEFAULT_BACKEND) -> List[str]:
+    """
+    The links of a page which was already read and decoded.
+    """
+    return list(iter_links([page_html.encode()], encoding='utf-8', backend=backend))
@@ -0,0 +1,411 @@
+"""
+Staged fetch / parse / output pipeline.
+
+io_bottleneck.py fetches a page and then parses it, the CPU sits idle during the fetch and the network during the
+parse. Here the work is split into stages connected by bounded queues, so the stages work on different pages at the
+same time:
+
+- fetch - fetch_workers threads download the pages over keep-alive connections, waiting on the network is what
+threads are good at.
+- parse - the link extraction is CPU bound, parse_workers threads hand the pages to a process pool of as many processes
+and wait for the links. The pages are read whole by the fetch stage, they can not be streamed across the process
+boundary.
+- output - a single thread passes the results to on_page in the order they are done.
+
+The queues between the stages hold at most queue_size items, so a slow stage makes the ones before it wait instead of
+filling the memory.
+
+Every stage keeps its statistics: the items processed and the throughput, the histogram of the time spent on an item,
+the utilization of its workers (busy time / (workers * elapsed time)) and the depth of its input queue, as well as the
+time its workers were blocked on the full output queue. The bottleneck is the stage with its workers busy all the time,
+with a full input queue and the stages before it blocked on putting. Give it more workers.
+
+Run it with:
+python -m io_bottleneck.pipeline http://www.example.com http://www.example.org --fetch-workers 16 --parse-workers 4
+"""
+import argparse
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from concurrent_image_download.pooled_image_download import ConnectionPool, split_url
+from io_bottleneck.crawler import MAX_PAGE_SIZE, USER_AGENT, normalize_url
+from io_bottleneck.link_extractor import DEFAULT_BACKEND, iter_links, read_chunks
+
+FETCH = 'fetch'
+PARSE = 'parse'
+OUTPUT = 'output'
+STAGES = (FETCH, PARSE, OUTPUT)
+
+# Tells the workers of a stage that no more items will come.
+STOP = object()
+
+
+class LatencyHistogram:
+    """
+    Counts of latencies in power of two buckets: below 1 ms, 1-2 ms, 2-4 ms and so on, the last bucket taking
+    everything above.
+    """
+    def __init__(self, number_of_buckets: int = 16):
+        self.counts = [0] * number_of_buckets
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def bucket(self, seconds: float) -> int:
+        milliseconds = seconds * 1000
+        if milliseconds < 1:
+            return 0
+        return min(len(self.counts) - 1, int(math.log2(milliseconds)) + 1)
+
+    def bucket_bounds(self, bucket: int) -> Tuple[float, float]:
+        """
+        The lower and the upper bound of the bucket in milliseconds.
+        """
+        lower = 0.0 if bucket == 0 else 2.0 ** (bucket - 1)
+        upper = math.inf if bucket == len(self.counts) - 1 else 2.0 ** bucket
+        return lower, upper
+
+    def record(self, seconds: float):
+        self.counts[self.bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Upper bound, in seconds, of the bucket holding the given fraction of the latencies (the maximum for the last
+        bucket).
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bucket_bounds(bucket)[1] / 1000, self.maximum)
+        return self.maximum
+
+    def format(self, width: int = 40) -> str:
+        largest = max(self.counts) or 1
+        lines = []
+        for bucket, count in enumerate(self.counts):
+            if not count:
+                continue
+            lower, upper = self.bucket_bounds(bucket)
+            label = f'>= {lower:g} ms' if upper == math.inf else f'{lower:g}-{upper:g} ms'
+            lines.append(f'{label:>16} {count:>8} {"#" * max(1, round(count / largest * width))}')
+        return '\n'.join(lines)
+
+
+@dataclass
+class StageStatistics:
+    name: str
+    workers: int
+    items: int = 0
+    failures: int = 0
+    busy_time: float = 0.0
+    # Time the workers spent waiting for room in the full queue of the next stage.
+    blocked_time: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    # The depth of the input queue, sampled every time a worker takes an item.
+    queue_depth_samples: int = 0
+    queue_depth_total: int = 0
+    max_queue_depth: int = 0
+    latencies: LatencyHistogram = field(default_factory=LatencyHistogram)
+    errors: List[Tuple[Any, BaseException]] = field(default_factory=list)
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def utilization(self) -> float:
+        return self.busy_time / (self.workers * self.elapsed) if self.elapsed else 0.0
+
+    @property
+    def mean_queue_depth(self) -> float:
+        return self.queue_depth_total / self.queue_depth_samples if self.queue_depth_samples else 0.0
+
+
+@dataclass
+class PipelineStatistics:
+    stages: Dict[str, StageStatistics]
+    # From a URL entering the fetch stage to its links leaving the output stage.
+    end_to_end: LatencyHistogram = field(default_factory=LatencyHistogram)
+    elapsed: float = 0.0
+
+    @property
+    def bottleneck(self) -> str:
+        return max(self.stages.values(), key=lambda stage: stage.utilization).name
+
+    def report(self) -> str:
+        lines = [STAGE_HEADER]
+        for stage in self.stages.values():
+            lines.append(format_stage(stage))
+        lines.append(f'Bottleneck: {self.bottleneck}')
+        for stage in self.stages.values():
+            lines.append(f'{stage.name} latency:')
+            lines.append(stage.latencies.format())
+        lines.append('End to end latency:')
+        lines.append(self.end_to_end.format())
+        return '\n'.join(lines)
+
+
+def format_stage(stage: StageStatistics) -> str:
+    return (
+        f'{stage.name:<8}{stage.workers:>8}{stage.items:>8}{stage.failures:>10}{stage.throughput:>12.1f}'
+        f'{stage.utilization:>13.0%}{stage.latencies.percentile(0.5) * 1000:>10.1f}'
+        f'{stage.latencies.percentile(0.99) * 1000:>10.1f}{stage.mean_queue_depth:>12.1f}{stage.max_queue_depth:>11}'
+        f'{stage.blocked_time:>13.2f}'
+    )
+
+
+STAGE_HEADER = (
+    f'{"stage":<8}{"workers":>8}{"items":>8}{"failures":>10}{"items/s":>12}{"utilization":>13}{"p50 [ms]":>10}'
+    f'{"p99 [ms]":>10}{"mean depth":>12}{"max depth":>11}{"blocked [s]":>13}'
+)
+
+
+@dataclass
+class FetchedPage:
+    url: str
+    status: int
+    body: bytes
+    html: bool
+    encoding: Optional[str]
+    submitted: float
+
+
+@dataclass
+class ParsedPage:
+    url: str
+    status: int
+    links: List[str]
+    submitted: float
+
+
+def parse_page(url: str, body: bytes, encoding: Optional[str], backend: str) -> List[str]:
+    """
+    The normalized, deduplicated links of the page, in the order of their first appearance. Runs in the process pool.
+    """
+    links = {}
+    for link in iter_links([body], encoding=encoding, backend=backend):
+        normalized_link = normalize_url(link, base=url)
+        if normalized_link is not None:
+            links[normalized_link] = None
+    return list(links)
+
+
+class Pipeline:
+    def __init__(
+        self,
+        fetch_workers: int = 16,
+        parse_workers: int = os.cpu_count() or 1,
+        queue_size: int = 64,
+        backend: str = DEFAULT_BACKEND,
+        timeout: float = 10.0,
+        on_page: Optional[Callable[[str, int, List[str]], None]] = None,
+    ):
+        """
+        on_page is called by the output stage with the URL, the status and the links of every page.
+        """
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self.backend = backend
+        self.on_page = on_page
+        self.connection_pool = ConnectionPool(
+            max_idle_per_host=fetch_workers, connect_timeout=timeout, read_timeout=timeout
+        )
+        # Guards the statistics, they are updated by the workers of all the stages.
+        self.lock = threading.Lock()
+
+    def fetch(self, url: str) -> FetchedPage:
+        submitted = time.perf_counter()
+        key, path = split_url(url)
+        headers = {'User-Agent': USER_AGENT, 'Accept': 'text/html'}
+        with self.connection_pool.connection(key) as (connection, reused):
+            response = self.connection_pool.get(connection, reused, path, headers)
+            body = b''.join(read_chunks(response, limit=MAX_PAGE_SIZE))
+            if not response.isclosed():
+                # The rest of a too large page is still on the way, the connection can not be reused.
+                connection.close()
+        return FetchedPage(
+            url=url,
+            status=response.status,
+            body=body,
+            html=response.status == 200 and 'html' in response.getheader('Content-Type', ''),
+            encoding=response.headers.get_content_charset(),
+            submitted=submitted,
+        )
+
+    def _take(self, stage: StageStatistics, input_queue: queue.Queue):
+        depth = input_queue.qsize()
+        item = input_queue.get()
+        if item is not STOP:
+            with self.lock:
+                stage.queue_depth_samples += 1
+                stage.queue_depth_total += depth
+                stage.max_queue_depth = max(stage.max_queue_depth, depth)
+        return item
+
+    def _put(self, stage: StageStatistics, output_queue: queue.Queue, item):
+        start = time.perf_counter()
+        output_queue.put(item)
+        blocked_time = time.perf_counter() - start
+        with self.lock:
+            stage.blocked_time += blocked_time
+
+    def _run_stage(
+        self,
+        stage: StageStatistics,
+        input_queue: queue.Queue,
+        output_queue: Optional[queue.Queue],
+        process: Callable[[Any], Any],
+    ):
+        """
+        The loop of a stage worker: take an item, process it and put the result to the next stage until STOP.
+        """
+        while True:
+            item = self._take(stage, input_queue)
+            if item is STOP:
+                return
+
+            start = time.perf_counter()
+            try:
+                result = process(item)
+            except Exception as error:
+                # Whatever goes wrong, a worker must not die - the stages before it would wait for it forever.
+                result, failure = None, error
+            else:
+                failure = None
+            finished = time.perf_counter()
+            with self.lock:
+                stage.started = start if stage.started is None else min(stage.started, start)
+                stage.finished = finished if stage.finished is None else max(stage.finished, finished)
+                stage.busy_time += finished - start
+                stage.latencies.record(finished - start)
+                if failure is None:
+                    stage.items += 1
+                else:
+                    stage.failures += 1
+                    stage.errors.append((getattr(item, 'url', item), failure))
+
+            if failure is None and output_queue is not None:
+                self._put(stage, output_queue, result)
+
+    def run(self, urls: Iterable[str]) -> PipelineStatistics:
+        statistics = PipelineStatistics(
+            stages={
+                FETCH: StageStatistics(name=FETCH, workers=self.fetch_workers),
+                PARSE: StageStatistics(name=PARSE, workers=self.parse_workers),
+                OUTPUT: StageStatistics(name=OUTPUT, workers=1),
+            }
+        )
+        url_queue = queue.Queue(maxsize=self.queue_size)
+        page_queue = queue.Queue(maxsize=self.queue_size)
+        result_queue = queue.Queue(maxsize=self.queue_size)
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as executor:
+            # Start the processes now, forking them later would copy the state of the running threads.
+            for _ in executor.map(int, range(self.parse_workers)):
+                pass
+
+            def parse(page: FetchedPage) -> ParsedPage:
+                links = []
+                if page.html:
+                    links = executor.submit(parse_page, page.url, page.body, page.encoding, self.backend).result()
+                return ParsedPage(url=page.url, status=page.status, links=links, submitted=page.submitted)
+
+            def output(page: ParsedPage):
+                if self.on_page is not None:
+                    self.on_page(page.url, page.status, page.links)
+                statistics.end_to_end.record(time.perf_counter() - page.submitted)
+
+            def start_workers(
+                count: int,
+                stage: StageStatistics,
+                input_queue: queue.Queue,
+                output_queue: Optional[queue.Queue],
+                process: Callable[[Any], Any],
+            ) -> List[threading.Thread]:
+                threads = [
+                    threading.Thread(
+                        target=self._run_stage, args=(stage, input_queue, output_queue, process), daemon=True
+                    )
+                    for _ in range(count)
+                ]
+                for thread in threads:
+                    thread.start()
+                return threads
+
+            start = time.perf_counter()
+            stages = [
+                (start_workers(self.fetch_workers, statistics.stages[FETCH], url_queue, page_queue, self.fetch),
+                 page_queue, self.parse_workers),
+                (start_workers(self.parse_workers, statistics.stages[PARSE], page_queue, result_queue, parse),
+                 result_queue, 1),
+                (start_workers(1, statistics.stages[OUTPUT], result_queue, None, output), None, 0),
+            ]
+
+            for url in urls:
+                url_queue.put(url)
+            for _ in range(self.fetch_workers):
+                url_queue.put(STOP)
+            # Once all the workers of a stage are done nothing more comes to the next stage, stop its workers.
+            for threads, next_queue, next_workers in stages:
+                for thread in threads:
+                    thread.join()
+                for _ in range(next_workers):
+                    next_queue.put(STOP)
+            statistics.elapsed = time.perf_counter() - start
+
+        self.connection_pool.close()
+        return statistics
+
+
+def main(arguments: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Fetch pages and extract their links in a staged pipeline.')
+    parser.add_argument('urls', nargs='+')
+    parser.add_argument('--fetch-workers', type=int, default=16)
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--quiet', action='store_true', help='Print only the statistics, not the links.')
+    parsed_arguments = parser.parse_args(arguments)
+
+    def print_page(url: str, status: int, links: List[str]):
+        print(f'{status} {url} ({len(links)} links)')
+        for link in links:
+            print(f'    {link}')
+
+    pipeline = Pipeline(
+        fetch_workers=parsed_arguments.fetch_workers,
+        parse_workers=parsed_arguments.parse_workers,
+        queue_size=parsed_arguments.queue_size,
+        on_page=None if parsed_arguments.quiet else print_page,
+    )
+    statistics = pipeline.run(parsed_arguments.urls)
+    print(f'Processed {len(parsed_arguments.urls)} URLs in {statistics.elapsed:.2f}s')
+    print(statistics.report())
+
+
+if __name__ == '__main__':
+    main()
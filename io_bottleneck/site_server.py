@@ -0,0 +1,62 @@
+"""
+Synthetic site served locally for the tests, see the site_server fixture in conftest.py.
+"""
+import time
+from typing import Dict, List, Tuple
+
+from test_support.http_server import LocalHTTPServer, QuietRequestHandler
+
+
+def synthetic_site(number_of_pages: int, links_per_page: int = 3) -> Dict[str, bytes]:
+    """
+    Pages /page/0 ... /page/{number_of_pages - 1} forming a tree, page i links to its children, back to the root (in a
+    differently spelled form), to itself with a fragment and to an external site.
+    """
+    pages = {}
+    for i in range(number_of_pages):
+        children = [
+            child for child in range(i * links_per_page + 1, i * links_per_page + links_per_page + 1)
+            if child < number_of_pages
+        ]
+        links = ''.join(f'<li><a href="/page/{child}">Page {child}</a></li>' for child in children)
+        pages[f'/page/{i}'] = (
+            f'<!DOCTYPE html><html><head><title>Page {i}</title></head><body><ul>{links}</ul>'
+            f'<a href="../page/0">Home</a> <a href="#top">Top</a> <a href="/page/{i}#section">Self</a>'
+            f'<a href="http://external.example.com/">External</a> <a href="mailto:page{i}@example.com">Mail</a>'
+            f'</body></html>'
+        ).encode()
+    return pages
+
+
+class SiteRequestHandler(QuietRequestHandler):
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append((time.monotonic(), self.path))
+
+        raw_response = self.server.raw_responses.get(self.path)
+        if raw_response is not None:
+            self.wfile.write(raw_response)
+            self.close_connection = True
+            return
+
+        page = self.server.pages.get(self.path)
+        if page is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+
+class SiteServer(LocalHTTPServer):
+    """
+    Serves a synthetic site and records the (time, path) of every request.
+    """
+    def __init__(self):
+        super().__init__(SiteRequestHandler)
+        self.pages: Dict[str, bytes] = {}
+        self.requests: List[Tuple[float, str]] = []
+        # Bytes sent as they are, status line and headers included, before the connection is closed.
+        self.raw_responses: Dict[str, bytes] = {}
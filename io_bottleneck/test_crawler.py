@@ -0,0 +1,137 @@
+from collections import Counter
+
+from io_bottleneck.crawler import BloomFilter, Crawler, ExactSeenSet, Frontier, normalize_url
+from io_bottleneck.site_server import synthetic_site
+
+
+class TestNormalizeUrl:
+    def test_canonical_form(self):
+        assert normalize_url('HTTP://Example.COM:80') == 'http://example.com/'
+        assert normalize_url('https://example.com:8443/a?b=1#c') == 'https://example.com:8443/a?b=1'
+
+    def test_resolves_relative_links(self):
+        assert normalize_url('../b/c.html', base='http://example.com/a/d/') == 'http://example.com/a/b/c.html'
+        assert normalize_url('#top', base='http://example.com/a') == 'http://example.com/a'
+
+    def test_rejects_other_schemes(self):
+        assert normalize_url('mailto:someone@example.com') is None
+        assert normalize_url('javascript:void(0)', base='http://example.com/') is None
+
+
+class TestSeenSets:
+    def test_exact_seen_set(self):
+        seen = ExactSeenSet()
+
+        assert seen.add('http://example.com/')
+        assert not seen.add('http://example.com/')
+        assert len(seen) == 1
+
+    def test_bloom_filter_has_no_false_negatives_and_few_false_positives(self):
+        bloom_filter = BloomFilter(capacity=10000, false_positive_rate=0.01)
+        urls = [f'http://example.com/{i}' for i in range(10000)]
+
+        for url in urls[:5000]:
+            bloom_filter.add(url)
+
+        assert not any(bloom_filter.add(url) for url in urls[:5000])
+        false_positives = sum(not bloom_filter.add(url) for url in urls[5000:])
+
+        assert false_positives < 5000 * 0.01 * 2
+        assert len(bloom_filter.bits) == (bloom_filter.number_of_bits + 7) // 8
+
+
+class TestFrontier:
+    def test_bounded(self):
+        frontier = Frontier(max_size=2)
+
+        assert frontier.push('http://a.com/1')
+        assert frontier.push('http://a.com/2')
+        assert not frontier.push('http://a.com/3')
+
+    def test_round_robin_over_hosts(self):
+        frontier = Frontier(max_size=10, max_per_host=10)
+        for url in ['http://a.com/1', 'http://a.com/2', 'http://b.com/1']:
+            frontier.push(url)
+
+        assert [frontier.pop() for _ in range(3)] == ['http://a.com/1', 'http://b.com/1', 'http://a.com/2']
+
+    def test_pop_returns_none_when_nothing_is_left(self):
+        frontier = Frontier(max_size=10)
+        frontier.push('http://a.com/1')
+
+        url = frontier.pop()
+        frontier.done(url)
+
+        assert frontier.pop() is None
+
+
+class TestCrawler:
+    def test_crawls_every_page_once(self, site_server):
+        site_server.pages = synthetic_site(200)
+        crawled = []
+        crawler = Crawler(max_workers=8, on_page=lambda url, status, links: crawled.append(url))
+
+        statistics = crawler.crawl([site_server.url('/page/0')])
+
+        assert statistics.pages == 200
+        assert statistics.failures == 0
+        assert sorted(crawled) == sorted(site_server.url(path) for path in site_server.pages)
+        assert Counter(path for _, path in site_server.requests).most_common(1)[0][1] == 1
+        assert statistics.pages_per_second > 0
+
+    def test_stops_after_max_pages(self, site_server):
+        site_server.pages = synthetic_site(200)
+        crawler = Crawler(max_workers=4, max_pages=20)
+
+        statistics = crawler.crawl([site_server.url('/page/0')])
+
+        # The workers which were already fetching finish their page.
+        assert 20 <= statistics.pages < 24
+
+    def test_full_frontier_drops_links(self, site_server):
+        site_server.pages = synthetic_site(100, links_per_page=10)
+        crawler = Crawler(max_workers=1, max_frontier=5)
+
+        statistics = crawler.crawl([site_server.url('/page/0')])
+
+        assert statistics.dropped > 0
+        assert statistics.pages < 100
+
+    def test_per_host_politeness(self, site_server):
+        site_server.pages = synthetic_site(10)
+        crawler = Crawler(max_workers=4, max_per_host=1, per_host_delay=0.02)
+
+        crawler.crawl([site_server.url('/page/0')])
+
+        times = [request_time for request_time, _ in site_server.requests]
+        assert len(times) == 10
+        assert min(later - earlier for earlier, later in zip(times, times[1:])) >= 0.015
+
+    def test_crawls_with_bloom_filter(self, site_server):
+        site_server.pages = synthetic_site(100)
+        crawler = Crawler(max_workers=4, seen=BloomFilter(capacity=1000, false_positive_rate=0.001))
+
+        statistics = crawler.crawl([site_server.url('/page/0')])
+
+        # A false positive could skip a page, with this rate it is very unlikely for 100 pages.
+        assert statistics.pages >= 99
+
+    def test_errors_do_not_stop_the_crawl(self, site_server):
+        site_server.pages = synthetic_site(20)
+        # A chunked body cut off in the middle of a chunk.
+        site_server.raw_responses['/page/2'] = (
+            b'HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nTransfer-Encoding: chunked\r\n\r\n100\r\n<a href="/'
+        )
+
+        def on_page(url, status, links):
+            if url.endswith('/page/3'):
+                raise RuntimeError('on_page failed')
+
+        crawler = Crawler(max_workers=4, on_page=on_page)
+
+        statistics = crawler.crawl([site_server.url('/page/0')])
+
+        assert statistics.failures == 2
+        assert sorted(url for url, _ in statistics.errors) == [site_server.url('/page/2'), site_server.url('/page/3')]
+        # /page/2 failed and the links of both pages were lost: /page/7 to /page/12 were never found.
+        assert statistics.pages == 20 - 1 - 6
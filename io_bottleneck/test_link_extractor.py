@@ -0,0 +1,107 @@
+import io
+
+import pytest
+
+from io_bottleneck.link_extraction_benchmark import (
+    BEAUTIFUL_SOUP,
+    available_approaches,
+    chunks_of,
+    generate_page,
+    main,
+    measure,
+)
+from io_bottleneck.link_extractor import HTML_PARSER, LXML, etree, extract_links, iter_links, read_chunks
+
+BACKENDS = [
+    HTML_PARSER,
+    pytest.param(LXML, marks=pytest.mark.skipif(etree is None, reason='lxml is not installed')),
+]
+
+PAGE = (
+    '<html><head><title>Żółć</title></head><body><p><a href="/a">A</a><a name="anchor">No link</a>'
+    '<A HREF="b.html">B</A> <a href="/ż?x=1&amp;y=2">Ż</a><a href="">Empty</a></p></body></html>'
+).encode()
+LINKS = ['/a', 'b.html', '/ż?x=1&y=2']
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+class TestIterLinks:
+    def test_whole_page(self, backend):
+        assert list(iter_links([PAGE], encoding='utf-8', backend=backend)) == LINKS
+
+    def test_every_chunk_boundary(self, backend):
+        # Splits in the middle of the tags, the attributes and the multi byte characters.
+        for split in range(1, len(PAGE)):
+            chunks = [PAGE[:split], PAGE[split:]]
+            assert list(iter_links(chunks, encoding='utf-8', backend=backend)) == LINKS, split
+
+    def test_one_byte_at_a_time(self, backend):
+        chunks = [PAGE[index:index + 1] for index in range(len(PAGE))]
+
+        assert list(iter_links(chunks, encoding='utf-8', backend=backend)) == LINKS
+
+    def test_links_are_yielded_before_the_rest_is_read(self, backend):
+        page = generate_page(2000)
+        chunks_read = 0
+
+        def chunks():
+            nonlocal chunks_read
+            for chunk in chunks_of(page, chunk_size=4096):
+                chunks_read += 1
+                yield chunk
+
+        links = iter_links(chunks(), encoding='utf-8', backend=backend)
+        assert next(links) == '/articles/0?ref=list&page=0'
+        assert chunks_read < len(chunks_of(page, chunk_size=4096)) / 2
+        assert len(list(links)) == 1999
+
+    def test_declared_encoding(self, backend):
+        page = '<a href="/café">Café</a>'.encode('latin-1')
+
+        assert list(iter_links([page], encoding='latin-1', backend=backend)) == ['/café']
+
+    def test_unknown_encoding(self, backend):
+        assert list(iter_links([b'<a href="/a">A</a>'], encoding='no-such-charset', backend=backend)) == ['/a']
+
+    def test_empty(self, backend):
+        assert list(iter_links([], backend=backend)) == []
+
+
+class TestLinkExtractor:
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            iter_links([PAGE], backend='regex')
+
+    def test_extract_links(self):
+        assert extract_links(PAGE.decode()) == LINKS
+
+    def test_read_chunks(self):
+        data = bytes(range(256)) * 10
+
+        assert b''.join(read_chunks(io.BytesIO(data), chunk_size=100)) == data
+        assert list(map(len, read_chunks(io.BytesIO(data), chunk_size=1000, limit=2100))) == [1000, 1000, 100]
+
+
+class TestLinkExtractionBenchmark:
+    def test_every_approach_finds_the_same_links(self):
+        page = generate_page(500)
+
+        results = [measure(approach, page, repeats=1) for approach in available_approaches()]
+
+        assert {result.links for result in results} == {500}
+        assert all(result.elapsed > 0 and result.peak_memory > 0 for result in results)
+
+    def test_matches_beautiful_soup(self):
+        pytest.importorskip('bs4')
+        from io_bottleneck.link_extraction_benchmark import extract_with_beautiful_soup
+
+        page = generate_page(300)
+
+        assert extract_with_beautiful_soup(page) == list(iter_links(chunks_of(page), encoding='utf-8'))
+
+    def test_main(self, capsys):
+        main(['--links', '100', '--repeats', '1', '--approaches', HTML_PARSER])
+
+        output = capsys.readouterr().out
+        assert HTML_PARSER in output
+        assert BEAUTIFUL_SOUP not in output
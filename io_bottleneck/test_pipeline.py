@@ -0,0 +1,83 @@
+import time
+
+from io_bottleneck.pipeline import FETCH, OUTPUT, PARSE, LatencyHistogram, Pipeline, parse_page
+from io_bottleneck.site_server import synthetic_site
+
+
+class TestLatencyHistogram:
+    def test_buckets(self):
+        histogram = LatencyHistogram(number_of_buckets=5)
+
+        buckets = [histogram.bucket(seconds) for seconds in (0.0005, 0.001, 0.0015, 0.003, 0.007, 10)]
+
+        assert buckets == [0, 1, 1, 2, 3, 4]
+        assert histogram.bucket_bounds(0) == (0.0, 1.0)
+        assert histogram.bucket_bounds(3) == (4.0, 8.0)
+        assert histogram.bucket_bounds(4)[1] == float('inf')
+
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for _ in range(90):
+            histogram.record(0.0005)
+        for _ in range(10):
+            histogram.record(0.005)
+
+        assert histogram.count == 100
+        assert histogram.percentile(0.5) == 0.001
+        assert histogram.percentile(0.99) == 0.005
+        assert abs(histogram.mean - 0.00095) < 1e-9
+        assert '0-1 ms' in histogram.format()
+
+
+class TestPipeline:
+    def test_parse_page(self):
+        body = b'<a href="/b#x">B</a><a href="/b">B</a><a href="mailto:a@b.c">Mail</a><a href="c">C</a>'
+
+        assert parse_page('http://a.com/d/', body, None, 'html.parser') == ['http://a.com/b', 'http://a.com/d/c']
+
+    def test_processes_every_page(self, site_server):
+        site_server.pages = synthetic_site(30)
+        pages = {}
+        pipeline = Pipeline(
+            fetch_workers=4,
+            parse_workers=2,
+            queue_size=4,
+            on_page=lambda url, status, links: pages.update({url: links}),
+        )
+
+        urls = [site_server.url(path) for path in site_server.pages]
+        statistics = pipeline.run(urls + [site_server.url('/missing')])
+
+        assert sorted(pages) == sorted(urls + [site_server.url('/missing')])
+        assert site_server.url('/page/1') in pages[site_server.url('/page/0')]
+        assert pages[site_server.url('/missing')] == []
+        for stage in (FETCH, PARSE, OUTPUT):
+            assert statistics.stages[stage].items == 31
+            assert statistics.stages[stage].latencies.count == 31
+            assert statistics.stages[stage].throughput > 0
+        assert statistics.end_to_end.count == 31
+        assert 'Bottleneck' in statistics.report()
+
+    def test_failures_do_not_stop_the_pipeline(self, site_server):
+        site_server.pages = synthetic_site(5)
+        pipeline = Pipeline(fetch_workers=2, parse_workers=1, timeout=1)
+
+        statistics = pipeline.run(['http://127.0.0.1:1/'] + [site_server.url(path) for path in site_server.pages])
+
+        assert statistics.stages[FETCH].failures == 1
+        assert statistics.stages[FETCH].errors[0][0] == 'http://127.0.0.1:1/'
+        assert statistics.stages[OUTPUT].items == 5
+
+    def test_slow_stage_is_the_bottleneck(self, site_server):
+        site_server.pages = synthetic_site(20)
+        pipeline = Pipeline(
+            fetch_workers=4, parse_workers=1, queue_size=2, on_page=lambda url, status, links: time.sleep(0.02)
+        )
+
+        statistics = pipeline.run([site_server.url(path) for path in site_server.pages])
+
+        assert statistics.bottleneck == OUTPUT
+        assert statistics.stages[OUTPUT].utilization > 0.5
+        # The queues are bounded, the stages before the slow one wait for room instead of running ahead.
+        assert statistics.stages[PARSE].blocked_time > 0.1
+        assert all(stage.max_queue_depth <= 2 for stage in statistics.stages.values())
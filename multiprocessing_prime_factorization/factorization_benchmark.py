@@ -0,0 +1,219 @@
+"""
+Scaling benchmark of the factorization backends.
+
+sequential_prime_factorization.py and multiprocessed_prime_factorization.py factorize different amounts of numbers and
+time their printing too, so their timings can not be compared. Here every backend factorizes the same seeded set of
+numbers, without any output while the clock runs:
+
+- sequential - a plain loop, the baseline for the speedups.
+- threads - a ThreadPoolExecutor, the workers take turns on the GIL unless the interpreter is free-threaded.
+- processes - factorize_many, the timing includes starting the pool and pickling the numbers and the results.
+- free_threaded - the threads backend run by another, free-threaded interpreter (e.g. python3.13t) given with
+--free-threaded-python. It must be able to import this repository, the benchmark runs it from the repository root.
+
+For every backend and number of workers we report the best time out of the repeats, the speedup over the sequential
+run and the parallel efficiency (speedup / workers). A second table shows the sequential cost of a single number by its
+order of magnitude - when the numbers are cheap the processes spend their time on startup and pickling instead.
+
+The numbers are spread log-uniformly between --low and --high so that every order of magnitude is represented.
+
+Run it with:
+python -m multiprocessing_prime_factorization.factorization_benchmark --workers 1 2 4 8 --count 20000
+"""
+import argparse
+import json
+import math
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from multiprocessing_prime_factorization.factorization_engine import (
+    DEFAULT_STRATEGY,
+    STRATEGIES,
+    calculate_prime_factors,
+)
+from multiprocessing_prime_factorization.multiprocessed_prime_factorization import auto_chunksize, factorize_many
+
+SEQUENTIAL = 'sequential'
+THREADS = 'threads'
+PROCESSES = 'processes'
+FREE_THREADED = 'free_threaded'
+BACKENDS = (SEQUENTIAL, THREADS, PROCESSES, FREE_THREADED)
+
+REPOSITORY_ROOT = Path(__file__).resolve().parents[1]
+
+
+@dataclass
+class RunResult:
+    backend: str
+    workers: int
+    elapsed: float
+
+    def speedup(self, baseline: float) -> float:
+        return baseline / self.elapsed if self.elapsed else 0.0
+
+    def efficiency(self, baseline: float) -> float:
+        return self.speedup(baseline) / self.workers
+
+
+def gil_enabled() -> bool:
+    # sys._is_gil_enabled only exists from Python 3.13 on, older interpreters always have the GIL.
+    return getattr(sys, '_is_gil_enabled', lambda: True)()
+
+
+def generate_numbers(count: int, low: int, high: int, seed: int = 0) -> List[int]:
+    generator = random.Random(seed)
+    low_exponent, high_exponent = math.log10(low), math.log10(high)
+    return [
+        min(high, max(low, round(10 ** generator.uniform(low_exponent, high_exponent)))) for _ in range(count)
+    ]
+
+
+def run_sequential(numbers: Sequence[int], workers: int, strategy: str):
+    for number in numbers:
+        calculate_prime_factors(number, strategy=strategy)
+
+
+def _factorize_chunk(chunk: Sequence[int], strategy: str):
+    for number in chunk:
+        calculate_prime_factors(number, strategy=strategy)
+
+
+def run_threads(numbers: Sequence[int], workers: int, strategy: str):
+    chunksize = auto_chunksize(number_of_items=len(numbers), workers=workers)
+    chunks = [numbers[start:start + chunksize] for start in range(0, len(numbers), chunksize)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in executor.map(_factorize_chunk, chunks, [strategy] * len(chunks)):
+            pass
+
+
+def run_processes(numbers: Sequence[int], workers: int, strategy: str):
+    for _ in factorize_many(numbers, workers=workers, strategy=strategy):
+        pass
+
+
+RUNNERS: Dict[str, Callable[[Sequence[int], int, str], None]] = {
+    SEQUENTIAL: run_sequential,
+    THREADS: run_threads,
+    PROCESSES: run_processes,
+}
+
+
+def measure(backend: str, numbers: Sequence[int], workers: int, strategy: str, repeats: int) -> RunResult:
+    runner = RUNNERS[backend]
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        runner(numbers, workers, strategy)
+        best = min(best, time.perf_counter() - start)
+    return RunResult(backend=backend, workers=workers, elapsed=best)
+
+
+def measure_free_threaded(python: str, arguments: argparse.Namespace) -> List[RunResult]:
+    """
+    Run the threads backend with another interpreter, it reports its results as JSON.
+    """
+    command = [
+        python, '-m', __spec__.name,
+        '--backends', THREADS,
+        '--workers', *map(str, arguments.workers),
+        '--count', str(arguments.count),
+        '--low', str(arguments.low),
+        '--high', str(arguments.high),
+        '--seed', str(arguments.seed),
+        '--strategy', arguments.strategy,
+        '--repeats', str(arguments.repeats),
+        '--json',
+    ]
+    completed = subprocess.run(command, cwd=REPOSITORY_ROOT, capture_output=True, text=True, check=True)
+    report = json.loads(completed.stdout)
+    if report['gil_enabled']:
+        raise RuntimeError(f'{python} is not a free-threaded interpreter, it runs with the GIL enabled.')
+    results = [RunResult(**result) for result in report['results']]
+    for result in results:
+        result.backend = FREE_THREADED
+    return results
+
+
+def cost_by_magnitude(numbers: Sequence[int], strategy: str) -> List[Tuple[int, int, float]]:
+    """
+    Return (order of magnitude, count of numbers, mean seconds per number) for every order of magnitude present.
+    """
+    timings = defaultdict(list)
+    for number in numbers:
+        start = time.perf_counter()
+        calculate_prime_factors(number, strategy=strategy)
+        timings[len(str(number)) - 1].append(time.perf_counter() - start)
+    return [
+        (magnitude, len(timings[magnitude]), sum(timings[magnitude]) / len(timings[magnitude]))
+        for magnitude in sorted(timings)
+    ]
+
+
+def format_result(result: RunResult, baseline: float) -> str:
+    return (
+        f'{result.backend:<16}{result.workers:>8}{result.elapsed:>12.3f}{result.speedup(baseline):>10.2f}'
+        f'{result.efficiency(baseline):>12.2f}'
+    )
+
+
+HEADER = f'{"backend":<16}{"workers":>8}{"time [s]":>12}{"speedup":>10}{"efficiency":>12}'
+MAGNITUDE_HEADER = f'{"magnitude":<12}{"numbers":>10}{"cost [us]":>12}'
+
+
+def main(arguments: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Compare how the factorization backends scale with the workers.')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=[SEQUENTIAL, THREADS, PROCESSES])
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, 2, 4, 8])
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--low', type=int, default=10 ** 4)
+    parser.add_argument('--high', type=int, default=10 ** 12)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--strategy', choices=STRATEGIES, default=DEFAULT_STRATEGY)
+    parser.add_argument('--repeats', type=int, default=3, help='The best time out of the repeats is reported.')
+    parser.add_argument('--free-threaded-python', default=None, help='Interpreter for the free_threaded backend.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON instead of tables.')
+    parsed_arguments = parser.parse_args(arguments)
+
+    numbers = generate_numbers(
+        count=parsed_arguments.count, low=parsed_arguments.low, high=parsed_arguments.high, seed=parsed_arguments.seed
+    )
+    results = []
+    for backend in parsed_arguments.backends:
+        if backend == FREE_THREADED:
+            if parsed_arguments.free_threaded_python is None:
+                parser.error('the free_threaded backend needs --free-threaded-python')
+            results.extend(measure_free_threaded(parsed_arguments.free_threaded_python, parsed_arguments))
+            continue
+        # More workers make no difference to the sequential loop.
+        for workers in [1] if backend == SEQUENTIAL else parsed_arguments.workers:
+            results.append(measure(backend, numbers, workers, parsed_arguments.strategy, parsed_arguments.repeats))
+
+    if parsed_arguments.json:
+        print(json.dumps({'gil_enabled': gil_enabled(), 'results': [asdict(result) for result in results]}))
+        return
+
+    baseline = next((result for result in results if result.backend == SEQUENTIAL), None)
+    if baseline is None:
+        baseline = measure(SEQUENTIAL, numbers, 1, parsed_arguments.strategy, parsed_arguments.repeats)
+
+    print(f'{len(numbers)} numbers between {parsed_arguments.low} and {parsed_arguments.high}')
+    print(f'GIL enabled: {gil_enabled()}')
+    print(HEADER)
+    for result in results:
+        print(format_result(result, baseline.elapsed))
+
+    print()
+    print(MAGNITUDE_HEADER)
+    for magnitude, count, cost in cost_by_magnitude(numbers, parsed_arguments.strategy):
+        print(f'{"10^" + str(magnitude):<12}{count:>10}{cost * 1e6:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""
+Memoizing caches for prime factorizations.
+
+- LruFactorizationCache is a bounded least recently used cache living in a single process, safe to use from threads.
+- SharedFactorizationCache lives in a shared memory block, so all the worker processes of a pool read and fill the same
+cache. It does not need a multiprocessing.Manager (and its server process), the workers access the memory directly.
+
+Both count their hits, misses and evictions, see statistics(), so their size can be tuned for the workload.
+An LruFactorizationCache handed to worker processes is copied into each of them, so every worker has its own entries
+and its own counters, which never reach the parent. The counters of a SharedFactorizationCache are shared by all.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from multiprocessing import Lock as ProcessLock
+from multiprocessing.shared_memory import SharedMemory
+from threading import Lock
+from typing import List, Optional
+
+from multiprocessing_prime_factorization.factorization_engine import DEFAULT_STRATEGY, calculate_prime_factors
+
+# Fibonacci hashing multiplier (2^64 / golden ratio), spreads consecutive and evenly spaced numbers over the slots.
+FIBONACCI_HASH_MULTIPLIER = 11400714819323198485
+UINT64_LIMIT = 1 << 64
+
+
+@dataclass
+class CacheStatistics:
+    hits: int
+    misses: int
+    evictions: int
+
+
+class FactorizationCache(ABC):
+    @abstractmethod
+    def get(self, n: int) -> Optional[List[int]]:
+        pass
+
+    @abstractmethod
+    def put(self, n: int, prime_factors: List[int]):
+        pass
+
+    @abstractmethod
+    def statistics(self) -> CacheStatistics:
+        pass
+
+    def factorize(self, n: int, strategy: str = DEFAULT_STRATEGY) -> List[int]:
+        prime_factors = self.get(n)
+        if prime_factors is None:
+            prime_factors = calculate_prime_factors(n, strategy=strategy)
+            self.put(n, prime_factors)
+        return prime_factors
+
+
+class LruFactorizationCache(FactorizationCache):
+    """
+    Pickles without its lock, so it can be passed to worker processes started with spawn or forkserver too. Each worker
+    gets a copy, with its own entries and statistics.
+    """
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self.entries: 'OrderedDict[int, tuple]' = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    def get(self, n: int) -> Optional[List[int]]:
+        with self.lock:
+            prime_factors = self.entries.get(n)
+            if prime_factors is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(n)
+            self.hits += 1
+        return list(prime_factors)
+
+    def put(self, n: int, prime_factors: List[int]):
+        with self.lock:
+            self.entries[n] = tuple(prime_factors)
+            self.entries.move_to_end(n)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def statistics(self) -> CacheStatistics:
+        with self.lock:
+            return CacheStatistics(hits=self.hits, misses=self.misses, evictions=self.evictions)
+
+
+class SharedFactorizationCache(FactorizationCache):
+    """
+    Direct mapped hash table in shared memory.
+
+    The block starts with the hits, misses and evictions counters followed by the slots, every slot holding a number
+    and its smallest prime factor as two uint64 values (a number of 0 marks an empty slot). A factorization is stored
+    as a chain - n, n / p1, n / (p1 * p2), ... each with its own smallest prime factor - so every slot has the same
+    size, and numbers sharing a cofactor share the tail of their chain. A number hashing to a taken slot evicts the
+    previous one, a lookup which runs into an evicted link of a chain is a miss.
+
+    Create the cache in the parent process and pass it to the workers (e.g. through the pool initializer), they
+    attach to the same block. Only the process which created the cache should call unlink().
+    """
+    HEADER_SLOTS = 2
+
+    def __init__(self, shared_memory: SharedMemory, number_of_slots: int, lock):
+        self.shared_memory = shared_memory
+        self.number_of_slots = number_of_slots
+        self.slot_bits = number_of_slots.bit_length() - 1
+        self.lock = lock
+        self.words = shared_memory.buf.cast('Q')
+
+    @classmethod
+    def create(cls, number_of_slots: int = 1 << 20) -> 'SharedFactorizationCache':
+        if number_of_slots < 2 or number_of_slots & (number_of_slots - 1):
+            raise ValueError('The number of slots must be a power of two.')
+        size = (cls.HEADER_SLOTS + number_of_slots) * 2 * 8
+        return cls(
+            shared_memory=SharedMemory(create=True, size=size), number_of_slots=number_of_slots, lock=ProcessLock()
+        )
+
+    @classmethod
+    def attach(cls, name: str, number_of_slots: int, lock) -> 'SharedFactorizationCache':
+        try:
+            shared_memory = SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13 attaching always registers the block with the resource tracker. The workers of a pool
+            # share the tracker of their parent, so this just repeats the registration made by create().
+            shared_memory = SharedMemory(name=name)
+        return cls(shared_memory=shared_memory, number_of_slots=number_of_slots, lock=lock)
+
+    def __getstate__(self):
+        return {'name': self.shared_memory.name, 'number_of_slots': self.number_of_slots, 'lock': self.lock}
+
+    def __setstate__(self, state):
+        attached = self.attach(**state)
+        self.__dict__.update(attached.__dict__)
+
+    def _slot_index(self, n: int) -> int:
+        slot = (n * FIBONACCI_HASH_MULTIPLIER % UINT64_LIMIT) >> (64 - self.slot_bits)
+        return 2 * (self.HEADER_SLOTS + slot)
+
+    def get(self, n: int) -> Optional[List[int]]:
+        if not 2 <= n < UINT64_LIMIT:
+            return None
+
+        words = self.words
+        prime_factors = []
+        with self.lock:
+            remaining = n
+            while remaining > 1:
+                index = self._slot_index(remaining)
+                if words[index] != remaining:
+                    words[1] += 1
+                    return None
+                smallest_prime_factor = words[index + 1]
+                prime_factors.append(smallest_prime_factor)
+                remaining //= smallest_prime_factor
+            words[0] += 1
+        return prime_factors
+
+    def put(self, n: int, prime_factors: List[int]):
+        if not 2 <= n < UINT64_LIMIT:
+            return
+
+        words = self.words
+        with self.lock:
+            remaining = n
+            for prime_factor in prime_factors:
+                index = self._slot_index(remaining)
+                if words[index] not in (0, remaining):
+                    words[2] += 1
+                words[index] = remaining
+                words[index + 1] = prime_factor
+                remaining //= prime_factor
+
+    def statistics(self) -> CacheStatistics:
+        with self.lock:
+            return CacheStatistics(hits=self.words[0], misses=self.words[1], evictions=self.words[2])
+
+    def close(self):
+        self.words.release()
+        self.shared_memory.close()
+
+    def unlink(self):
+        self.shared_memory.unlink()
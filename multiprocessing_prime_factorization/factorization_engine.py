@@ -0,0 +1,236 @@
+"""
+Prime factorization strategies.
+
+The original calculate_prime_factors tries to divide by every integer up to the square root of n, even numbers
+included, so a semiprime around 10^8 costs around 10^4 divisions and numbers above 10^12 are out of reach.
+The strategies available here are:
+
+- trial_division - the original algorithm, kept as the reference.
+- sieve - trial division by a precomputed table of small primes only, continuing with odd numbers for the (rare)
+cofactors which do not fit in the table.
+- pollard_rho - strips the small prime factors by trial division and splits whatever is left with Brent's variant of
+Pollard's rho, using a Miller-Rabin test to stop as soon as a factor is prime. Perfect powers are split by taking their
+integer root first, rho practically never separates the equal factors of p^k.
+- auto - sieve while trial division by the table is guaranteed to finish the job, pollard_rho above that.
+
+All strategies return the prime factors in ascending order, with multiplicity, exactly like the original function.
+"""
+from math import gcd, isqrt
+from typing import Callable, Dict, List, Optional, Tuple
+
+SMALL_PRIME_LIMIT = 1 << 16
+# Trial division only strips the factors below this bound before handing over to Pollard's rho.
+POLLARD_TRIAL_DIVISION_LIMIT = 1000
+# Number of steps between gcd computations in Brent's cycle detection.
+POLLARD_BATCH_SIZE = 128
+# With these bases the Miller-Rabin test is deterministic for every n < 3.3 * 10^24.
+MILLER_RABIN_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
+
+def sieve_primes(limit: int) -> List[int]:
+    """
+    Sieve of Eratosthenes, returns all primes <= limit.
+    """
+    if limit < 2:
+        return []
+
+    is_prime = bytearray([1]) * (limit + 1)
+    is_prime[0] = is_prime[1] = 0
+    for number in range(2, isqrt(limit) + 1):
+        if is_prime[number]:
+            is_prime[number * number::number] = bytes(len(range(number * number, limit + 1, number)))
+    return [number for number, prime in enumerate(is_prime) if prime]
+
+
+SMALL_PRIMES = sieve_primes(SMALL_PRIME_LIMIT)
+POLLARD_TRIAL_DIVISION_PRIMES = [prime for prime in SMALL_PRIMES if prime < POLLARD_TRIAL_DIVISION_LIMIT]
+
+
+def trial_division_factors(n: int) -> List[int]:
+    prime_factors = []
+    d = 2
+    while d * d <= n:
+        while (n % d) == 0:
+            prime_factors.append(d)
+            n //= d
+        d += 1
+
+    if n > 1:
+        prime_factors.append(n)
+
+    return prime_factors
+
+
+def _strip_small_factors(n: int, primes: List[int], prime_factors: List[int]) -> int:
+    """
+    Divide out the given primes, appending them to prime_factors, and return the remaining cofactor.
+    """
+    for prime in primes:
+        if prime * prime > n:
+            break
+        if n % prime == 0:
+            n //= prime
+            prime_factors.append(prime)
+            while n % prime == 0:
+                n //= prime
+                prime_factors.append(prime)
+    return n
+
+
+def sieve_factors(n: int) -> List[int]:
+    prime_factors = []
+    n = _strip_small_factors(n, SMALL_PRIMES, prime_factors)
+
+    # Only reached when n has a prime factor above the table, fall back to the odd numbers past it.
+    d = SMALL_PRIMES[-1] + 2
+    while d * d <= n:
+        while n % d == 0:
+            prime_factors.append(d)
+            n //= d
+        d += 2
+
+    if n > 1:
+        prime_factors.append(n)
+
+    return prime_factors
+
+
+def is_probable_prime(n: int) -> bool:
+    """
+    Miller-Rabin primality test, deterministic for n < 3.3 * 10^24 and with a negligible error above that.
+    """
+    if n < 2:
+        return False
+    for prime in MILLER_RABIN_BASES:
+        if n % prime == 0:
+            return n == prime
+
+    d = n - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    for base in MILLER_RABIN_BASES:
+        x = pow(base, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def pollard_brent(n: int) -> int:
+    """
+    Return a non trivial factor of the composite number n using Brent's variant of Pollard's rho.
+    """
+    if n % 2 == 0:
+        return 2
+
+    # Every constant c defines a different pseudo random sequence, retry with the next one if the cycle hides the
+    # factor (gcd ends up being n itself).
+    c = 1
+    while True:
+        y, r, q, factor = 2, 1, 1, 1
+        x = saved_y = y
+        while factor == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and factor == 1:
+                saved_y = y
+                for _ in range(min(POLLARD_BATCH_SIZE, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                factor = gcd(q, n)
+                k += POLLARD_BATCH_SIZE
+            r *= 2
+
+        if factor == n:
+            # The batched gcd overshot, walk the last batch again one step at a time.
+            factor = 1
+            while factor == 1:
+                saved_y = (saved_y * saved_y + c) % n
+                factor = gcd(abs(x - saved_y), n)
+
+        if factor != n:
+            return factor
+        c += 1
+
+
+def integer_root(n: int, k: int) -> int:
+    """
+    Largest r with r^k <= n, by Newton's method on integers.
+    """
+    if k == 2:
+        return isqrt(n)
+    root = 1 << -(-n.bit_length() // k)
+    while True:
+        next_root = ((k - 1) * root + n // root ** (k - 1)) // k
+        if next_root >= root:
+            return root
+        root = next_root
+
+
+def perfect_power(n: int) -> Optional[Tuple[int, int]]:
+    """
+    (root, k) with root^k == n for the smallest prime k, or None. Only for n without prime factors below the trial
+    division limit, which bounds k by the bit length of n over the bit length of the limit.
+    """
+    for k in sieve_primes(n.bit_length() // (POLLARD_TRIAL_DIVISION_LIMIT.bit_length() - 1)):
+        root = integer_root(n, k)
+        if root ** k == n:
+            return root, k
+    return None
+
+
+def pollard_rho_factors(n: int) -> List[int]:
+    prime_factors = []
+    n = _strip_small_factors(n, POLLARD_TRIAL_DIVISION_PRIMES, prime_factors)
+
+    cofactors = [n] if n > 1 else []
+    while cofactors:
+        cofactor = cofactors.pop()
+        if cofactor < POLLARD_TRIAL_DIVISION_LIMIT ** 2 or is_probable_prime(cofactor):
+            # Everything below the square of the trial division limit has no factors left to strip.
+            prime_factors.append(cofactor)
+            continue
+        power = perfect_power(cofactor)
+        if power is not None:
+            root, k = power
+            cofactors.extend([root] * k)
+            continue
+        factor = pollard_brent(cofactor)
+        cofactors.append(factor)
+        cofactors.append(cofactor // factor)
+
+    prime_factors.sort()
+    return prime_factors
+
+
+def auto_factors(n: int) -> List[int]:
+    if n < SMALL_PRIME_LIMIT * SMALL_PRIME_LIMIT:
+        return sieve_factors(n)
+    return pollard_rho_factors(n)
+
+
+STRATEGIES: Dict[str, Callable[[int], List[int]]] = {
+    'trial_division': trial_division_factors,
+    'sieve': sieve_factors,
+    'pollard_rho': pollard_rho_factors,
+    'auto': auto_factors,
+}
+DEFAULT_STRATEGY = 'auto'
+
+
+def calculate_prime_factors(n: int, strategy: str = DEFAULT_STRATEGY) -> List[int]:
+    try:
+        factorize = STRATEGIES[strategy]
+    except KeyError:
+        raise ValueError(f'Unknown factorization strategy: {strategy}, choose one of: {", ".join(STRATEGIES)}')
+    return factorize(n)
@@ -0,0 +1,229 @@
+"""
+Streaming factorization of numbers read from a file or stdin.
+
+The numbers (whitespace separated, any number per line) are read lazily and sent to the worker pool in chunks. At most
+max_in_flight chunks are queued or being factorized at any time - reading stops until a chunk comes back - so the memory
+use stays flat however large the input is. The results are written as soon as their chunk is done, either in the input
+order or, with --unordered, in the order the chunks complete.
+
+Output formats:
+- ndjson - one {"n": 12, "factors": [2, 2, 3]} JSON object per line.
+- binary - per number a little endian uint64 with the number, a uint8 with the number of factors and a uint64 per
+factor. Only numbers below 2^64 can be written, see read_binary_results for reading it back.
+
+Example:
+python -m multiprocessing_prime_factorization.factorization_stream numbers.txt -o factors.ndjson --workers 4
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+from collections import deque
+from functools import partial
+from itertools import islice
+from multiprocessing import Pool
+from queue import SimpleQueue
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from multiprocessing_prime_factorization.factorization_cache import FactorizationCache, SharedFactorizationCache
+from multiprocessing_prime_factorization.factorization_engine import DEFAULT_STRATEGY, STRATEGIES
+from multiprocessing_prime_factorization.multiprocessed_prime_factorization import (
+    check_spf_table,
+    factorize_number,
+    initialize_worker,
+)
+
+DEFAULT_CHUNK_SIZE = 1024
+# Number of in flight chunks per worker, one being factorized and one waiting so the worker never idles.
+IN_FLIGHT_CHUNKS_PER_WORKER = 2
+
+BINARY_HEADER = struct.Struct('<QB')
+BINARY_FACTOR = struct.Struct('<Q')
+
+
+def read_numbers(stream: TextIO) -> Iterator[int]:
+    for line_number, line in enumerate(stream, start=1):
+        for token in line.split():
+            try:
+                yield int(token)
+            except ValueError:
+                raise ValueError(f'Line {line_number}: {token!r} is not an integer.') from None
+
+
+def chunked(numbers: Iterable[int], chunk_size: int) -> Iterator[List[int]]:
+    numbers = iter(numbers)
+    while True:
+        chunk = list(islice(numbers, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def factorize_chunk(chunk: List[int], strategy: str = DEFAULT_STRATEGY) -> List[List[int]]:
+    # Only the factors go back to the parent, it still has the numbers.
+    return [factorize_number(number, strategy=strategy)[1] for number in chunk]
+
+
+def factorize_stream(
+    numbers: Iterable[int],
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_in_flight: Optional[int] = None,
+    ordered: bool = True,
+    strategy: str = DEFAULT_STRATEGY,
+    spf_table_path: Optional[str] = None,
+    cache: Optional[FactorizationCache] = None,
+) -> Iterator[Tuple[int, List[int]]]:
+    """
+    Like factorize_many, but the numbers are only pulled from the iterable when there is room for another chunk, while
+    Pool.imap reads the whole input up front. A missing or broken SPF table raises right away, like in factorize_many.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or IN_FLIGHT_CHUNKS_PER_WORKER * workers
+    if spf_table_path is not None:
+        check_spf_table(spf_table_path)
+    return _stream_on_pool(numbers, workers, chunk_size, max_in_flight, ordered, strategy, spf_table_path, cache)
+
+
+def _stream_on_pool(
+    numbers: Iterable[int],
+    workers: int,
+    chunk_size: int,
+    max_in_flight: int,
+    ordered: bool,
+    strategy: str,
+    spf_table_path: Optional[str],
+    cache: Optional[FactorizationCache],
+) -> Iterator[Tuple[int, List[int]]]:
+    factorize = partial(factorize_chunk, strategy=strategy)
+
+    with Pool(processes=workers, initializer=initialize_worker, initargs=(spf_table_path, cache)) as pool:
+        if ordered:
+            pending = deque()
+            for chunk in chunked(numbers, chunk_size):
+                if len(pending) == max_in_flight:
+                    done_chunk, result = pending.popleft()
+                    yield from zip(done_chunk, result.get())
+                pending.append((chunk, pool.apply_async(factorize, (chunk,))))
+            while pending:
+                done_chunk, result = pending.popleft()
+                yield from zip(done_chunk, result.get())
+            return
+
+        # The callbacks run on the result handler thread of the pool as soon as a chunk is done.
+        completed = SimpleQueue()
+        in_flight = 0
+
+        def next_completed() -> Iterator[Tuple[int, List[int]]]:
+            done_chunk, prime_factors = completed.get()
+            if isinstance(prime_factors, BaseException):
+                raise prime_factors
+            return zip(done_chunk, prime_factors)
+
+        for chunk in chunked(numbers, chunk_size):
+            if in_flight == max_in_flight:
+                yield from next_completed()
+                in_flight -= 1
+
+            def on_done(outcome, done_chunk=chunk):
+                completed.put((done_chunk, outcome))
+
+            pool.apply_async(factorize, (chunk,), callback=on_done, error_callback=on_done)
+            in_flight += 1
+        for _ in range(in_flight):
+            yield from next_completed()
+
+
+def write_ndjson(results: Iterable[Tuple[int, List[int]]], stream: BinaryIO):
+    for number, prime_factors in results:
+        stream.write(json.dumps({'n': number, 'factors': prime_factors}).encode() + b'\n')
+
+
+def write_binary(results: Iterable[Tuple[int, List[int]]], stream: BinaryIO):
+    for number, prime_factors in results:
+        if not 0 <= number < 1 << 64:
+            raise ValueError(f'{number} does not fit in the binary format, only numbers below 2^64 do.')
+        stream.write(BINARY_HEADER.pack(number, len(prime_factors)))
+        for prime_factor in prime_factors:
+            stream.write(BINARY_FACTOR.pack(prime_factor))
+
+
+def read_binary_results(stream: BinaryIO) -> Iterator[Tuple[int, List[int]]]:
+    while True:
+        header = stream.read(BINARY_HEADER.size)
+        if not header:
+            return
+        number, number_of_factors = BINARY_HEADER.unpack(header)
+        factors = stream.read(BINARY_FACTOR.size * number_of_factors)
+        yield number, [prime_factor for prime_factor, in BINARY_FACTOR.iter_unpack(factors)]
+
+
+WRITERS: Dict[str, Callable[[Iterable[Tuple[int, List[int]]], BinaryIO], None]] = {
+    'ndjson': write_ndjson,
+    'binary': write_binary,
+}
+
+
+def cache_slots(value: str) -> int:
+    """
+    Argument type of --cache-slots: 0 for no cache or the power of two SharedFactorizationCache.create accepts.
+    """
+    number_of_slots = int(value)
+    if number_of_slots != 0 and (number_of_slots < 2 or number_of_slots & (number_of_slots - 1)):
+        raise argparse.ArgumentTypeError(f'{value} is neither 0 nor a power of two of at least 2')
+    return number_of_slots
+
+
+def main(arguments: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Factorize the numbers read from a file (or stdin) in parallel.')
+    parser.add_argument('input', nargs='?', default='-', help='File with the numbers, - for stdin (the default).')
+    parser.add_argument('-o', '--output', default='-', help='File for the results, - for stdout (the default).')
+    parser.add_argument('--format', choices=WRITERS, default='ndjson')
+    parser.add_argument('--unordered', action='store_true', help='Write the results in completion order.')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--max-in-flight', type=int, default=None, help='Maximum number of chunks being processed.')
+    parser.add_argument('--strategy', choices=STRATEGIES, default=DEFAULT_STRATEGY)
+    parser.add_argument('--spf-table', default=None, help='Saved smallest prime factor table, see spf_table.py.')
+    parser.add_argument(
+        '--cache-slots',
+        type=cache_slots,
+        default=0,
+        help='Share a factorization cache with this many slots (a power of two) between workers.',
+    )
+    parsed_arguments = parser.parse_args(arguments)
+
+    input_stream = output_stream = cache = None
+    try:
+        input_stream = sys.stdin if parsed_arguments.input == '-' else open(parsed_arguments.input)
+        output_stream = sys.stdout.buffer if parsed_arguments.output == '-' else open(parsed_arguments.output, 'wb')
+        if parsed_arguments.cache_slots:
+            cache = SharedFactorizationCache.create(parsed_arguments.cache_slots)
+        results = factorize_stream(
+            read_numbers(input_stream),
+            workers=parsed_arguments.workers,
+            chunk_size=parsed_arguments.chunk_size,
+            max_in_flight=parsed_arguments.max_in_flight,
+            ordered=not parsed_arguments.unordered,
+            strategy=parsed_arguments.strategy,
+            spf_table_path=parsed_arguments.spf_table,
+            cache=cache,
+        )
+        WRITERS[parsed_arguments.format](results, output_stream)
+    except (OSError, ValueError) as error:
+        parser.exit(1, f'error: {error}\n')
+    finally:
+        if input_stream is not None and input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not None:
+            output_stream.flush()
+            if output_stream is not sys.stdout.buffer:
+                output_stream.close()
+        if cache is not None:
+            cache.close()
+            cache.unlink()
+
+
+if __name__ == '__main__':
+    main()
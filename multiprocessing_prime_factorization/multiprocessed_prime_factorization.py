@@ -1,47 +1,138 @@
+"""
+Factorizes random numbers on a pool of worker processes.
+
+Run it from the repository root with:
+python -m multiprocessing_prime_factorization.multiprocessed_prime_factorization
+"""
+import os
 import time
 import random
-from multiprocessing import Process
-
-NUMBER_OF_PROCESSES = 10
-BATCH_SIZE = 1000
-
-
-def calculate_prime_factors(n):
-    prime_factors = []
-    d = 2
-    while d * d <= n:
-        while (n % d) == 0:
-            prime_factors.append(d)
-            n //= d
-        d += 1
-
-    if n > 1:
-        prime_factors.append(n)
-
-    return prime_factors
-
-
-# Split the total number of factorizations (batching) so that each batch can be processed in parallel.
-def batch_factorization(batch_size):
-    for i in range(batch_size):
-        number_to_factor = random.randint(20000, 100000000)
-        print(calculate_prime_factors(number_to_factor))
+from functools import partial
+from multiprocessing import Pool
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from multiprocessing_prime_factorization.factorization_cache import FactorizationCache
+from multiprocessing_prime_factorization.factorization_engine import DEFAULT_STRATEGY, calculate_prime_factors
+from multiprocessing_prime_factorization.spf_table import SpfTable
+from tracing.trace_sink import enable_tracing, get_tracer
+
+tracer = get_tracer(__name__)
+
+NUMBER_OF_FACTORIZATIONS = 10000
+# Chunk size used when the number of inputs is not known up front (e.g. the numbers come from a generator).
+STREAMING_CHUNKSIZE = 256
+# Number of chunks per worker the automatic chunk size aims for.
+CHUNKS_PER_WORKER = 4
+
+# Smallest prime factor table mapped into this (worker) process by initialize_worker.
+spf_table: Optional[SpfTable] = None
+# Factorization cache consulted by this (worker) process, set by initialize_worker.
+factorization_cache: Optional[FactorizationCache] = None
+
+
+def load_spf_table(path: str):
+    global spf_table
+    spf_table = SpfTable.open(path)
+
+
+def check_spf_table(path: str):
+    """
+    Open the table once in the calling process and raise if it is missing or broken. A worker failing in its
+    initializer is replaced by the pool with a new one failing the same way, forever, so the workers must not be the
+    first to find out.
+    """
+    SpfTable.open(path).close()
+
+
+def initialize_worker(spf_table_path: Optional[str] = None, cache: Optional[FactorizationCache] = None):
+    global factorization_cache
+    if spf_table_path is not None:
+        load_spf_table(spf_table_path)
+    factorization_cache = cache
+
+
+def factorize_number(number: int, strategy: str = DEFAULT_STRATEGY) -> Tuple[int, List[int]]:
+    if factorization_cache is not None:
+        prime_factors = factorization_cache.get(number)
+        if prime_factors is not None:
+            return number, prime_factors
+
+    if spf_table is not None:
+        prime_factors = spf_table.factorize(number, strategy=strategy)
+    else:
+        prime_factors = calculate_prime_factors(number, strategy=strategy)
+
+    if factorization_cache is not None:
+        factorization_cache.put(number, prime_factors)
+    return number, prime_factors
+
+
+def auto_chunksize(number_of_items: int, workers: int) -> int:
+    """
+    Large chunks amortise the cost of sending the work to the workers, but with one chunk per worker a worker which got
+    the hard numbers finishes long after the others. Aiming for a few chunks per worker (like Pool.map does) lets the
+    workers which are done early pick up the remaining chunks.
+    """
+    chunksize, remainder = divmod(number_of_items, workers * CHUNKS_PER_WORKER)
+    if remainder:
+        chunksize += 1
+    return max(1, chunksize)
+
+
+def factorize_many(
+    numbers: Iterable[int],
+    workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    ordered: bool = True,
+    strategy: str = DEFAULT_STRATEGY,
+    spf_table_path: Optional[str] = None,
+    cache: Optional[FactorizationCache] = None,
+) -> Iterator[Tuple[int, List[int]]]:
+    """
+    Factorize the numbers on a pool of worker processes (one per CPU core by default), streaming back
+    (number, prime factors) pairs as they are ready - in the input order, or in completion order with ordered=False.
+
+    With spf_table_path every worker maps the saved smallest prime factor table (see spf_table.py) read-only, so they
+    all share one copy of it, and only the numbers above its limit go through the factorization strategy.
+
+    With a cache the workers skip the numbers they have already factorized (see factorization_cache.py). Pass a
+    SharedFactorizationCache to share it between all the workers, an LruFactorizationCache is copied into every worker
+    and its statistics stay in the workers - the copy in the calling process does not see their hits and misses.
+
+    A missing or broken SPF table raises OSError or ValueError right away, before any worker is started.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        try:
+            chunksize = auto_chunksize(number_of_items=len(numbers), workers=workers)
+        except TypeError:
+            chunksize = STREAMING_CHUNKSIZE
+    if spf_table_path is not None:
+        check_spf_table(spf_table_path)
+    return _factorize_on_pool(numbers, workers, chunksize, ordered, strategy, spf_table_path, cache)
+
+
+def _factorize_on_pool(
+    numbers: Iterable[int],
+    workers: int,
+    chunksize: int,
+    ordered: bool,
+    strategy: str,
+    spf_table_path: Optional[str],
+    cache: Optional[FactorizationCache],
+) -> Iterator[Tuple[int, List[int]]]:
+    with Pool(processes=workers, initializer=initialize_worker, initargs=(spf_table_path, cache)) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        yield from imap(partial(factorize_number, strategy=strategy), numbers, chunksize)
 
 
 def main():
     print('Starting factorization')
     start = time.time()
 
-    processes = []
-
-    for i in range(NUMBER_OF_PROCESSES):
-        process = Process(target=batch_factorization, kwargs={'batch_size': BATCH_SIZE})
-        processes.append(process)
-        process.start()
-
-    # Similarly to threading, we have to block here until all processes terminated by calling join() on each of them.
-    for process in processes:
-        process.join()
+    numbers_to_factor = [random.randint(20000, 100000000) for _ in range(NUMBER_OF_FACTORIZATIONS)]
+    for number, prime_factors in factorize_many(numbers_to_factor):
+        tracer.debug('Prime factors of %s: %s', number, prime_factors)
 
     stop = time.time()
     total_time = stop - start
@@ -50,4 +141,5 @@ def main():
 
 
 if __name__ == '__main__':
+    enable_tracing()
     main()
@@ -0,0 +1,101 @@
+"""
+Vectorized batch factorization of NumPy arrays.
+
+Calling calculate_prime_factors once per number means a Python level loop per number. Here the small prime factors of
+the whole array are stripped at once instead: for every prime in a small table we take the remainder of all the
+numbers which can still have that factor in a single vectorized operation. Only the cofactors which are left with more
+than one large prime factor go through the scalar factorization engine.
+
+The results are returned in a compressed sparse row (CSR) layout - one flat array of all the factors plus an array of
+offsets, the factors of numbers[i] being factors[offsets[i]:offsets[i + 1]] - instead of millions of small lists.
+
+NumPy is an optional dependency, it is only needed when factorize_array is called.
+"""
+from dataclasses import dataclass
+from typing import Any, List
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from multiprocessing_prime_factorization.factorization_engine import calculate_prime_factors, sieve_primes
+
+# Primes up to this limit are stripped with vectorized operations, larger factors are left to the scalar engine.
+# 10^4 covers the square root of the numbers up to 10^8 used in the examples, so those never need the scalar engine.
+DEFAULT_VECTOR_PRIME_LIMIT = 10000
+
+
+@dataclass
+class FactorizationCSR:
+    offsets: Any
+    factors: Any
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int):
+        return self.factors[self.offsets[index]:self.offsets[index + 1]]
+
+    def to_lists(self) -> List[List[int]]:
+        return [self[index].tolist() for index in range(len(self))]
+
+
+def factorize_array(numbers, vector_prime_limit: int = DEFAULT_VECTOR_PRIME_LIMIT) -> FactorizationCSR:
+    """
+    Factorize a one dimensional array of non negative integers (up to 64 bit), the factors of every number are in
+    ascending order exactly like calculate_prime_factors returns them.
+    """
+    if np is None:
+        raise ImportError('factorize_array requires NumPy, install it with: pip install numpy')
+
+    numbers = np.asarray(numbers)
+    if numbers.ndim != 1:
+        raise ValueError('Only one dimensional arrays of numbers can be factorized.')
+    if numbers.size and np.issubdtype(numbers.dtype, np.signedinteger) and numbers.min() < 0:
+        raise ValueError('Only non negative numbers can be factorized.')
+    if not 2 <= vector_prime_limit < 1 << 32:
+        raise ValueError('The vector prime limit must be between 2 and 2^32.')
+
+    residuals = numbers.astype(np.uint64)
+    factor_rows = [np.empty(0, dtype=np.int64)]
+    factor_values = [np.empty(0, dtype=np.uint64)]
+
+    active = np.flatnonzero(residuals > 1)
+    for prime in sieve_primes(vector_prime_limit):
+        uint_prime = np.uint64(prime)
+        # A residual smaller than prime^2 has no factors below prime left, so it is either 1 or a prime itself.
+        active = active[residuals[active] >= uint_prime * uint_prime]
+        if not active.size:
+            break
+
+        divisible = active[residuals[active] % uint_prime == 0]
+        while divisible.size:
+            residuals[divisible] //= uint_prime
+            factor_rows.append(divisible)
+            factor_values.append(np.full(divisible.size, prime, dtype=np.uint64))
+            divisible = divisible[residuals[divisible] % uint_prime == 0]
+
+    leftovers = np.flatnonzero(residuals > 1)
+    # All factors up to the limit are gone, so a composite leftover is at least the square of the next prime. Close to
+    # 2^32 that square does not fit in an uint64, and then every leftover is a prime.
+    smallest_composite = (vector_prime_limit + 1) ** 2
+    if smallest_composite > np.iinfo(np.uint64).max:
+        prime_leftovers = np.ones(leftovers.size, dtype=bool)
+    else:
+        prime_leftovers = residuals[leftovers] < np.uint64(smallest_composite)
+    factor_rows.append(leftovers[prime_leftovers])
+    factor_values.append(residuals[leftovers[prime_leftovers]])
+
+    for row in leftovers[~prime_leftovers]:
+        prime_factors = calculate_prime_factors(int(residuals[row]))
+        factor_rows.append(np.full(len(prime_factors), row, dtype=np.int64))
+        factor_values.append(np.array(prime_factors, dtype=np.uint64))
+
+    rows = np.concatenate(factor_rows)
+    values = np.concatenate(factor_values)
+    # The factors were produced in ascending order for every number, a stable sort by row keeps it that way.
+    order = np.argsort(rows, kind='stable')
+    offsets = np.zeros(len(numbers) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(numbers)), out=offsets[1:])
+    return FactorizationCSR(offsets=offsets, factors=values[order])
@@ -1,23 +1,19 @@
+"""
+Factorizes random numbers one after the other, the baseline for multiprocessed_prime_factorization.py.
+
+Run it from the repository root with:
+python -m multiprocessing_prime_factorization.sequential_prime_factorization
+"""
 import time
 import random
 
+from multiprocessing_prime_factorization.factorization_engine import calculate_prime_factors
+from tracing.trace_sink import enable_tracing, get_tracer
 
-NUMBER_OF_FACTORIZATIONS = 100000
-
+tracer = get_tracer(__name__)
 
-def calculate_prime_factors(n):
-    prime_factors = []
-    d = 2
-    while d * d <= n:
-        while (n % d) == 0:
-            prime_factors.append(d)
-            n //= d
-        d += 1
 
-    if n > 1:
-        prime_factors.append(n)
-
-    return prime_factors
+NUMBER_OF_FACTORIZATIONS = 100000
 
 
 def main():
@@ -26,7 +22,7 @@ def main():
 
     for i in range(NUMBER_OF_FACTORIZATIONS):
         number_to_factor = random.randint(20000, 100000000)
-        print(calculate_prime_factors(number_to_factor))
+        tracer.debug('Prime factors of %s: %s', number_to_factor, calculate_prime_factors(number_to_factor))
 
     stop = time.time()
     total_time = stop - start
@@ -35,4 +31,5 @@ def main():
 
 
 if __name__ == '__main__':
+    enable_tracing()
     main()
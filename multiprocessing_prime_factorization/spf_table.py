@@ -0,0 +1,135 @@
+"""
+Smallest prime factor (SPF) table.
+
+For every n up to the limit the table stores the smallest prime factor of n, so factorizing n is just a matter of
+looking up its smallest prime factor, dividing it out and repeating - O(log n) lookups instead of O(sqrt n) divisions.
+Entries of primes (and of 0 and 1) are left at 0, which saves storing the number itself.
+
+The table is a flat array of uint32 values. It can be saved to a file and opened with a read-only mmap, so that all the
+worker processes of a pool share the same physical memory pages instead of each of them building its own copy.
+
+Build a table for the range used in the examples with:
+python -m multiprocessing_prime_factorization.spf_table spf_table.bin --limit 100000000
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from math import isqrt
+from typing import List, Optional, Sequence
+
+from multiprocessing_prime_factorization.factorization_engine import (
+    DEFAULT_STRATEGY,
+    calculate_prime_factors,
+    sieve_primes,
+)
+
+SPF_TYPECODE = 'I'
+# The header holds a magic value, the byte order of the table and its limit.
+HEADER_FORMAT = '<4s4sQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+MAGIC = b'SPF1'
+BYTE_ORDERS = {'little': b'LE\0\0', 'big': b'BE\0\0'}
+# The table is filled in segments so that the temporary arrays used for the slice assignments stay small.
+SEGMENT_SIZE = 1 << 20
+
+assert array(SPF_TYPECODE).itemsize == 4, 'The SPF table needs a 4 byte unsigned integer type.'
+
+
+def build_spf_table(limit: int) -> array:
+    if not 1 <= limit < 1 << 32:
+        raise ValueError('The limit of the SPF table must be between 1 and 2^32 - 1.')
+
+    spf = array(SPF_TYPECODE, bytes(4 * (limit + 1)))
+    # Going from the largest prime down, every smaller prime overwrites the entries of its multiples, so each entry
+    # ends up holding the smallest prime dividing it. Starting at prime^2 is enough since smaller multiples of the prime
+    # have a smaller prime factor anyway.
+    primes = sieve_primes(isqrt(limit))[::-1]
+    for segment_start in range(0, limit + 1, SEGMENT_SIZE):
+        segment_stop = min(segment_start + SEGMENT_SIZE, limit + 1)
+        for prime in primes:
+            first_multiple = max(prime * prime, -(-segment_start // prime) * prime)
+            if first_multiple >= segment_stop:
+                continue
+            number_of_multiples = len(range(first_multiple, segment_stop, prime))
+            spf[first_multiple:segment_stop:prime] = array(SPF_TYPECODE, [prime]) * number_of_multiples
+    return spf
+
+
+class SpfTable:
+    def __init__(self, table: Sequence[int], mapped_file: Optional[mmap.mmap] = None):
+        self.table = table
+        self.limit = len(table) - 1
+        self.mapped_file = mapped_file
+
+    @classmethod
+    def build(cls, limit: int) -> 'SpfTable':
+        return cls(table=build_spf_table(limit))
+
+    @classmethod
+    def open(cls, path: str) -> 'SpfTable':
+        """
+        Map a saved table into memory read-only, the pages are loaded lazily and shared between processes.
+        """
+        with open(path, 'rb') as table_file:
+            if os.fstat(table_file.fileno()).st_size < HEADER_SIZE:
+                raise ValueError(f'{path} is not an SPF table.')
+            mapped_file = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, byte_order, limit = struct.unpack_from(HEADER_FORMAT, mapped_file)
+        if magic != MAGIC:
+            mapped_file.close()
+            raise ValueError(f'{path} is not an SPF table.')
+        if byte_order != BYTE_ORDERS[sys.byteorder]:
+            mapped_file.close()
+            raise ValueError(f'{path} was saved on a machine with a different byte order.')
+
+        if len(mapped_file) != HEADER_SIZE + (limit + 1) * struct.calcsize(SPF_TYPECODE):
+            mapped_file.close()
+            raise ValueError(f'{path} is truncated.')
+        table = memoryview(mapped_file)[HEADER_SIZE:].cast(SPF_TYPECODE)
+        return cls(table=table, mapped_file=mapped_file)
+
+    def save(self, path: str):
+        with open(path, 'wb') as table_file:
+            table_file.write(struct.pack(HEADER_FORMAT, MAGIC, BYTE_ORDERS[sys.byteorder], self.limit))
+            table_file.write(memoryview(self.table).cast('B'))
+
+    def close(self):
+        if self.mapped_file is not None:
+            self.table.release()
+            self.mapped_file.close()
+            self.mapped_file = None
+
+    def factorize(self, n: int, strategy: str = DEFAULT_STRATEGY) -> List[int]:
+        """
+        Factorize n using the table, numbers above its limit are handed over to the factorization engine.
+        """
+        if n > self.limit:
+            return calculate_prime_factors(n, strategy=strategy)
+
+        table = self.table
+        prime_factors = []
+        while n > 1:
+            smallest_prime_factor = table[n]
+            if not smallest_prime_factor:
+                prime_factors.append(n)
+                break
+            prime_factors.append(smallest_prime_factor)
+            n //= smallest_prime_factor
+        return prime_factors
+
+
+def main(arguments: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Build a smallest prime factor table and save it to a file.')
+    parser.add_argument('path')
+    parser.add_argument('--limit', type=int, default=100000000)
+    parsed_arguments = parser.parse_args(arguments)
+
+    SpfTable.build(parsed_arguments.limit).save(parsed_arguments.path)
+
+
+if __name__ == '__main__':
+    main()
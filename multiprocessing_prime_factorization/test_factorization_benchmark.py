@@ -0,0 +1,50 @@
+import json
+
+from multiprocessing_prime_factorization.factorization_benchmark import (
+    PROCESSES,
+    THREADS,
+    RunResult,
+    cost_by_magnitude,
+    generate_numbers,
+    main,
+    measure,
+)
+
+
+class TestFactorizationBenchmark:
+    def test_generate_numbers_is_seeded_and_within_bounds(self):
+        numbers = generate_numbers(count=1000, low=100, high=10 ** 9, seed=3)
+
+        assert numbers == generate_numbers(count=1000, low=100, high=10 ** 9, seed=3)
+        assert all(100 <= number <= 10 ** 9 for number in numbers)
+        # Log-uniform: roughly as many numbers below 10^5 as above 10^6.
+        assert sum(number < 10 ** 5 for number in numbers) > 250
+
+    def test_speedup_and_efficiency(self):
+        result = RunResult(backend=PROCESSES, workers=4, elapsed=2.0)
+
+        assert result.speedup(baseline=6.0) == 3.0
+        assert result.efficiency(baseline=6.0) == 0.75
+
+    def test_measure_every_backend(self):
+        numbers = generate_numbers(count=200, low=100, high=10 ** 8)
+
+        for backend in (THREADS, PROCESSES):
+            result = measure(backend, numbers, workers=2, strategy='auto', repeats=1)
+            assert result.backend == backend
+            assert result.elapsed > 0
+
+    def test_cost_by_magnitude(self):
+        costs = cost_by_magnitude([10, 99, 100, 12345], strategy='auto')
+
+        assert [(magnitude, count) for magnitude, count, _ in costs] == [(1, 2), (2, 1), (4, 1)]
+
+    def test_json_report(self, capsys):
+        main(['--backends', 'sequential', 'threads', '--workers', '1', '2', '--count', '50', '--repeats', '1', '--json'])
+
+        report = json.loads(capsys.readouterr().out)
+        assert [(result['backend'], result['workers']) for result in report['results']] == [
+            ('sequential', 1),
+            ('threads', 1),
+            ('threads', 2),
+        ]
@@ -0,0 +1,117 @@
+import multiprocessing
+import pickle
+
+import pytest
+
+from multiprocessing_prime_factorization.factorization_cache import (
+    CacheStatistics,
+    FactorizationCache,
+    LruFactorizationCache,
+    SharedFactorizationCache,
+)
+from multiprocessing_prime_factorization.factorization_engine import trial_division_factors
+from multiprocessing_prime_factorization.multiprocessed_prime_factorization import factorize_many
+
+
+@pytest.fixture
+def shared_cache():
+    cache = SharedFactorizationCache.create(number_of_slots=1 << 10)
+    yield cache
+    cache.close()
+    cache.unlink()
+
+
+class TestLruFactorizationCache:
+    def test_counts_hits_and_misses(self):
+        cache = LruFactorizationCache(maxsize=10)
+
+        assert cache.factorize(360) == [2, 2, 2, 3, 3, 5]
+        assert cache.factorize(360) == [2, 2, 2, 3, 3, 5]
+
+        assert cache.statistics() == CacheStatistics(hits=1, misses=1, evictions=0)
+
+    def test_evicts_least_recently_used(self):
+        cache = LruFactorizationCache(maxsize=2)
+        cache.factorize(10)
+        cache.factorize(12)
+        cache.factorize(10)
+
+        cache.factorize(14)
+
+        assert cache.get(12) is None
+        assert cache.get(10) == [2, 5]
+        assert cache.statistics().evictions == 1
+
+    def test_returned_factors_do_not_alias_the_cache(self):
+        cache = LruFactorizationCache()
+        cache.factorize(12).append(7)
+
+        assert cache.factorize(12) == [2, 2, 3]
+
+
+    def test_pickles_without_its_lock(self):
+        cache = LruFactorizationCache(maxsize=10)
+        cache.put(12, [2, 2, 3])
+        cache.get(12)
+
+        copy = pickle.loads(pickle.dumps(cache))
+
+        assert copy.get(12) == [2, 2, 3]
+        assert copy.statistics() == CacheStatistics(hits=2, misses=0, evictions=0)
+        assert cache.statistics() == CacheStatistics(hits=1, misses=0, evictions=0)
+
+    def test_is_passed_to_spawned_workers(self):
+        cache = LruFactorizationCache()
+        with multiprocessing.get_context('spawn').Pool(processes=1) as pool:
+            assert pool.apply(cache.factorize, (12,)) == [2, 2, 3]
+
+    def test_cache_base_class_is_abstract(self):
+        with pytest.raises(TypeError):
+            FactorizationCache()
+
+
+class TestSharedFactorizationCache:
+    def test_number_of_slots_must_be_a_power_of_two(self):
+        with pytest.raises(ValueError):
+            SharedFactorizationCache.create(number_of_slots=1000)
+
+    def test_counts_hits_and_misses(self, shared_cache):
+        assert shared_cache.factorize(1234567890) == trial_division_factors(1234567890)
+        assert shared_cache.factorize(1234567890) == trial_division_factors(1234567890)
+
+        assert shared_cache.statistics() == CacheStatistics(hits=1, misses=1, evictions=0)
+
+    def test_cofactors_are_cached_with_the_number(self, shared_cache):
+        shared_cache.put(2 * 3 * 99991, [2, 3, 99991])
+
+        assert shared_cache.get(3 * 99991) == [3, 99991]
+        assert shared_cache.get(99991) == [99991]
+
+    def test_colliding_numbers_evict_each_other(self, shared_cache):
+        for number in range(2, 5000):
+            assert shared_cache.factorize(number) == trial_division_factors(number)
+
+        statistics = shared_cache.statistics()
+        assert statistics.evictions > 0
+        for number in range(2, 5000):
+            prime_factors = shared_cache.get(number)
+            assert prime_factors is None or prime_factors == trial_division_factors(number)
+
+    def test_attached_cache_uses_the_same_memory(self, shared_cache):
+        attached_cache = SharedFactorizationCache.attach(
+            name=shared_cache.shared_memory.name, number_of_slots=shared_cache.number_of_slots, lock=shared_cache.lock
+        )
+        shared_cache.factorize(1001)
+
+        assert attached_cache.get(1001) == [7, 11, 13]
+        attached_cache.close()
+
+    def test_shared_between_workers(self, shared_cache):
+        numbers = [1001, 1001, 360, 1001, 360] * 20
+
+        results = list(factorize_many(numbers, workers=2, chunksize=5, cache=shared_cache))
+
+        assert results == [(number, trial_division_factors(number)) for number in numbers]
+        statistics = shared_cache.statistics()
+        assert statistics.hits + statistics.misses == len(numbers)
+        assert statistics.misses <= 4
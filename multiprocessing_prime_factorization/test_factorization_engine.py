@@ -0,0 +1,72 @@
+import random
+from functools import reduce
+from operator import mul
+
+import pytest
+
+from multiprocessing_prime_factorization.factorization_engine import (
+    STRATEGIES,
+    calculate_prime_factors,
+    integer_root,
+    is_probable_prime,
+    perfect_power,
+    sieve_primes,
+    trial_division_factors,
+)
+
+
+class TestFactorizationEngine:
+    def test_sieve_primes(self):
+        assert sieve_primes(1) == []
+        assert sieve_primes(30) == [2, 3, 5, 7, 11, 13, 17, 19, 23, 29]
+
+    def test_is_probable_prime(self):
+        primes = set(sieve_primes(10000))
+
+        for number in range(10000):
+            assert is_probable_prime(number) == (number in primes)
+        # Carmichael numbers fool the Fermat test but not Miller-Rabin.
+        for carmichael_number in (561, 41041, 825265, 321197185):
+            assert not is_probable_prime(carmichael_number)
+        assert is_probable_prime(2 ** 61 - 1)
+
+    @pytest.mark.parametrize('strategy', list(STRATEGIES))
+    def test_matches_trial_division_in_original_range(self, strategy):
+        generator = random.Random(0)
+        numbers = [generator.randint(20000, 100000000) for _ in range(300)]
+        numbers += list(range(-2, 100)) + [2 ** 26, 3 ** 16, 9999991 * 7, 99999989]
+
+        for number in numbers:
+            assert calculate_prime_factors(number, strategy=strategy) == trial_division_factors(number)
+
+    @pytest.mark.parametrize('strategy', ['pollard_rho', 'auto'])
+    def test_factors_large_numbers(self, strategy):
+        cases = [
+            [1000003, 1000033],
+            [2 ** 31 - 1, 2 ** 61 - 1],
+            [3, 3, 1000000007, 1000000007],
+            [999999000001, 999999000001],
+            [2, 65537, 4294967291, 18446744073709551557],
+            [1009, 2 ** 61 - 1, 2 ** 61 - 1],
+            [2 ** 31 - 1] * 3,
+            [1009] * 4 + [1013],
+        ]
+
+        for prime_factors in cases:
+            assert calculate_prime_factors(reduce(mul, prime_factors), strategy=strategy) == prime_factors
+
+    def test_integer_root(self):
+        for number in range(1, 3000):
+            for k in (2, 3, 5, 7):
+                root = integer_root(number, k)
+                assert root ** k <= number < (root + 1) ** k
+        assert integer_root((2 ** 61 - 1) ** 3, 3) == 2 ** 61 - 1
+
+    def test_perfect_power(self):
+        assert perfect_power((2 ** 61 - 1) ** 2) == (2 ** 61 - 1, 2)
+        assert perfect_power(1009 ** 6) == (1009 ** 3, 2)
+        assert perfect_power(1009 ** 2 * 1013) is None
+
+    def test_unknown_strategy(self):
+        with pytest.raises(ValueError):
+            calculate_prime_factors(10, strategy='guessing')
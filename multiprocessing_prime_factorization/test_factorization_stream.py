@@ -0,0 +1,126 @@
+import io
+import json
+
+import pytest
+
+from multiprocessing_prime_factorization.factorization_engine import trial_division_factors
+from multiprocessing_prime_factorization.factorization_stream import (
+    factorize_stream,
+    main,
+    read_binary_results,
+    read_numbers,
+    write_binary,
+)
+
+
+class TestReadNumbers:
+    def test_reads_whitespace_separated_numbers(self):
+        assert list(read_numbers(io.StringIO('12 15\n\n  7\n'))) == [12, 15, 7]
+
+    def test_reports_the_line_of_an_invalid_number(self):
+        with pytest.raises(ValueError, match="Line 2: 'x' is not an integer"):
+            list(read_numbers(io.StringIO('12\n15 x\n')))
+
+
+class TestBinaryFormat:
+    def test_round_trip(self):
+        results = [(1, []), (12, [2, 2, 3]), (2 ** 61 - 1, [2 ** 61 - 1])]
+        stream = io.BytesIO()
+
+        write_binary(results, stream)
+        stream.seek(0)
+
+        assert list(read_binary_results(stream)) == results
+
+    def test_rejects_numbers_above_64_bits(self):
+        with pytest.raises(ValueError):
+            write_binary([(2 ** 64, [2] * 64)], io.BytesIO())
+
+
+class TestFactorizeStream:
+    def test_streams_results_in_order(self):
+        numbers = list(range(2, 3000))
+
+        results = list(factorize_stream(iter(numbers), workers=2, chunk_size=64))
+
+        assert results == [(number, trial_division_factors(number)) for number in numbers]
+
+    def test_streams_results_as_completed(self):
+        numbers = list(range(2, 3000))
+
+        results = list(factorize_stream(iter(numbers), workers=2, chunk_size=64, ordered=False))
+
+        assert sorted(results) == [(number, trial_division_factors(number)) for number in numbers]
+
+    @pytest.mark.parametrize('ordered', [True, False])
+    def test_reads_only_the_in_flight_chunks_ahead(self, ordered):
+        numbers_read = 0
+
+        def numbers():
+            nonlocal numbers_read
+            for number in range(2, 100000):
+                numbers_read += 1
+                yield number
+
+        results = factorize_stream(numbers(), workers=2, chunk_size=10, max_in_flight=3, ordered=ordered)
+        next(results)
+
+        # The in flight chunks plus the one waiting for room.
+        assert numbers_read <= 4 * 10
+        results.close()
+
+
+class TestMain:
+    def test_writes_ndjson(self, tmp_path):
+        input_path = tmp_path / 'numbers.txt'
+        input_path.write_text('12 1001\n97\n')
+        output_path = tmp_path / 'factors.ndjson'
+
+        main([str(input_path), '-o', str(output_path), '--workers', '1', '--cache-slots', '256'])
+
+        lines = output_path.read_text().splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {'n': 12, 'factors': [2, 2, 3]},
+            {'n': 1001, 'factors': [7, 11, 13]},
+            {'n': 97, 'factors': [97]},
+        ]
+
+    def test_exits_on_invalid_input(self, tmp_path):
+        input_path = tmp_path / 'numbers.txt'
+        input_path.write_text('12\nseven\n')
+
+        with pytest.raises(SystemExit) as exit_info:
+            main([str(input_path), '-o', str(tmp_path / 'factors.bin'), '--format', 'binary', '--workers', '1'])
+
+        assert exit_info.value.code == 1
+
+    @pytest.mark.parametrize('slots', ['100', '1', '-4', 'many'])
+    def test_rejects_invalid_cache_slots(self, tmp_path, capsys, slots):
+        input_path = tmp_path / 'numbers.txt'
+        input_path.write_text('12\n')
+        output_path = tmp_path / 'factors.ndjson'
+
+        with pytest.raises(SystemExit) as exit_info:
+            main([str(input_path), '-o', str(output_path), '--workers', '1', '--cache-slots', slots])
+
+        assert exit_info.value.code == 2
+        assert '--cache-slots' in capsys.readouterr().err
+        assert not output_path.exists()
+
+    def test_exits_on_a_missing_input_file(self, tmp_path, capsys):
+        with pytest.raises(SystemExit) as exit_info:
+            main([str(tmp_path / 'missing.txt'), '-o', str(tmp_path / 'factors.ndjson'), '--workers', '1'])
+
+        assert exit_info.value.code == 1
+        assert capsys.readouterr().err.startswith('error: ')
+
+    def test_exits_on_a_missing_spf_table(self, tmp_path, capsys):
+        input_path = tmp_path / 'numbers.txt'
+        input_path.write_text('12 15 100\n')
+        arguments = [str(input_path), '-o', str(tmp_path / 'factors.ndjson'), '--workers', '2']
+
+        with pytest.raises(SystemExit) as exit_info:
+            main(arguments + ['--spf-table', str(tmp_path / 'missing.bin')])
+
+        assert exit_info.value.code == 1
+        assert 'missing.bin' in capsys.readouterr().err
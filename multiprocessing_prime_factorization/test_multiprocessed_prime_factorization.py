@@ -0,0 +1,26 @@
+import random
+
+from multiprocessing_prime_factorization.factorization_engine import trial_division_factors
+from multiprocessing_prime_factorization.multiprocessed_prime_factorization import auto_chunksize, factorize_many
+
+
+class TestFactorizeMany:
+    def test_auto_chunksize(self):
+        assert auto_chunksize(number_of_items=1000, workers=10) == 25
+        assert auto_chunksize(number_of_items=1001, workers=10) == 26
+        assert auto_chunksize(number_of_items=3, workers=10) == 1
+
+    def test_streams_results_in_order(self):
+        generator = random.Random(0)
+        numbers = [generator.randint(20000, 100000000) for _ in range(500)]
+
+        results = list(factorize_many(numbers, workers=2))
+
+        assert results == [(number, trial_division_factors(number)) for number in numbers]
+
+    def test_streams_results_as_completed_from_generator(self):
+        numbers = range(2, 2000)
+
+        results = list(factorize_many((number for number in numbers), workers=2, ordered=False, chunksize=100))
+
+        assert sorted(results) == [(number, trial_division_factors(number)) for number in numbers]
@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from multiprocessing_prime_factorization.factorization_engine import calculate_prime_factors, sieve_primes
+from multiprocessing_prime_factorization.numpy_factorization import factorize_array
+
+np = pytest.importorskip('numpy')
+
+
+class TestFactorizeArray:
+    def test_matches_scalar_factorization(self):
+        generator = random.Random(0)
+        numbers = [generator.randint(20000, 100000000) for _ in range(2000)]
+        numbers += list(range(100)) + [2 ** 40, 1000003 * 1000033, 2 ** 64 - 1, 18446744073709551557]
+
+        result = factorize_array(np.array(numbers, dtype=np.uint64))
+
+        assert len(result) == len(numbers)
+        assert result.to_lists() == [calculate_prime_factors(number) for number in numbers]
+
+    def test_csr_layout(self):
+        result = factorize_array(np.array([12, 1, 7, 0, 1024 * 3], dtype=np.int32), vector_prime_limit=2)
+
+        assert result.offsets.tolist() == [0, 3, 3, 4, 4, 15]
+        assert result.factors.tolist() == [2, 2, 3, 7] + [2] * 10 + [3]
+        assert result[0].tolist() == [2, 2, 3]
+
+    def test_vector_prime_limit_close_to_2_to_the_32(self, monkeypatch):
+        # Sieving up to 2^32 takes too long for a test, the small primes are enough for these numbers.
+        monkeypatch.setattr(
+            'multiprocessing_prime_factorization.numpy_factorization.sieve_primes', lambda limit: sieve_primes(1000)
+        )
+        numbers = [12, 997 * 991, 18446744073709551557]
+
+        result = factorize_array(np.array(numbers, dtype=np.uint64), vector_prime_limit=(1 << 32) - 1)
+
+        assert result.to_lists() == [[2, 2, 3], [991, 997], [18446744073709551557]]
+
+    def test_empty_array(self):
+        result = factorize_array(np.array([], dtype=np.uint64))
+
+        assert len(result) == 0
+        assert result.to_lists() == []
+
+    def test_rejects_negative_numbers(self):
+        with pytest.raises(ValueError):
+            factorize_array(np.array([-4, 4]))
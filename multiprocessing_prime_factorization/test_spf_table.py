@@ -0,0 +1,77 @@
+import pytest
+
+from multiprocessing_prime_factorization.factorization_engine import trial_division_factors
+from multiprocessing_prime_factorization.multiprocessed_prime_factorization import factorize_many
+from multiprocessing_prime_factorization.spf_table import SpfTable, build_spf_table
+
+
+class TestSpfTable:
+    def test_build_spf_table(self):
+        assert build_spf_table(12).tolist() == [0, 0, 0, 0, 2, 0, 2, 0, 2, 3, 2, 0, 2]
+
+    def test_build_spf_table_over_several_segments(self, monkeypatch):
+        monkeypatch.setattr('multiprocessing_prime_factorization.spf_table.SEGMENT_SIZE', 1000)
+        limit = 20000
+
+        table = build_spf_table(limit)
+
+        for number in range(2, limit + 1):
+            assert (table[number] or number) == trial_division_factors(number)[0]
+
+    def test_factorize(self):
+        spf_table = SpfTable.build(100000)
+
+        for number in list(range(0, 100001, 7)) + [99991, 2 ** 16, 100003, 10 ** 12 + 39]:
+            assert spf_table.factorize(number) == trial_division_factors(number)
+
+    def test_save_and_open(self, tmp_path):
+        path = str(tmp_path / 'spf_table.bin')
+        SpfTable.build(5000).save(path)
+
+        spf_table = SpfTable.open(path)
+
+        assert spf_table.limit == 5000
+        assert spf_table.table.tolist() == build_spf_table(5000).tolist()
+        assert spf_table.factorize(4620) == [2, 2, 3, 5, 7, 11]
+        spf_table.close()
+
+    def test_open_rejects_other_files(self, tmp_path):
+        path = tmp_path / 'not_a_table.bin'
+        path.write_bytes(b'\0' * 64)
+
+        with pytest.raises(ValueError):
+            SpfTable.open(str(path))
+
+    def test_open_rejects_truncated_tables(self, tmp_path):
+        path = str(tmp_path / 'spf_table.bin')
+        SpfTable.build(5000).save(path)
+        with open(path, 'r+b') as table_file:
+            table_file.truncate(1001)
+
+        with pytest.raises(ValueError, match='truncated'):
+            SpfTable.open(path)
+
+    def test_open_rejects_files_shorter_than_the_header(self, tmp_path):
+        path = tmp_path / 'empty.bin'
+        path.write_bytes(b'')
+
+        with pytest.raises(ValueError):
+            SpfTable.open(str(path))
+
+    @pytest.mark.parametrize('contents', [None, b'SPF1'])
+    def test_factorize_many_raises_on_a_bad_table(self, tmp_path, contents):
+        path = tmp_path / 'spf_table.bin'
+        if contents is not None:
+            path.write_bytes(contents)
+
+        with pytest.raises((OSError, ValueError)):
+            factorize_many([12, 15], workers=2, spf_table_path=str(path))
+
+    def test_factorize_many_with_shared_table(self, tmp_path):
+        path = str(tmp_path / 'spf_table.bin')
+        SpfTable.build(10000).save(path)
+        numbers = list(range(9000, 11000))
+
+        results = list(factorize_many(numbers, workers=2, spf_table_path=path))
+
+        assert results == [(number, trial_division_factors(number)) for number in numbers]
@@ -0,0 +1,138 @@
+"""
+Asyncio version of the observer pattern.
+
+All the observers' update methods are coroutines and the observable lives on a single event loop, so there is no need
+for any locking - the add, remove and notify methods are never interleaved in the middle of a dictionary update.
+Instead of one thread per slow observer, I/O bound observers simply await, which lets a single thread drive tens of
+thousands of them concurrently.
+
+Run it from the repository root with:
+python -m observer_pattern_problem.asynchronous.observer_pattern_asynchronous
+"""
+import asyncio
+import random
+from asyncio import AbstractEventLoop, Semaphore
+from concurrent.futures import Future
+from typing import Awaitable, Dict, List, Optional
+
+from observer_pattern_problem.multi_threaded.observer_pattern_multi_threaded import Event, EventKeys
+from tracing.trace_sink import enable_tracing, get_tracer
+
+tracer = get_tracer(__name__)
+
+
+async def add_delay(toggle: bool = False):
+    if toggle:
+        await asyncio.sleep(random.random())
+
+
+class AsyncObserver:
+    def __init__(self, name: str):
+        self.name = name
+        self.total = 0
+
+    async def update(self, event: Event, key: str):
+        tracer.debug('%s received event "%s" for key: %s', self.name, event.name, key)
+        tracer.debug('Event data: %s', event.data)
+        self.total += event.data.get(key, 0)
+        tracer.debug('Total expenses: %s', self.total)
+        await add_delay(True)
+
+
+class AsyncObservable:
+    """
+    Notifying gathers the update coroutines of all observers for the key, so the time it takes is bounded by the
+    slowest observer. max_concurrency limits how many updates may run at the same time across all the notifications
+    of this observable (None means no limit).
+
+    Threads other than the event loop's one can fire events with notify_observers_threadsafe.
+
+    The observable is bound to the loop passed in, or to the first loop notifying from, together with the semaphore
+    enforcing max_concurrency. Once that loop is closed (say at the end of asyncio.run) the next loop notifying takes
+    over, notifying from a second loop while the first one is still open raises RuntimeError.
+    """
+    def __init__(self, max_concurrency: Optional[int] = None, loop: Optional[AbstractEventLoop] = None):
+        # Insertion ordered dicts used as ordered sets - O(1) add, remove and duplicate check with a stable order.
+        self.key_map: Dict[str, Dict[AsyncObserver, None]] = {}
+        self.max_concurrency = max_concurrency
+        self.loop = loop
+        self._semaphore: Optional[Semaphore] = None
+
+    def add_observer(self, observer: AsyncObserver, key: str) -> bool:
+        """
+        Registering the same observer twice for a key is a no-op, returns whether the observer was added.
+        """
+        observers_for_key = self.key_map.setdefault(key, {})
+        if observer in observers_for_key:
+            return False
+
+        observers_for_key[observer] = None
+        return True
+
+    def remove_observer(self, observer: AsyncObserver, key: str):
+        observers_for_key = self.key_map.get(key)
+        if observers_for_key is not None and observer in observers_for_key:
+            del observers_for_key[observer]
+            if not observers_for_key:
+                del self.key_map[key]
+
+    def _bind(self, loop: AbstractEventLoop):
+        if self.loop is not loop:
+            if self.loop is not None and not self.loop.is_closed():
+                raise RuntimeError('The observable is bound to another event loop which is still open.')
+            self.loop = loop
+            # The semaphore of the previous loop can not be awaited from this one.
+            self._semaphore = None
+        if self._semaphore is None and self.max_concurrency is not None:
+            self._semaphore = Semaphore(self.max_concurrency)
+
+    async def _limited(self, update: Awaitable):
+        async with self._semaphore:
+            return await update
+
+    async def notify_observers(self, event: Event, key: str) -> List[Optional[BaseException]]:
+        """
+        Returns the results of the update coroutines in the registration order. An exception raised by an observer is
+        returned in its place instead of being raised, so one failing observer does not affect the others.
+        """
+        self._bind(asyncio.get_running_loop())
+
+        # Copy the observers first, they can be (un)registered while we are awaiting the updates.
+        updates = [observer.update(event=event, key=key) for observer in tuple(self.key_map.get(key, ()))]
+        if self.max_concurrency is not None:
+            updates = [self._limited(update) for update in updates]
+        return await asyncio.gather(*updates, return_exceptions=True)
+
+    def notify_observers_threadsafe(self, event: Event, key: str) -> Future:
+        """
+        Schedule the notification on the observable's loop from any thread (run_coroutine_threadsafe hands the
+        coroutine over to the loop with loop.call_soon_threadsafe) and return a future of its results.
+        """
+        if self.loop is None or self.loop.is_closed():
+            raise RuntimeError('The observable is not bound to an open event loop, pass one in or notify from it.')
+
+        return asyncio.run_coroutine_threadsafe(self.notify_observers(event=event, key=key), self.loop)
+
+
+async def main():
+    number_of_observers = 5
+
+    observers = []
+    for i in range(number_of_observers):
+        observer = AsyncObserver(name=f'Observer-{i}')
+        observers.append(observer)
+
+    observable = AsyncObservable(max_concurrency=2)
+
+    for observer in observers:
+        observable.add_observer(observer=observer, key=EventKeys.EXPENSES)
+
+    number_of_events = 5
+    events = [Event(name='Adding Expenses', data={EventKeys.EXPENSES: 1}) for i in range(number_of_events)]
+
+    await asyncio.gather(*(observable.notify_observers(event=event, key=EventKeys.EXPENSES) for event in events))
+
+
+if __name__ == '__main__':
+    enable_tracing()
+    asyncio.run(main())
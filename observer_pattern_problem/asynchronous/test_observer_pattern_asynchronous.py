@@ -0,0 +1,142 @@
+import asyncio
+import time
+from threading import Thread
+
+import pytest
+
+from observer_pattern_problem.asynchronous.observer_pattern_asynchronous import (
+    AsyncObservable,
+    AsyncObserver,
+    Event,
+)
+
+
+class ConcurrencyTrackingObserver(AsyncObserver):
+    running = 0
+    max_running = 0
+
+    async def update(self, event: Event, key: str):
+        ConcurrencyTrackingObserver.running += 1
+        ConcurrencyTrackingObserver.max_running = max(
+            ConcurrencyTrackingObserver.max_running, ConcurrencyTrackingObserver.running
+        )
+        await asyncio.sleep(0.01)
+        self.total += event.data.get(key, 0)
+        ConcurrencyTrackingObserver.running -= 1
+
+
+class FailingObserver(AsyncObserver):
+    async def update(self, event: Event, key: str):
+        raise ValueError(self.name)
+
+
+class TestAsyncObserver:
+    def test_update(self):
+        subscriber = AsyncObserver(name='test_subscriber')
+
+        assert subscriber.total == 0
+        key = 'test_key'
+        value = 1
+        event = Event(name='test_event', data={key: value})
+        asyncio.run(subscriber.update(event=event, key=key))
+
+        assert subscriber.total == value
+
+
+class TestAsyncObservable:
+    def test_remove_existing_observer(self):
+        observable = AsyncObservable()
+        observer = AsyncObserver(name='test_name')
+        key = 'test_key'
+
+        observable.add_observer(observer=observer, key=key)
+        assert list(observable.key_map[key]) == [observer]
+
+        observable.remove_observer(observer=observer, key=key)
+        assert key not in observable.key_map
+
+    def test_notifies_observers_concurrently(self):
+        observable = AsyncObservable()
+        key = 'test_key'
+        event_value = 5
+        observers = [AsyncObserver(name=f'test_name-{i}') for i in range(100)]
+        for observer in observers:
+            observable.add_observer(observer=observer, key=key)
+
+        start = time.time()
+        asyncio.run(observable.notify_observers(event=Event(name='Test Event', data={key: event_value}), key=key))
+
+        # Every update sleeps for up to a second, awaiting them one by one would take around a minute.
+        assert time.time() - start < 5
+        for observer in observers:
+            assert observer.total == event_value
+
+    def test_limits_concurrency(self):
+        ConcurrencyTrackingObserver.max_running = 0
+        max_concurrency = 3
+        observable = AsyncObservable(max_concurrency=max_concurrency)
+        key = 'test_key'
+        observers = [ConcurrencyTrackingObserver(name=f'test_name-{i}') for i in range(20)]
+        for observer in observers:
+            observable.add_observer(observer=observer, key=key)
+
+        asyncio.run(observable.notify_observers(event=Event(name='Test Event', data={key: 1}), key=key))
+
+        assert ConcurrencyTrackingObserver.max_running == max_concurrency
+        for observer in observers:
+            assert observer.total == 1
+
+    def test_failing_observer_does_not_affect_others(self):
+        observable = AsyncObservable()
+        key = 'test_key'
+        failing_observer = FailingObserver(name='failing')
+        observer = ConcurrencyTrackingObserver(name='test_name')
+        observable.add_observer(observer=failing_observer, key=key)
+        observable.add_observer(observer=observer, key=key)
+
+        failure, result = asyncio.run(
+            observable.notify_observers(event=Event(name='Test Event', data={key: 1}), key=key)
+        )
+
+        assert isinstance(failure, ValueError)
+        assert result is None
+        assert observer.total == 1
+
+    def test_notifies_observers_from_another_thread(self):
+        loop = asyncio.new_event_loop()
+        loop_thread = Thread(target=loop.run_forever)
+        loop_thread.start()
+        observable = AsyncObservable(loop=loop)
+        key = 'test_key'
+        observer = ConcurrencyTrackingObserver(name='test_name')
+        observable.add_observer(observer=observer, key=key)
+
+        future = observable.notify_observers_threadsafe(event=Event(name='Test Event', data={key: 1}), key=key)
+
+        assert future.result(timeout=5) == [None]
+        assert observer.total == 1
+        loop.call_soon_threadsafe(loop.stop)
+        loop_thread.join()
+        loop.close()
+
+    def test_limited_observable_outlives_its_loop(self):
+        observable = AsyncObservable(max_concurrency=2)
+        key = 'test_key'
+        observer = ConcurrencyTrackingObserver(name='test_name')
+        observable.add_observer(observer=observer, key=key)
+
+        for _ in range(2):
+            results = asyncio.run(observable.notify_observers(event=Event(name='Test Event', data={key: 1}), key=key))
+            assert results == [None]
+
+        assert observer.total == 2
+        with pytest.raises(RuntimeError):
+            observable.notify_observers_threadsafe(event=Event(name='Test Event', data={key: 1}), key=key)
+
+    def test_notifying_from_another_open_loop_raises(self):
+        loop = asyncio.new_event_loop()
+        observable = AsyncObservable(max_concurrency=2, loop=loop)
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(observable.notify_observers(event=Event(name='Test Event', data={}), key='test_key'))
+        loop.close()
@@ -0,0 +1,282 @@
+"""
+Observer pattern with the observers living in separate subscriber processes.
+
+CPU heavy observers cannot run in parallel in threads because of the GIL. Here every observer is sent to one of the
+subscriber processes when it is registered and its update calls run there, while the observable in the parent process
+only ships the events.
+
+Pickling and sending a message to another process costs far more than a method call, so events are buffered per key
+and sent in batches. Each batch is pickled once, no matter how many subscriber processes it goes to, and the subscriber
+processes hand the whole batch to their observers (see deliver_batch).
+
+An exception raised by an observer does not stop its subscriber process, it is recorded (as the observer name, the key
+and the repr of the exception, the exception itself may not pickle) and sent back by stop() into
+ProcessObservable.errors.
+"""
+import itertools
+import pickle
+import queue
+import time
+from multiprocessing import Process, Queue
+from threading import Lock
+from typing import Dict, List, Tuple
+
+from observer_pattern_problem.multi_threaded.dispatchers import ThreadPoolDispatcher
+from observer_pattern_problem.multi_threaded.observer_pattern_multi_threaded import (
+    Event,
+    EventKeys,
+    Observable,
+    Observer,
+    deliver_batch,
+)
+
+
+class Commands:
+    ADD = 'add'
+    REMOVE = 'remove'
+    EVENTS = 'events'
+    STOP = 'stop'
+
+
+# How often stop() checks that the subscriber processes it waits for are still alive.
+RESULTS_POLL_INTERVAL = 0.1
+
+ObserverError = Tuple[str, str, str]
+
+
+def run_subscriber_process(commands: Queue, results: Queue, process_index: int = 0):
+    """
+    Body of a subscriber process - applies the commands sent by the ProcessObservable until told to stop and then
+    sends its index, the observers, with their final state, and the errors raised by the observers back.
+    """
+    observers: Dict[int, Observer] = {}
+    key_map: Dict[str, Dict[int, None]] = {}
+    errors: List[ObserverError] = []
+
+    while True:
+        command, *arguments = commands.get()
+        if command == Commands.EVENTS:
+            key, payload = arguments
+            events = pickle.loads(payload)
+            for token in key_map.get(key, ()):
+                observer = observers[token]
+                try:
+                    deliver_batch(observer=observer, events=events, key=key)
+                except Exception as error:
+                    errors.append((observer.name, key, repr(error)))
+        elif command == Commands.ADD:
+            key, token, observer = arguments
+            observers.setdefault(token, observer)
+            key_map.setdefault(key, {})[token] = None
+        elif command == Commands.REMOVE:
+            key, token, forget = arguments
+            tokens_for_key = key_map.get(key, {})
+            tokens_for_key.pop(token, None)
+            if not tokens_for_key:
+                key_map.pop(key, None)
+            if forget:
+                # Removed from its last key, the token is never used again.
+                observers.pop(token, None)
+        elif command == Commands.STOP:
+            results.put((process_index, observers, errors))
+            return
+
+
+class ProcessObservable:
+    """
+    Observers are spread over the subscriber processes round robin, an observer registered for several keys stays in
+    the process it was first sent to. The observers in the subscriber processes are copies, call stop() to get them back
+    with their final state. An observer removed from all its keys is forgotten by both processes, adding it again sends
+    a fresh copy.
+
+    Events are delivered once batch_size of them are buffered for a key or when flush() is called.
+    All the methods can be called from any number of threads.
+
+    The errors raised by the observers in the subscriber processes are collected in errors by stop().
+    """
+    def __init__(self, number_of_processes: int = 2, batch_size: int = 100):
+        self.batch_size = batch_size
+        self.lock = Lock()
+        self.results = Queue()
+        self.command_queues = [Queue() for _ in range(number_of_processes)]
+        self.processes = [
+            Process(
+                target=run_subscriber_process,
+                kwargs={'commands': commands, 'results': self.results, 'process_index': process_index},
+                daemon=True,
+            )
+            for process_index, commands in enumerate(self.command_queues)
+        ]
+        for process in self.processes:
+            process.start()
+
+        # Observers are identified by a token from a counter, so a token is never reused even after its observer is
+        # gone. tokens maps the id of every registered observer to its token, registrations counts its keys.
+        self.tokens: Dict[int, int] = {}
+        self.token_counter = itertools.count()
+        self.observers: Dict[int, Observer] = {}
+        self.locations: Dict[int, int] = {}
+        self.registrations: Dict[int, int] = {}
+        self.key_map: Dict[str, Dict[int, None]] = {}
+        self.pending_events: Dict[str, List[Event]] = {}
+        self.next_process = 0
+        self.errors: List[ObserverError] = []
+
+    def add_observer(self, observer: Observer, key: str) -> bool:
+        """
+        Registering the same observer twice for a key is a no-op, returns whether the observer was added.
+        """
+        with self.lock:
+            # The registered observers are kept alive by self.observers, so their ids are unique.
+            token = self.tokens.get(id(observer))
+            tokens_for_key = self.key_map.setdefault(key, {})
+            if token in tokens_for_key:
+                return False
+
+            if token is None:
+                token = self.tokens[id(observer)] = next(self.token_counter)
+                self.observers[token] = observer
+                self.locations[token] = self.next_process
+                self.registrations[token] = 0
+                self.next_process = (self.next_process + 1) % len(self.processes)
+            # Events buffered before the registration must not reach the new observer.
+            self._flush_key(key)
+            tokens_for_key[token] = None
+            self.registrations[token] += 1
+            self.command_queues[self.locations[token]].put((Commands.ADD, key, token, observer))
+            return True
+
+    def remove_observer(self, observer: Observer, key: str):
+        with self.lock:
+            token = self.tokens.get(id(observer))
+            tokens_for_key = self.key_map.get(key)
+            if tokens_for_key is None or token not in tokens_for_key:
+                return
+
+            # Events buffered before the removal must still reach the observer.
+            self._flush_key(key)
+            del tokens_for_key[token]
+            if not tokens_for_key:
+                del self.key_map[key]
+            self.registrations[token] -= 1
+            forget = self.registrations[token] == 0
+            self.command_queues[self.locations[token]].put((Commands.REMOVE, key, token, forget))
+            if forget:
+                del self.tokens[id(observer)]
+                del self.observers[token]
+                del self.locations[token]
+                del self.registrations[token]
+
+    def notify_observers(self, event: Event, key: str):
+        with self.lock:
+            if key not in self.key_map:
+                return
+
+            pending_events_for_key = self.pending_events.setdefault(key, [])
+            pending_events_for_key.append(event)
+            if len(pending_events_for_key) >= self.batch_size:
+                self._flush_key(key)
+
+    def flush(self):
+        with self.lock:
+            for key in list(self.pending_events):
+                self._flush_key(key)
+
+    def _flush_key(self, key: str):
+        events = self.pending_events.pop(key, None)
+        if not events:
+            return
+
+        payload = pickle.dumps(events, protocol=pickle.HIGHEST_PROTOCOL)
+        for process_index in {self.locations[token] for token in self.key_map.get(key, ())}:
+            self.command_queues[process_index].put((Commands.EVENTS, key, payload))
+
+    def stop(self) -> Dict[Observer, Observer]:
+        """
+        Deliver the buffered events, stop the subscriber processes and return a map of every registered observer to
+        its copy from the subscriber process, the observers removed from all their keys are not included. Raises
+        RuntimeError if a subscriber process died instead of answering.
+        """
+        self.flush()
+        for commands in self.command_queues:
+            commands.put((Commands.STOP,))
+
+        remote_observers: Dict[int, Observer] = {}
+        waiting_for = set(range(len(self.processes)))
+        dead_processes = []
+        # Collect the results before joining, a process does not exit until its queued data is consumed.
+        while waiting_for:
+            try:
+                process_index, observers, errors = self.results.get(timeout=RESULTS_POLL_INTERVAL)
+            except queue.Empty:
+                dead = {index for index in waiting_for if not self.processes[index].is_alive()}
+                if dead:
+                    # A process which answered and exited has its answer in the queue already, take it first.
+                    try:
+                        process_index, observers, errors = self.results.get(timeout=RESULTS_POLL_INTERVAL)
+                    except queue.Empty:
+                        dead_processes.extend(sorted(dead))
+                        waiting_for -= dead
+                        continue
+                else:
+                    continue
+            waiting_for.discard(process_index)
+            remote_observers.update(observers)
+            self.errors.extend(errors)
+        for process in self.processes:
+            process.join()
+
+        if dead_processes:
+            exit_codes = [self.processes[index].exitcode for index in dead_processes]
+            raise RuntimeError(f'Subscriber processes {dead_processes} died with exit codes {exit_codes}')
+        return {self.observers[token]: remote_observer for token, remote_observer in remote_observers.items()}
+
+
+class CpuBoundObserver(Observer):
+    """
+    Observer doing some number crunching for every event, instead of printing and sleeping like the Observer.
+    """
+    def __init__(self, name: str, work: int = 20000):
+        super().__init__(name=name)
+        self.work = work
+
+    def update(self, event: Event, key: str):
+        sum(i * i for i in range(self.work))
+        self.total += event.data.get(key, 0)
+
+    def update_batch(self, events: List[Event], key: str):
+        for event in events:
+            self.update(event=event, key=key)
+
+
+def main():
+    number_of_workers = 4
+    number_of_observers = 8
+    number_of_events = 500
+
+    events = [Event(name='Adding Expenses', data={EventKeys.EXPENSES: 1}) for i in range(number_of_events)]
+
+    dispatcher = ThreadPoolDispatcher(max_workers=number_of_workers)
+    observable = Observable(dispatcher=dispatcher)
+    for i in range(number_of_observers):
+        observable.add_observer(observer=CpuBoundObserver(name=f'Observer-{i}'), key=EventKeys.EXPENSES)
+
+    start = time.time()
+    for event in events:
+        observable.notify_observers(event=event, key=EventKeys.EXPENSES)
+    dispatcher.shutdown()
+    print(f'Multi threaded observable execution time: {time.time() - start}')
+
+    process_observable = ProcessObservable(number_of_processes=number_of_workers)
+    for i in range(number_of_observers):
+        process_observable.add_observer(observer=CpuBoundObserver(name=f'Observer-{i}'), key=EventKeys.EXPENSES)
+
+    start = time.time()
+    for event in events:
+        process_observable.notify_observers(event=event, key=EventKeys.EXPENSES)
+    process_observable.stop()
+    print(f'Multi process observable execution time: {time.time() - start}')
+
+
+if __name__ == '__main__':
+    main()
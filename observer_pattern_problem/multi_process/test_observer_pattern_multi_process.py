@@ -0,0 +1,100 @@
+from typing import List
+
+import pytest
+
+from observer_pattern_problem.multi_process.observer_pattern_multi_process import Event, Observer, ProcessObservable
+
+
+class RecordingObserver(Observer):
+    def __init__(self, name: str):
+        super().__init__(name=name)
+        self.batch_sizes = []
+
+    def update_batch(self, events: List[Event], key: str):
+        self.batch_sizes.append(len(events))
+        self.total += sum(event.data.get(key, 0) for event in events)
+
+
+class FailingObserver(Observer):
+    def update_batch(self, events: List[Event], key: str):
+        raise ValueError('update failed')
+
+
+class TestProcessObservable:
+    def test_notifies_observers_in_subscriber_processes(self):
+        observable = ProcessObservable(number_of_processes=2, batch_size=100)
+        key = 'test_key'
+        event_value = 5
+        number_of_events = 250
+        observers = [RecordingObserver(name=f'test_name-{i}') for i in range(4)]
+        for observer in observers:
+            observable.add_observer(observer=observer, key=key)
+
+        for i in range(number_of_events):
+            observable.notify_observers(event=Event(name=f'Test Event-{i}', data={key: event_value}), key=key)
+        remote_observers = observable.stop()
+
+        assert set(remote_observers) == set(observers)
+        for observer in observers:
+            remote_observer = remote_observers[observer]
+            assert remote_observer.name == observer.name
+            assert remote_observer.total == event_value * number_of_events
+            assert remote_observer.batch_sizes == [100, 100, 50]
+
+    def test_removed_observer_receives_events_sent_before_removal(self):
+        observable = ProcessObservable(number_of_processes=1, batch_size=100)
+        key = 'test_key'
+        # Still registered for the other key, so stop() returns its copy.
+        other_key = 'other_key'
+        observer = RecordingObserver(name='test_name')
+        observable.add_observer(observer=observer, key=key)
+        observable.add_observer(observer=observer, key=other_key)
+
+        observable.notify_observers(event=Event(name='Before Removal', data={key: 1}), key=key)
+        observable.remove_observer(observer=observer, key=key)
+        observable.notify_observers(event=Event(name='After Removal', data={key: 1}), key=key)
+        remote_observers = observable.stop()
+
+        assert remote_observers[observer].total == 1
+
+    def test_removed_observers_are_forgotten(self):
+        observable = ProcessObservable(number_of_processes=2)
+        key = 'test_key'
+        for i in range(100):
+            observer = RecordingObserver(name=f'test_name-{i}')
+            observable.add_observer(observer=observer, key=key)
+            observable.remove_observer(observer=observer, key=key)
+        observer = RecordingObserver(name='kept')
+        observable.add_observer(observer=observer, key=key)
+
+        observable.notify_observers(event=Event(name='Test Event', data={key: 1}), key=key)
+        remote_observers = observable.stop()
+
+        assert list(observable.observers.values()) == [observer]
+        assert len(observable.tokens) == len(observable.locations) == len(observable.registrations) == 1
+        # The subscriber processes forgot their copies too.
+        assert list(remote_observers) == [observer]
+        assert remote_observers[observer].total == 1
+
+    def test_observer_errors_do_not_stop_the_subscriber_process(self):
+        observable = ProcessObservable(number_of_processes=1, batch_size=1)
+        key = 'test_key'
+        failing_observer = FailingObserver(name='failing')
+        observer = RecordingObserver(name='recording')
+        observable.add_observer(observer=failing_observer, key=key)
+        observable.add_observer(observer=observer, key=key)
+
+        for i in range(3):
+            observable.notify_observers(event=Event(name=f'Test Event-{i}', data={key: 1}), key=key)
+        remote_observers = observable.stop()
+
+        assert remote_observers[observer].total == 3
+        assert observable.errors == [('failing', key, "ValueError('update failed')")] * 3
+
+    def test_stop_does_not_hang_on_a_dead_subscriber_process(self):
+        observable = ProcessObservable(number_of_processes=2)
+        observable.processes[0].kill()
+        observable.processes[0].join()
+
+        with pytest.raises(RuntimeError, match=r'\[0\]'):
+            observable.stop()
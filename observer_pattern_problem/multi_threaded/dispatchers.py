@@ -0,0 +1,187 @@
+"""
+Dispatchers decide how the observers' update calls for a single event are executed.
+
+By default the Observable notifies its observers one after the other in the notifying thread, so a single slow observer
+delays all of the ones after it and the latency of firing an event is the sum of the latencies of all observers.
+The dispatchers below fan the update calls out so that firing an event only takes as long as the slowest observer (or
+the timeout, whichever comes first).
+
+Each dispatcher receives the update calls as ready to run callables and returns a list of futures - one per call.
+When waiting, the futures are complete by the time dispatch returns. When not waiting (fire-and-forget), the caller can
+inspect the futures later. Exceptions raised by the observers are stored on their futures instead of being raised in the
+notifying thread.
+
+The timeout applies to every call on its own and is counted from the moment the call starts running, so the calls
+queued behind slow observers get their full time too. A call running longer fails its future with a TimeoutError, the
+observer keeps running though (Python cannot interrupt a running thread). Every timed out or cancelled call is traced
+as a warning.
+"""
+import asyncio
+import heapq
+import inspect
+import itertools
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor, TimeoutError, wait as wait_for_futures
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from tracing.trace_sink import get_tracer
+
+tracer = get_tracer(__name__)
+
+
+def describe_call(call: Callable) -> str:
+    """
+    Name of the observer an update call is for, the calls are partials of observer.update or deliver_batch.
+    """
+    observer = getattr(call, 'keywords', {}).get('observer')
+    if observer is None:
+        observer = getattr(getattr(call, 'func', call), '__self__', None)
+    return getattr(observer, 'name', None) or repr(call)
+
+
+class Dispatcher(ABC):
+    @abstractmethod
+    def dispatch(self, calls: Sequence[Callable[[], None]], wait: bool = True) -> List[Future]:
+        pass
+
+    @abstractmethod
+    def shutdown(self, wait: bool = True):
+        pass
+
+    @staticmethod
+    def _trace_unfinished(call: Callable, future: Future):
+        if future.cancelled():
+            tracer.warning('Update call of %s was cancelled', describe_call(call))
+        elif isinstance(future.exception(), (TimeoutError, asyncio.TimeoutError)):
+            tracer.warning('Update call of %s timed out', describe_call(call))
+
+
+class ThreadPoolDispatcher(Dispatcher):
+    """
+    Runs the update calls on a bounded pool of threads.
+
+    With a timeout a watchdog thread fails the futures of the calls still running when their time is up.
+    """
+    def __init__(self, max_workers: int = 10, timeout: Optional[float] = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ObserverDispatch')
+        self.timeout = timeout
+        # (deadline, sequence number, future) of the running calls, the sequence number breaks the ties.
+        self.deadlines: List[Tuple[float, int, Future]] = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.watchdog = None
+        if timeout is not None:
+            self.watchdog = threading.Thread(target=self._watch, name='ObserverDispatchWatchdog', daemon=True)
+            self.watchdog.start()
+
+    def _watch(self):
+        with self.condition:
+            while not self.stopped:
+                if not self.deadlines:
+                    self.condition.wait()
+                    continue
+                deadline, _, future = self.deadlines[0]
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+                heapq.heappop(self.deadlines)
+                self._finish(future, exception=TimeoutError(f'The update call did not finish in {self.timeout}s'))
+
+    @staticmethod
+    def _finish(future: Future, result: Any = None, exception: Optional[BaseException] = None):
+        # Whichever comes first, the call or its timeout, completes the future.
+        try:
+            if exception is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exception)
+        except InvalidStateError:
+            pass
+
+    def _run(self, call: Callable[[], None], future: Future):
+        if not future.set_running_or_notify_cancel():
+            return
+        if self.timeout is not None:
+            with self.condition:
+                heapq.heappush(self.deadlines, (time.monotonic() + self.timeout, next(self.sequence), future))
+                self.condition.notify()
+        try:
+            result = call()
+        except BaseException as error:
+            self._finish(future, exception=error)
+        else:
+            self._finish(future, result=result)
+
+    def dispatch(self, calls: Sequence[Callable[[], None]], wait: bool = True) -> List[Future]:
+        futures = []
+        for call in calls:
+            future = Future()
+            future.add_done_callback(lambda done_future, call=call: self._trace_unfinished(call, done_future))
+            self.executor.submit(self._run, call, future)
+            futures.append(future)
+        if wait:
+            # Every call either finishes or times out once it runs, so every future completes.
+            wait_for_futures(futures)
+        return futures
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+
+class AsyncioDispatcher(Dispatcher):
+    """
+    Runs the update calls on an asyncio event loop living in its own daemon thread.
+
+    Coroutine update methods are awaited directly on the loop, regular update methods are run in the loop's bounded
+    executor. A call running longer than the timeout fails its future with asyncio.TimeoutError.
+    """
+    def __init__(self, max_workers: int = 10, timeout: Optional[float] = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ObserverDispatch')
+        self.timeout = timeout
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self._run_loop, name='ObserverDispatchLoop', daemon=True)
+        self.loop_thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _run_call(self, call: Callable[[], None]):
+        if inspect.iscoroutinefunction(call):
+            return await asyncio.wait_for(call(), timeout=self.timeout)
+
+        # The time waiting for a free executor thread does not count, start the timeout once the call runs.
+        started = asyncio.Event()
+
+        def run():
+            self.loop.call_soon_threadsafe(started.set)
+            return call()
+
+        executor_future = self.loop.run_in_executor(self.executor, run)
+        await started.wait()
+        return await asyncio.wait_for(executor_future, timeout=self.timeout)
+
+    def dispatch(self, calls: Sequence[Callable[[], None]], wait: bool = True) -> List[Future]:
+        futures = []
+        for call in calls:
+            future = asyncio.run_coroutine_threadsafe(self._run_call(call), self.loop)
+            future.add_done_callback(lambda done_future, call=call: self._trace_unfinished(call, done_future))
+            futures.append(future)
+        if wait:
+            # The timeouts are enforced on the loop so every future is guaranteed to complete.
+            wait_for_futures(futures)
+        return futures
+
+    def shutdown(self, wait: bool = True):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if wait:
+            self.loop_thread.join()
+            self.loop.close()
+        self.executor.shutdown(wait=wait)
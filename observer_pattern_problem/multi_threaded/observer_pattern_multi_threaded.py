@@ -50,14 +50,23 @@ public class SingleThreadedEventPusher {
   }
 }
 
+Run it from the repository root with:
+python -m observer_pattern_problem.multi_threaded.observer_pattern_multi_threaded
+
 """
 import random
-from collections import defaultdict
+from concurrent.futures import Future
 from dataclasses import dataclass
+from functools import partial
 from threading import Lock
 from time import sleep
-from typing import DefaultDict, List
-import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from weakref import ReferenceType, ref
+
+from observer_pattern_problem.multi_threaded.dispatchers import Dispatcher
+from tracing.trace_sink import enable_tracing, get_tracer
+
+tracer = get_tracer(__name__)
 
 
 def add_delay(toggle: bool = False):
@@ -81,12 +90,139 @@ class Observer:
         self.total = 0
 
     def update(self, event: Event, key: str):
-        print(f'{self.name} received event "{event.name}" for key: {key}\n')
-        print(f'Event data: {event.data}\n')
+        tracer.debug('%s received event "%s" for key: %s', self.name, event.name, key)
+        tracer.debug('Event data: %s', event.data)
         self.total += event.data.get(key, 0)
-        print(f'Total expenses: {self.total}\n')
+        tracer.debug('Total expenses: %s', self.total)
         add_delay(True)
 
+    def update_batch(self, events: Sequence[Event], key: str):
+        tracer.debug('%s received batch of %s events for key: %s', self.name, len(events), key)
+        self.total += sum(event.data.get(key, 0) for event in events)
+        tracer.debug('Total expenses: %s', self.total)
+        add_delay(True)
+
+
+def deliver_batch(observer: Observer, events: Sequence[Event], key: str):
+    """
+    Hand the whole batch to the observer if it knows how to handle one, otherwise fall back to one update per event.
+    """
+    update_batch = getattr(observer, 'update_batch', None)
+    if update_batch is not None:
+        update_batch(events=events, key=key)
+        return
+
+    for event in events:
+        observer.update(event=event, key=key)
+
+
+# Observers are registered either directly or, in weak mode, through a weak reference.
+ObserverHandle = Union[Observer, ReferenceType]
+
+
+class KeyMapStripe:
+    def __init__(self):
+        self.lock = Lock()
+        # The registries are insertion ordered dicts used as ordered sets - O(1) add, remove and duplicate check.
+        self.registries: Dict[str, Dict[ObserverHandle, None]] = {}
+        self.snapshots: Dict[str, Tuple[ObserverHandle, ...]] = {}
+        self.reclaimed = 0
+
+
+class ShardedKeyMap:
+    """
+    Maps keys to the copy-on-write snapshots of their observers.
+
+    The keys are spread over a number of stripes by their hash and every stripe has its own lock, so adding or removing
+    observers for one key only contends with writers whose keys landed in the same stripe.
+    Looking up a key without observers returns an empty tuple without storing anything and a key is dropped as soon as
+    its last observer is removed, so the map only ever holds keys which have observers.
+
+    Writers only update the registry of a key and invalidate its snapshot, which keeps adding and removing O(1) even
+    with thousands of observers per key. The snapshot is rebuilt once, by the first notification after the change, and
+    then read without locking by all the following ones.
+    """
+    def __init__(self, number_of_stripes: int = 16):
+        self.stripes = [KeyMapStripe() for _ in range(number_of_stripes)]
+
+    def stripe_for(self, key: str) -> KeyMapStripe:
+        return self.stripes[hash(key) % len(self.stripes)]
+
+    def __getitem__(self, key: str) -> Tuple[ObserverHandle, ...]:
+        stripe = self.stripe_for(key)
+        # Reading the cached snapshot is a single atomic lookup, a tuple is never mutated once it is cached.
+        snapshot = stripe.snapshots.get(key)
+        if snapshot is not None:
+            return snapshot
+        if key not in stripe.registries:
+            return ()
+
+        with stripe.lock:
+            registry = stripe.registries.get(key)
+            if registry is None:
+                return ()
+            snapshot = stripe.snapshots.get(key)
+            if snapshot is None:
+                snapshot = stripe.snapshots[key] = tuple(registry)
+            return snapshot
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.stripe_for(key).registries
+
+    def __len__(self) -> int:
+        return sum(len(stripe.registries) for stripe in self.stripes)
+
+    def __iter__(self) -> Iterator[str]:
+        for stripe in self.stripes:
+            yield from list(stripe.registries)
+
+    def add(self, key: str, observer: ObserverHandle) -> bool:
+        stripe = self.stripe_for(key)
+        with stripe.lock:
+            registry = stripe.registries.setdefault(key, {})
+            if observer in registry:
+                return False
+
+            registry[observer] = None
+            stripe.snapshots.pop(key, None)
+            return True
+
+    def remove(self, key: str, observer: ObserverHandle) -> bool:
+        stripe = self.stripe_for(key)
+        with stripe.lock:
+            registry = stripe.registries.get(key)
+            if registry is None or observer not in registry:
+                return False
+
+            del registry[observer]
+            if not registry:
+                del stripe.registries[key]
+            stripe.snapshots.pop(key, None)
+            return True
+
+    def prune(self, key: str, dead_references: Iterable[ReferenceType]):
+        """
+        Drop the weak references whose observers have been garbage collected.
+        """
+        stripe = self.stripe_for(key)
+        with stripe.lock:
+            registry = stripe.registries.get(key)
+            if registry is None:
+                return
+
+            for dead_reference in dead_references:
+                # Another notifying thread could have pruned the same reference already.
+                if dead_reference in registry:
+                    del registry[dead_reference]
+                    stripe.reclaimed += 1
+            if not registry:
+                del stripe.registries[key]
+            stripe.snapshots.pop(key, None)
+
+    @property
+    def reclaimed(self) -> int:
+        return sum(stripe.reclaimed for stripe in self.stripes)
+
 
 class Observable:
     """
@@ -101,42 +237,110 @@ class Observable:
     getting notified.
     - If we start notifying and a thread removes a subscriber in a middle of a for loop we will send no longer wanted
     notification.
+
+    Since firing events happens orders of magnitude more often than adding or removing observers, the observers for
+    each key are kept as an immutable snapshot tuple. Writers only update the registry of the key under its stripe lock
+    and invalidate the snapshot. The first notification after a change pays for it: it takes the stripe lock and
+    allocates the new tuple. All the following notifications read the cached tuple - they never take the lock and never
+    copy it, so they do not serialise on each other and always iterate over a consistent set of observers.
+
+    The snapshots live in a ShardedKeyMap, so writers working on different keys do not contend on a single lock.
+
+    With weak_references=True the observable only holds weak references to its observers, so observers which are never
+    removed do not leak. The references of garbage collected observers are pruned lazily, by the next notification for
+    their key, and counted in reclaimed_observers.
+
+    To stop one slow observer from blocking all the others a dispatcher can be passed in (see dispatchers.py). It fans
+    the update calls out so the latency of firing an event is bounded by the slowest observer instead of the sum of all
+    of them.
     """
-    def __init__(self, delay_toggle: bool = False):
-        self.key_map: DefaultDict[str, List[Observer]] = defaultdict(list)
+    def __init__(
+        self,
+        delay_toggle: bool = False,
+        dispatcher: Optional[Dispatcher] = None,
+        number_of_stripes: int = 16,
+        weak_references: bool = False,
+    ):
+        self.key_map = ShardedKeyMap(number_of_stripes=number_of_stripes)
         self.delay_toggle = delay_toggle
-        self.key_map_lock = Lock()
+        self.dispatcher = dispatcher
+        self.weak_references = weak_references
+
+    @property
+    def reclaimed_observers(self) -> int:
+        return self.key_map.reclaimed
+
+    def _handle_for(self, observer: Observer) -> ObserverHandle:
+        return ref(observer) if self.weak_references else observer
+
+    def _observers_for(self, key: str) -> Sequence[Observer]:
+        snapshot = self.key_map[key]
+        if not self.weak_references:
+            return snapshot
 
-    def add_observer(self, observer: Observer, key: str):
+        observers = []
+        dead_references = []
+        for reference in snapshot:
+            observer = reference()
+            if observer is None:
+                dead_references.append(reference)
+            else:
+                observers.append(observer)
+        if dead_references:
+            self.key_map.prune(key=key, dead_references=dead_references)
+        return observers
+
+    def add_observer(self, observer: Observer, key: str) -> bool:
+        """
+        Registering the same observer twice for a key is a no-op, returns whether the observer was added.
+        """
         add_delay(toggle=self.delay_toggle)
-        with self.key_map_lock:
-            print(f'Acquired lock in: {threading.current_thread().getName()}\n')
-            self.key_map[key].append(observer)
-            print(f'Added observer: {observer.name}\n')
+        added = self.key_map.add(key=key, observer=self._handle_for(observer))
+        if added:
+            tracer.debug('Added observer: %s', observer.name)
         add_delay(toggle=self.delay_toggle)
+        return added
 
     def remove_observer(self, observer: Observer, key: str):
         add_delay(toggle=self.delay_toggle)
-        with self.key_map_lock:
-            if observer in self.key_map[key]:
-                self.key_map[key].remove(observer)
-                print(f'Removed observer: {observer.name}\n')
+        if self.key_map.remove(key=key, observer=self._handle_for(observer)):
+            tracer.debug('Removed observer: %s', observer.name)
         add_delay(toggle=self.delay_toggle)
 
-    def notify_observers(self, event: Event, key: str):
-        with self.key_map_lock:
-            print(f'Acquired lock in: {threading.current_thread().getName()}\n')
-            observers_for_key = self.key_map[key]
-            if not observers_for_key:
-                return
-
-            copy_of_observers_for_key = list(observers_for_key)
+    def notify_observers(self, event: Event, key: str, wait: bool = True) -> Optional[List[Future]]:
+        """
+        Without a dispatcher the observers are updated one by one in the calling thread and None is returned.
+        With a dispatcher the futures of the update calls are returned, pass wait=False to fire and forget.
+        """
+        observers_for_key = self._observers_for(key)
+        if self.dispatcher is not None:
+            calls = [partial(observer.update, event=event, key=key) for observer in observers_for_key]
+            return self.dispatcher.dispatch(calls, wait=wait)
 
-        for observer in copy_of_observers_for_key:
+        for observer in observers_for_key:
             observer.update(event=event, key=key)
 
+    def notify_observers_batch(self, events: Iterable[Event], key: str, wait: bool = True) -> Optional[List[Future]]:
+        """
+        Deliver many events for the same key at once.
+        The snapshot of observers is resolved once for the whole batch and each observer gets the batch in a single
+        call (see deliver_batch), instead of paying for the lookup and a method call per event.
+        """
+        events = list(events)
+        observers_for_key = self._observers_for(key)
+        if not events or not observers_for_key:
+            return [] if self.dispatcher is not None else None
+
+        if self.dispatcher is not None:
+            calls = [partial(deliver_batch, observer=observer, events=events, key=key) for observer in observers_for_key]
+            return self.dispatcher.dispatch(calls, wait=wait)
+
+        for observer in observers_for_key:
+            deliver_batch(observer=observer, events=events, key=key)
+
 
 if __name__ == '__main__':
+    enable_tracing()
     number_of_observers = 5
 
     observers = []
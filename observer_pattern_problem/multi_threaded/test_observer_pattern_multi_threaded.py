@@ -1,6 +1,21 @@
+import asyncio
+import gc
+import io
+import logging
+import time
+from concurrent.futures import TimeoutError
+from contextlib import ExitStack
 from threading import Thread
 
+from observer_pattern_problem.multi_threaded.dispatchers import AsyncioDispatcher, ThreadPoolDispatcher
 from observer_pattern_problem.multi_threaded.observer_pattern_multi_threaded import Observer, Event, Observable
+from tracing.trace_sink import disable_tracing, enable_tracing
+
+
+class SlowObserver(Observer):
+    def update(self, event: Event, key: str):
+        time.sleep(1)
+        self.total += event.data.get(key, 0)
 
 
 class TestSubscriber:
@@ -15,6 +30,24 @@ class TestSubscriber:
 
         assert subscriber.total == value
 
+    def test_update_batch(self):
+        subscriber = Observer(name='test_subscriber')
+        key = 'test_key'
+        events = [Event(name=f'test_event-{i}', data={key: i}) for i in range(5)]
+
+        subscriber.update_batch(events=events, key=key)
+
+        assert subscriber.total == sum(range(5))
+
+
+class PerEventObserver:
+    def __init__(self, name: str):
+        self.name = name
+        self.received = []
+
+    def update(self, event: Event, key: str):
+        self.received.append(event)
+
 
 class TestObservable:
     def test_add_observers_in_multiple_threads(self):
@@ -118,3 +151,198 @@ class TestObservable:
         assert len(observable.key_map[key]) == number_of_observers + 1
         for observer in [observer for observer in observers if observer is not additional_observer]:
             assert observer.total == event_value * number_of_events
+
+    def test_notifies_observers_without_taking_the_lock(self):
+        observable = Observable()
+        observer = Observer(name='test_name')
+        key = 'test_key'
+        event_value = 5
+        observable.add_observer(observer=observer, key=key)
+        # The first lookup after a change publishes the snapshot, all the following ones only read it.
+        assert observable.key_map[key] == (observer,)
+
+        with ExitStack() as stack:
+            for stripe in observable.key_map.stripes:
+                stack.enter_context(stripe.lock)
+            notify_thread = Thread(
+                target=observable.notify_observers,
+                kwargs={'event': Event(name='Test Event', data={key: event_value}), 'key': key},
+            )
+            notify_thread.start()
+            notify_thread.join(timeout=5)
+
+            assert not notify_thread.is_alive()
+        assert observer.total == event_value
+
+    def test_add_and_remove_publish_new_snapshot(self):
+        observable = Observable()
+        observers = [Observer(name=f'test_name-{i}') for i in range(3)]
+        key = 'test_key'
+        for observer in observers:
+            observable.add_observer(observer=observer, key=key)
+
+        snapshot = observable.key_map[key]
+        observable.remove_observer(observer=observers[1], key=key)
+
+        assert snapshot == tuple(observers)
+        assert observable.key_map[key] == (observers[0], observers[2])
+
+    def test_thread_pool_dispatcher_notifies_observers_in_parallel(self):
+        number_of_observers = 10
+        dispatcher = ThreadPoolDispatcher(max_workers=number_of_observers)
+        observable = Observable(dispatcher=dispatcher)
+        key = 'test_key'
+        event_value = 5
+        observers = [Observer(name=f'test_name-{i}') for i in range(number_of_observers)]
+        for observer in observers:
+            observable.add_observer(observer=observer, key=key)
+
+        start = time.time()
+        futures = observable.notify_observers(event=Event(name='Test Event', data={key: event_value}), key=key)
+        elapsed = time.time() - start
+        dispatcher.shutdown()
+
+        # Every Observer.update sleeps for up to a second, notifying them one by one would take several seconds.
+        assert elapsed < 2
+        assert all(future.done() for future in futures)
+        for observer in observers:
+            assert observer.total == event_value
+
+    def test_thread_pool_dispatcher_times_out_every_observer_on_its_own(self):
+        dispatcher = ThreadPoolDispatcher(max_workers=1, timeout=0.1)
+        observable = Observable(dispatcher=dispatcher)
+        key = 'test_key'
+        observers = [SlowObserver(name=f'test_name-{i}') for i in range(2)]
+        for observer in observers:
+            observable.add_observer(observer=observer, key=key)
+
+        traces = io.StringIO()
+        enable_tracing(level=logging.WARNING, stream=traces)
+        try:
+            first_future, second_future = observable.notify_observers(
+                event=Event(name='Test Event', data={key: 1}), key=key
+            )
+        finally:
+            disable_tracing()
+
+        # The second observer waited for the only worker, it is not cancelled but gets its own timeout once it runs.
+        assert isinstance(first_future.exception(), TimeoutError)
+        assert isinstance(second_future.exception(), TimeoutError)
+        assert 'Update call of test_name-0 timed out' in traces.getvalue()
+        assert 'Update call of test_name-1 timed out' in traces.getvalue()
+        dispatcher.shutdown()
+        assert observers[0].total == 1
+        assert observers[1].total == 1
+
+    def test_thread_pool_dispatcher_times_out_without_waiting(self):
+        dispatcher = ThreadPoolDispatcher(timeout=0.1)
+        observable = Observable(dispatcher=dispatcher)
+        key = 'test_key'
+        slow_observer = SlowObserver(name='slow')
+        observable.add_observer(observer=slow_observer, key=key)
+
+        start = time.time()
+        futures = observable.notify_observers(event=Event(name='Test Event', data={key: 1}), key=key, wait=False)
+
+        assert isinstance(futures[0].exception(timeout=5), TimeoutError)
+        assert time.time() - start < 1
+        dispatcher.shutdown()
+
+    def test_asyncio_dispatcher_fire_and_forget(self):
+        dispatcher = AsyncioDispatcher(timeout=0.1)
+        observable = Observable(dispatcher=dispatcher)
+        key = 'test_key'
+        fast_observer = Observer(name='fast')
+        fast_observer.update = lambda event, key: None
+        slow_observer = SlowObserver(name='slow')
+        observable.add_observer(observer=fast_observer, key=key)
+        observable.add_observer(observer=slow_observer, key=key)
+
+        fast_future, slow_future = observable.notify_observers(
+            event=Event(name='Test Event', data={key: 1}), key=key, wait=False
+        )
+
+        assert fast_future.result(timeout=5) is None
+        assert isinstance(slow_future.exception(timeout=5), asyncio.TimeoutError)
+        dispatcher.shutdown()
+
+    def test_notifies_observers_with_batch(self):
+        observable = Observable()
+        key = 'test_key'
+        event_value = 5
+        number_of_events = 100
+        observer = Observer(name='test_name')
+        per_event_observer = PerEventObserver(name='per_event')
+        observable.add_observer(observer=observer, key=key)
+        observable.add_observer(observer=per_event_observer, key=key)
+        events = [Event(name=f'Test Event-{i}', data={key: event_value}) for i in range(number_of_events)]
+
+        observable.notify_observers_batch(events=iter(events), key=key)
+
+        assert observer.total == event_value * number_of_events
+        assert per_event_observer.received == events
+
+    def test_notify_unknown_key_does_not_store_it(self):
+        observable = Observable()
+        key = 'test_key'
+
+        observable.notify_observers(event=Event(name='Test Event', data={key: 1}), key=key)
+        observable.remove_observer(observer=Observer(name='test_name'), key=key)
+
+        assert key not in observable.key_map
+        assert len(observable.key_map) == 0
+
+    def test_remove_last_observer_drops_key(self):
+        observable = Observable(number_of_stripes=4)
+        observer = Observer(name='test_name')
+        keys = [f'test_key-{i}' for i in range(10)]
+        for key in keys:
+            observable.add_observer(observer=observer, key=key)
+
+        assert sorted(observable.key_map) == sorted(keys)
+        for key in keys:
+            observable.remove_observer(observer=observer, key=key)
+
+        assert len(observable.key_map) == 0
+
+    def test_add_observer_twice_registers_it_once(self):
+        observable = Observable()
+        observer = Observer(name='test_name')
+        key = 'test_key'
+
+        assert observable.add_observer(observer=observer, key=key)
+        assert not observable.add_observer(observer=observer, key=key)
+
+        assert list(observable.key_map[key]) == [observer]
+
+    def test_remove_observer_keeps_notification_order(self):
+        observable = Observable()
+        observers = [Observer(name=f'test_name-{i}') for i in range(5)]
+        key = 'test_key'
+        for observer in observers:
+            observable.add_observer(observer=observer, key=key)
+
+        observable.remove_observer(observer=observers[2], key=key)
+        observable.add_observer(observer=observers[2], key=key)
+
+        assert list(observable.key_map[key]) == [observers[0], observers[1], observers[3], observers[4], observers[2]]
+
+    def test_weak_references_reclaim_forgotten_observers(self):
+        observable = Observable(weak_references=True)
+        key = 'test_key'
+        event_value = 5
+        kept_observer = Observer(name='kept')
+        forgotten_observer = Observer(name='forgotten')
+        observable.add_observer(observer=kept_observer, key=key)
+        observable.add_observer(observer=forgotten_observer, key=key)
+
+        del forgotten_observer
+        gc.collect()
+        observable.notify_observers(event=Event(name='Test Event', data={key: event_value}), key=key)
+
+        assert kept_observer.total == event_value
+        assert observable.reclaimed_observers == 1
+        assert len(observable.key_map[key]) == 1
+
+        observable.remove_observer(observer=kept_observer, key=key)
+        assert key not in observable.key_map
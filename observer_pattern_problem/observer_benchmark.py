@@ -0,0 +1,234 @@
+"""
+Throughput and latency benchmark for the single and multi-threaded Observable.
+
+Every scenario registers observers_per_key cheap observers for each of number_of_keys keys and then lets
+notifier_threads threads run a seeded random mix of operations against the observable: firing an event on a random key
+or, with probability churn_ratio, registering and removing an extra observer (churn).
+
+For each scenario we report fired events per second, the p50/p99 latency of notify_observers and the total time the
+threads spent waiting for the observable's locks. The single-threaded Observable is not thread-safe, so it is only
+benchmarked with a single notifier thread and has no locks to wait for.
+
+Run it with:
+python -m observer_pattern_problem.observer_benchmark --threads 1 4 16 64 --observers 1 100 10000 --keys 1 100
+"""
+import argparse
+import itertools
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+from observer_pattern_problem.multi_threaded import observer_pattern_multi_threaded
+from observer_pattern_problem.single_threaded import observer_pattern_single_threaded
+
+SINGLE_THREADED = 'single_threaded'
+MULTI_THREADED = 'multi_threaded'
+VARIANTS = (SINGLE_THREADED, MULTI_THREADED)
+
+# Fraction of the operations which are add/remove pairs instead of firing an event.
+MIXES = {
+    'fire-heavy': 0.01,
+    'churn-heavy': 0.5,
+}
+
+
+class CountingObserver:
+    """
+    Observer with an update as cheap as possible, so that we measure the observable and not the observers.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.total = 0
+
+    def update(self, event, key: str):
+        self.total += 1
+
+
+class TimedLock:
+    """
+    Drop in replacement for the stripe locks which sums up how long the threads waited to acquire it.
+    The wait time is only updated while holding the lock so it does not need any extra synchronisation.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wait_time = 0.0
+
+    def __enter__(self):
+        start = time.perf_counter()
+        self._lock.acquire()
+        self.wait_time += time.perf_counter() - start
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._lock.release()
+
+
+@dataclass
+class Scenario:
+    variant: str
+    mix: str
+    notifier_threads: int
+    observers_per_key: int
+    number_of_keys: int
+    operations: int
+    seed: int = 0
+
+
+@dataclass
+class ScenarioResult:
+    scenario: Scenario
+    events_fired: int
+    elapsed: float
+    p50_latency: float
+    p99_latency: float
+    lock_wait_time: Optional[float]
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events_fired / self.elapsed if self.elapsed else 0.0
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def build_observable(scenario: Scenario):
+    if scenario.variant == SINGLE_THREADED:
+        return observer_pattern_single_threaded.Observable(), None
+
+    observable = observer_pattern_multi_threaded.Observable()
+    locks = []
+    for stripe in observable.key_map.stripes:
+        stripe.lock = TimedLock()
+        locks.append(stripe.lock)
+    return observable, locks
+
+
+def run_scenario(scenario: Scenario) -> ScenarioResult:
+    observable, locks = build_observable(scenario)
+    keys = [f'key-{i}' for i in range(scenario.number_of_keys)]
+    for key in keys:
+        for i in range(scenario.observers_per_key):
+            observable.add_observer(observer=CountingObserver(name=f'{key}-observer-{i}'), key=key)
+        # Publish the snapshots up front so the first fire of every key is not counted as a rebuild.
+        observable.notify_observers(event=None, key=key)
+
+    churn_ratio = MIXES[scenario.mix]
+    operations_per_thread = max(1, scenario.operations // scenario.notifier_threads)
+    latencies_per_thread: List[List[float]] = [[] for _ in range(scenario.notifier_threads)]
+    start_barrier = threading.Barrier(scenario.notifier_threads + 1)
+
+    def run_notifier(thread_index: int):
+        generator = random.Random(scenario.seed + thread_index)
+        churn_observer = CountingObserver(name=f'churn-observer-{thread_index}')
+        latencies = latencies_per_thread[thread_index]
+        start_barrier.wait()
+        for _ in range(operations_per_thread):
+            key = generator.choice(keys)
+            if generator.random() < churn_ratio:
+                observable.add_observer(observer=churn_observer, key=key)
+                observable.remove_observer(observer=churn_observer, key=key)
+            else:
+                fire_start = time.perf_counter()
+                observable.notify_observers(event=None, key=key)
+                latencies.append(time.perf_counter() - fire_start)
+
+    threads = [
+        threading.Thread(target=run_notifier, kwargs={'thread_index': i}) for i in range(scenario.notifier_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(itertools.chain.from_iterable(latencies_per_thread))
+    return ScenarioResult(
+        scenario=scenario,
+        events_fired=len(latencies),
+        elapsed=elapsed,
+        p50_latency=percentile(latencies, 0.5),
+        p99_latency=percentile(latencies, 0.99),
+        lock_wait_time=sum(lock.wait_time for lock in locks) if locks is not None else None,
+    )
+
+
+def build_scenarios(
+    variants: Sequence[str],
+    mixes: Sequence[str],
+    threads: Sequence[int],
+    observers: Sequence[int],
+    keys: Sequence[int],
+    operations: int,
+    seed: int,
+) -> List[Scenario]:
+    scenarios = []
+    for variant, mix, notifier_threads, observers_per_key, number_of_keys in itertools.product(
+        variants, mixes, threads, observers, keys
+    ):
+        if variant == SINGLE_THREADED and notifier_threads > 1:
+            continue
+        scenarios.append(
+            Scenario(
+                variant=variant,
+                mix=mix,
+                notifier_threads=notifier_threads,
+                observers_per_key=observers_per_key,
+                number_of_keys=number_of_keys,
+                operations=operations,
+                seed=seed,
+            )
+        )
+    return scenarios
+
+
+def format_result(result: ScenarioResult) -> str:
+    scenario = result.scenario
+    lock_wait = f'{result.lock_wait_time * 1000:.1f}' if result.lock_wait_time is not None else '-'
+    return (
+        f'{scenario.variant:<16}{scenario.mix:<13}{scenario.notifier_threads:>8}{scenario.observers_per_key:>10}'
+        f'{scenario.number_of_keys:>6}{result.events_per_second:>14.0f}{result.p50_latency * 1e6:>12.1f}'
+        f'{result.p99_latency * 1e6:>12.1f}{lock_wait:>16}'
+    )
+
+
+HEADER = (
+    f'{"variant":<16}{"mix":<13}{"threads":>8}{"observers":>10}{"keys":>6}{"events/s":>14}{"p50 [us]":>12}'
+    f'{"p99 [us]":>12}{"lock wait [ms]":>16}'
+)
+
+
+def main(arguments: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Benchmark the Observable implementations.')
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument('--mixes', nargs='+', choices=list(MIXES), default=list(MIXES))
+    parser.add_argument('--threads', nargs='+', type=int, default=[1, 4, 16, 64])
+    parser.add_argument('--observers', nargs='+', type=int, default=[1, 100, 10000])
+    parser.add_argument('--keys', nargs='+', type=int, default=[1, 100])
+    parser.add_argument('--operations', type=int, default=1000, help='Operations per scenario, split across threads.')
+    parser.add_argument('--seed', type=int, default=0)
+    parsed_arguments = parser.parse_args(arguments)
+
+    scenarios = build_scenarios(
+        variants=parsed_arguments.variants,
+        mixes=parsed_arguments.mixes,
+        threads=parsed_arguments.threads,
+        observers=parsed_arguments.observers,
+        keys=parsed_arguments.keys,
+        operations=parsed_arguments.operations,
+        seed=parsed_arguments.seed,
+    )
+    print(HEADER)
+    for scenario in scenarios:
+        print(format_result(run_scenario(scenario)))
+
+
+if __name__ == '__main__':
+    main()
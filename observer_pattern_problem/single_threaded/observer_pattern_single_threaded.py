@@ -50,10 +50,17 @@ public class SingleThreadedEventPusher {
   }
 }
 
+Run it from the repository root with:
+python -m observer_pattern_problem.single_threaded.observer_pattern_single_threaded
+
 """
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import DefaultDict, List
+from typing import DefaultDict, Dict
+
+from tracing.trace_sink import enable_tracing, get_tracer
+
+tracer = get_tracer(__name__)
 
 
 class EventKeys:
@@ -72,29 +79,44 @@ class Observer:
         self.total = 0
 
     def update(self, event: Event, key: str):
-        print(f'{self.name} received event "{event.name}" for key: {key}')
-        print(f'Event data: {event.data}')
+        tracer.debug('%s received event "%s" for key: %s', self.name, event.name, key)
+        tracer.debug('Event data: %s', event.data)
         self.total += event.data.get(key, 0)
-        print(f'Total expenses: {self.total}')
+        tracer.debug('Total expenses: %s', self.total)
 
 
 class Observable:
     def __init__(self):
-        self.key_map: DefaultDict[str, List[Observer]] = defaultdict(list)
+        # Insertion ordered dicts used as ordered sets - O(1) add, remove and duplicate check with a stable order.
+        self.key_map: DefaultDict[str, Dict[Observer, None]] = defaultdict(dict)
+
+    def add_observer(self, observer: Observer, key: str) -> bool:
+        """
+        Registering the same observer twice for a key is a no-op, returns whether the observer was added.
+        """
+        observers_for_key = self.key_map[key]
+        if observer in observers_for_key:
+            return False
 
-    def add_observer(self, observer: Observer, key: str):
-        self.key_map[key].append(observer)
+        observers_for_key[observer] = None
+        return True
 
     def remove_observer(self, observer: Observer, key: str):
-        if observer in self.key_map[key]:
-            self.key_map[key].remove(observer)
+        # Only look the key up with get() - indexing the defaultdict would store an empty list for every unknown key.
+        observers_for_key = self.key_map.get(key)
+        if observers_for_key is not None and observer in observers_for_key:
+            del observers_for_key[observer]
+            if not observers_for_key:
+                del self.key_map[key]
 
     def notify_observers(self, event: Event, key: str):
-        for observer in self.key_map[key]:
+        # Iterate over a copy so that an observer can (un)register observers for this key from its update method.
+        for observer in tuple(self.key_map.get(key, ())):
             observer.update(event=event, key=key)
 
 
 if __name__ == '__main__':
+    enable_tracing()
     number_of_observers = 5
 
     observers = []
@@ -66,3 +66,44 @@ class TestObservable:
 
         for observer in observers:
             assert observer.total == number_of_events * event_value
+
+    def test_notify_and_remove_unknown_key_does_not_store_it(self):
+        observable = Observable()
+        key = 'test_key'
+
+        observable.notify_observers(event=Event(name='Test Event', data={key: 1}), key=key)
+        observable.remove_observer(observer=Observer(name='test_name'), key=key)
+
+        assert key not in observable.key_map
+
+    def test_remove_last_observer_drops_key(self):
+        observable = Observable()
+        observer = Observer(name='test_name')
+        key = 'test_key'
+        observable.add_observer(observer=observer, key=key)
+
+        observable.remove_observer(observer=observer, key=key)
+
+        assert key not in observable.key_map
+
+    def test_add_observer_twice_registers_it_once(self):
+        observable = Observable()
+        observer = Observer(name='test_name')
+        key = 'test_key'
+
+        assert observable.add_observer(observer=observer, key=key)
+        assert not observable.add_observer(observer=observer, key=key)
+
+        assert list(observable.key_map[key]) == [observer]
+
+    def test_remove_observer_keeps_notification_order(self):
+        observable = Observable()
+        observers = [Observer(name=f'test_name-{i}') for i in range(5)]
+        key = 'test_key'
+        for observer in observers:
+            observable.add_observer(observer=observer, key=key)
+
+        observable.remove_observer(observer=observers[2], key=key)
+        observable.add_observer(observer=observers[2], key=key)
+
+        assert list(observable.key_map[key]) == [observers[0], observers[1], observers[3], observers[4], observers[2]]
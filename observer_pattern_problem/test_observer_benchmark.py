@@ -0,0 +1,43 @@
+from observer_pattern_problem.observer_benchmark import (
+    MULTI_THREADED,
+    SINGLE_THREADED,
+    Scenario,
+    build_scenarios,
+    run_scenario,
+)
+
+
+class TestObserverBenchmark:
+    def test_build_scenarios_runs_single_threaded_variant_with_one_thread_only(self):
+        scenarios = build_scenarios(
+            variants=[SINGLE_THREADED, MULTI_THREADED],
+            mixes=['fire-heavy'],
+            threads=[1, 4],
+            observers=[1],
+            keys=[1],
+            operations=10,
+            seed=0,
+        )
+
+        assert [(scenario.variant, scenario.notifier_threads) for scenario in scenarios] == [
+            (SINGLE_THREADED, 1),
+            (MULTI_THREADED, 1),
+            (MULTI_THREADED, 4),
+        ]
+
+    def test_run_scenario(self):
+        scenario = Scenario(
+            variant=MULTI_THREADED,
+            mix='churn-heavy',
+            notifier_threads=4,
+            observers_per_key=10,
+            number_of_keys=3,
+            operations=200,
+        )
+
+        result = run_scenario(scenario)
+
+        assert 0 < result.events_fired < scenario.operations
+        assert result.events_per_second > 0
+        assert result.p50_latency <= result.p99_latency
+        assert result.lock_wait_time >= 0
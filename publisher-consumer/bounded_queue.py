@@ -0,0 +1,104 @@
+"""
+Bounded multi-producer, multi-consumer FIFO queue.
+
+publisher_consumer.py used to share a list under a single Condition: pop() took the newest item so the old ones could
+starve, every put woke a waiter whether it could use the item or not, and nothing stopped a fast publisher from growing
+the list without limit.
+
+BoundedQueue keeps the items in a deque (FIFO, O(1) at both ends) and holds at most maxsize of them. One lock guards the
+deque, with two conditions on it:
+
+- not_empty - the consumers wait on it in get, a put wakes exactly one of them,
+- not_full - the producers wait on it in put while the queue is full, a get wakes exactly one of them. Producers faster
+than the consumers are slowed down to their pace (backpressure) instead of filling the memory.
+
+put and get block by default, with a timeout they raise Full / Empty (the exceptions of the queue module) when it runs
+out, with block=False they raise them right away. close() ends a run: put raises Closed from then on, get returns the
+items still queued and then raises Closed, waking every thread which waits.
+"""
+import threading
+import time
+from collections import deque
+from queue import Empty, Full
+from typing import Any, Deque, Optional
+
+
+class Closed(Exception):
+    pass
+
+
+class BoundedQueue:
+    def __init__(self, maxsize: int):
+        if maxsize <= 0:
+            raise ValueError(f'maxsize must be positive, got {maxsize}')
+        self.maxsize = maxsize
+        self.items: Deque[Any] = deque()
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.closed = False
+
+    @staticmethod
+    def _wait(condition: threading.Condition, deadline: Optional[float]) -> bool:
+        """
+        Wait on the condition until notified or the deadline, return False if the deadline has passed.
+        """
+        if deadline is None:
+            condition.wait()
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        condition.wait(remaining)
+        return True
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None):
+        if timeout is not None and timeout < 0:
+            raise ValueError('timeout must be a non-negative number')
+        deadline = time.monotonic() + timeout if block and timeout is not None else None
+        with self.not_full:
+            while True:
+                if self.closed:
+                    raise Closed
+                if len(self.items) < self.maxsize:
+                    break
+                if not block or not self._wait(self.not_full, deadline):
+                    raise Full
+            self.items.append(item)
+            self.not_empty.notify()
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        if timeout is not None and timeout < 0:
+            raise ValueError('timeout must be a non-negative number')
+        deadline = time.monotonic() + timeout if block and timeout is not None else None
+        with self.not_empty:
+            while not self.items:
+                if self.closed:
+                    raise Closed
+                if not block or not self._wait(self.not_empty, deadline):
+                    raise Empty
+            item = self.items.popleft()
+            self.not_full.notify()
+            return item
+
+    def put_nowait(self, item: Any):
+        self.put(item, block=False)
+
+    def get_nowait(self) -> Any:
+        return self.get(block=False)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+
+    def qsize(self) -> int:
+        with self.lock:
+            return len(self.items)
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def full(self) -> bool:
+        return self.qsize() >= self.maxsize
@@ -1,62 +1,64 @@
+"""
+Publisher and subscriber threads sharing a BoundedQueue.
+
+Run it from the repository root with:
+python -m publisher-consumer.publisher_consumer
+"""
 import threading
 import random
 import time
 
-# This is not really a publisher / consumer that we are used to as whichever thread aquires the condition receives the
-# integer but it is a good example on how condition notifies threads.
+from tracing.trace_sink import enable_tracing, get_tracer
+
+try:
+    from .bounded_queue import BoundedQueue
+except ImportError:
+    # Run as a script there is no parent package, but the directory of the script is on the path.
+    from bounded_queue import BoundedQueue
+
+tracer = get_tracer(__name__)
+
+# The publisher and the subscribers share a BoundedQueue: the subscribers take the integers in the order they were
+# published, and a publisher faster than the subscribers blocks on the full queue instead of growing it without limit.
+QUEUE_SIZE = 10
 
 
 class Publisher(threading.Thread):
-    def __init__(self, integers, condition):
-        self.condition = condition
+    def __init__(self, integers: BoundedQueue):
         self.integers = integers
         super().__init__()
 
     def run(self):
         while True:
             integer = random.randint(0, 1000)
-            self.condition.acquire()
-            print(f'Condition acquired by publisher: {self.name}')
-            self.integers.append(integer)
-            print(f'Publisher {self.name} appending to array: {integer}')
-            self.condition.notify()
-            print(f'Condition released by publisher: {self.name}')
-            self.condition.release()
+            tracer.debug('Publisher %s putting to queue: %s', self.name, integer)
+            self.integers.put(integer)
+            tracer.debug('Publisher %s put to queue: %s', self.name, integer)
             time.sleep(1)
 
 
 class Subscriber(threading.Thread):
-    def __init__(self, integers, condition):
+    def __init__(self, integers: BoundedQueue):
         self.integers = integers
-        self.condition = condition
         super().__init__()
 
     def run(self):
         while True:
-            self.condition.acquire()
-            print(f'Condition acquired by consumer: {self.name}')
-            while True:
-                if self.integers:
-                    integer = self.integers.pop()
-                    print(f'{integer} popped from list by consumer {self.name}')
-                    break
-                print(f'Condition wait by {self.name}')
-                self.condition.wait()
-            print(f'Consumer {self.name} releasing condition')
-            self.condition.release()
+            tracer.debug('Consumer %s waiting for an integer', self.name)
+            integer = self.integers.get()
+            tracer.debug('%s taken from queue by consumer %s', integer, self.name)
 
 
 def main():
-    integers = []
-    condition = threading.Condition()
+    integers = BoundedQueue(maxsize=QUEUE_SIZE)
 
     #     publisher
-    publisher = Publisher(integers, condition)
+    publisher = Publisher(integers)
     publisher.start()
 
     #     Subscribers
-    subsriber_1 = Subscriber(integers, condition)
-    subsriber_2 = Subscriber(integers, condition)
+    subsriber_1 = Subscriber(integers)
+    subsriber_2 = Subscriber(integers)
     subsriber_1.start()
     subsriber_2.start()
 
@@ -66,4 +68,5 @@ def main():
 
 
 if __name__ == '__main__':
+    enable_tracing()
     main()
@@ -0,0 +1,164 @@
+"""
+Throughput benchmark of the queues between producer and consumer threads.
+
+Every run moves the same number of integers from the producer threads to the consumer threads through one of:
+
+- bounded_queue - BoundedQueue, the queue of publisher_consumer.py.
+- queue - queue.Queue of the standard library with the same maxsize.
+- deque - a bare collections.deque: append and popleft are atomic, so it needs no lock, but it is unbounded and the
+consumers have to poll it (yielding the GIL with sleep(0) while it is empty). This is the upper bound of what a queue
+without blocking and backpressure costs.
+
+For every queue and number of producers / consumers we report the best time out of the repeats and the items per
+second.
+
+Run it with:
+python publisher-consumer/queue_benchmark.py --items 200000 --threads 1 2 4
+"""
+import argparse
+import math
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+try:
+    from .bounded_queue import BoundedQueue
+except ImportError:
+    # Run as a script there is no parent package, but the directory of the script is on the path.
+    from bounded_queue import BoundedQueue
+
+BOUNDED_QUEUE = 'bounded_queue'
+QUEUE = 'queue'
+DEQUE = 'deque'
+BACKENDS = (BOUNDED_QUEUE, QUEUE, DEQUE)
+
+# Put once per consumer after all the items, tells it to stop.
+STOP = object()
+
+
+class PollingDeque:
+    """
+    The put / get interface over a bare deque, get spins until an item is there.
+    """
+    def __init__(self, maxsize: int):
+        # Unbounded, maxsize is only taken for the same interface as the other queues.
+        self.items = deque()
+
+    def put(self, item: Any):
+        self.items.append(item)
+
+    def get(self) -> Any:
+        while True:
+            try:
+                return self.items.popleft()
+            except IndexError:
+                time.sleep(0)
+
+
+QUEUE_FACTORIES: Dict[str, Callable[[int], Any]] = {
+    BOUNDED_QUEUE: BoundedQueue,
+    QUEUE: queue.Queue,
+    DEQUE: PollingDeque,
+}
+
+
+@dataclass
+class BenchmarkResult:
+    backend: str
+    producers: int
+    consumers: int
+    items: int
+    elapsed: float
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+
+def run(backend: str, producers: int, consumers: int, items: int, maxsize: int) -> int:
+    """
+    Move items integers from the producers to the consumers, return how many the consumers got.
+    """
+    channel = QUEUE_FACTORIES[backend](maxsize)
+    received = [0] * consumers
+
+    def produce(count: int):
+        for integer in range(count):
+            channel.put(integer)
+
+    def consume(index: int):
+        count = 0
+        while channel.get() is not STOP:
+            count += 1
+        received[index] = count
+
+    # The first producers take the remainder.
+    counts = [items // producers + (index < items % producers) for index in range(producers)]
+    producer_threads = [threading.Thread(target=produce, args=(count,)) for count in counts]
+    consumer_threads = [threading.Thread(target=consume, args=(index,)) for index in range(consumers)]
+    for thread in producer_threads + consumer_threads:
+        thread.start()
+    for thread in producer_threads:
+        thread.join()
+    for _ in range(consumers):
+        channel.put(STOP)
+    for thread in consumer_threads:
+        thread.join()
+    return sum(received)
+
+
+def measure(backend: str, producers: int, consumers: int, items: int, maxsize: int, repeats: int) -> BenchmarkResult:
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        received = run(backend, producers, consumers, items, maxsize)
+        best = min(best, time.perf_counter() - start)
+        if received != items:
+            raise RuntimeError(f'{backend} lost items: {items} sent, {received} received')
+    return BenchmarkResult(backend=backend, producers=producers, consumers=consumers, items=items, elapsed=best)
+
+
+def format_result(result: BenchmarkResult) -> str:
+    return (
+        f'{result.backend:<16}{result.producers:>10}{result.consumers:>10}{result.elapsed:>12.3f}'
+        f'{result.items_per_second:>14.0f}'
+    )
+
+
+HEADER = f'{"queue":<16}{"producers":>10}{"consumers":>10}{"time [s]":>12}{"items/s":>14}'
+
+
+def main(arguments: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Compare the throughput of the queues between threads.')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--threads', nargs='+', type=int, default=[1, 2, 4], help='Producers and consumers each.')
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--maxsize', type=int, default=1000)
+    parser.add_argument('--repeats', type=int, default=3, help='The best time out of the repeats is reported.')
+    parsed_arguments = parser.parse_args(arguments)
+
+    results: List[BenchmarkResult] = []
+    for threads in parsed_arguments.threads:
+        for backend in parsed_arguments.backends:
+            results.append(
+                measure(
+                    backend,
+                    producers=threads,
+                    consumers=threads,
+                    items=parsed_arguments.items,
+                    maxsize=parsed_arguments.maxsize,
+                    repeats=parsed_arguments.repeats,
+                )
+            )
+
+    print(f'{parsed_arguments.items} items, maxsize {parsed_arguments.maxsize}')
+    print(HEADER)
+    for result in results:
+        print(format_result(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import importlib
+import threading
+import time
+
+import pytest
+
+bounded_queue = importlib.import_module('publisher-consumer.bounded_queue')
+queue_benchmark = importlib.import_module('publisher-consumer.queue_benchmark')
+
+BoundedQueue = bounded_queue.BoundedQueue
+
+
+class TestBoundedQueue:
+    def test_fifo(self):
+        integers = BoundedQueue(maxsize=5)
+        for integer in range(5):
+            integers.put(integer)
+
+        assert integers.full()
+        assert [integers.get() for _ in range(5)] == [0, 1, 2, 3, 4]
+        assert integers.empty()
+
+    def test_invalid_maxsize(self):
+        with pytest.raises(ValueError):
+            BoundedQueue(maxsize=0)
+
+    def test_non_blocking(self):
+        integers = BoundedQueue(maxsize=1)
+
+        with pytest.raises(bounded_queue.Empty):
+            integers.get_nowait()
+        integers.put_nowait(1)
+        with pytest.raises(bounded_queue.Full):
+            integers.put_nowait(2)
+        assert integers.get_nowait() == 1
+
+    def test_timeouts(self):
+        integers = BoundedQueue(maxsize=1)
+
+        start = time.monotonic()
+        with pytest.raises(bounded_queue.Empty):
+            integers.get(timeout=0.05)
+        integers.put(1)
+        with pytest.raises(bounded_queue.Full):
+            integers.put(2, timeout=0.05)
+        assert time.monotonic() - start >= 0.1
+
+        with pytest.raises(ValueError):
+            integers.get(timeout=-1)
+
+    def test_backpressure(self):
+        integers = BoundedQueue(maxsize=2)
+        published = []
+
+        def publish():
+            for integer in range(10):
+                integers.put(integer)
+                published.append(integer)
+
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        time.sleep(0.05)
+
+        # The publisher waits for room instead of queueing everything.
+        assert len(published) == 2
+        assert [integers.get(timeout=1) for _ in range(10)] == list(range(10))
+        publisher.join(timeout=1)
+        assert published == list(range(10))
+
+    def test_blocked_get_is_woken_by_put(self):
+        integers = BoundedQueue(maxsize=1)
+        taken = []
+        subscriber = threading.Thread(target=lambda: taken.append(integers.get(timeout=5)))
+        subscriber.start()
+        time.sleep(0.02)
+
+        integers.put(7)
+        subscriber.join(timeout=1)
+
+        assert taken == [7]
+
+    def test_close(self):
+        integers = BoundedQueue(maxsize=2)
+        integers.put(1)
+        errors = []
+
+        def subscribe():
+            try:
+                while True:
+                    integers.get()
+            except bounded_queue.Closed as error:
+                errors.append(error)
+
+        subscribers = [threading.Thread(target=subscribe) for _ in range(3)]
+        for subscriber in subscribers:
+            subscriber.start()
+        time.sleep(0.02)
+        integers.close()
+        for subscriber in subscribers:
+            subscriber.join(timeout=1)
+
+        assert len(errors) == 3
+        with pytest.raises(bounded_queue.Closed):
+            integers.put(2)
+
+    def test_close_returns_the_queued_items_first(self):
+        integers = BoundedQueue(maxsize=2)
+        integers.put(1)
+        integers.close()
+
+        assert integers.get() == 1
+        with pytest.raises(bounded_queue.Closed):
+            integers.get()
+
+    def test_many_producers_and_consumers(self):
+        integers = BoundedQueue(maxsize=8)
+        received = []
+        lock = threading.Lock()
+
+        def produce(start):
+            for integer in range(start, start + 1000):
+                integers.put(integer)
+
+        def consume():
+            while True:
+                try:
+                    integer = integers.get()
+                except bounded_queue.Closed:
+                    return
+                with lock:
+                    received.append(integer)
+
+        producers = [threading.Thread(target=produce, args=(start,)) for start in range(0, 4000, 1000)]
+        consumers = [threading.Thread(target=consume) for _ in range(4)]
+        for thread in producers + consumers:
+            thread.start()
+        for thread in producers:
+            thread.join()
+        integers.close()
+        for thread in consumers:
+            thread.join()
+
+        assert sorted(received) == list(range(4000))
+
+
+class TestQueueBenchmark:
+    @pytest.mark.parametrize('backend', queue_benchmark.BACKENDS)
+    def test_every_item_arrives(self, backend):
+        assert queue_benchmark.run(backend, producers=3, consumers=2, items=1001, maxsize=4) == 1001
+
+    def test_measure(self):
+        result = queue_benchmark.measure(
+            queue_benchmark.BOUNDED_QUEUE, producers=2, consumers=2, items=1000, maxsize=10, repeats=1
+        )
+
+        assert result.items == 1000
+        assert result.items_per_second > 0
+
+    def test_main(self, capsys):
+        queue_benchmark.main(['--items', '1000', '--threads', '1', '--repeats', '1'])
+
+        output = capsys.readouterr().out
+        assert all(backend in output for backend in queue_benchmark.BACKENDS)
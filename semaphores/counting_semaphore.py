@@ -18,18 +18,24 @@
 # This will allow for our threads to attempt to acquire the semaphore and sell the tickets.
 # Each thread will try to sell as many tickets as possible
 # Until they are sold out.
-import copy
+
+# Run it from the repository root with:
+# python -m semaphores.counting_semaphore
 import threading
 import time
 import random
 
+from tracing.trace_sink import enable_tracing, get_tracer
+
+tracer = get_tracer(__name__)
+
 
 class TicketSeller(threading.Thread):
     def __init__(self, semaphore, name: str = None):
         super().__init__(name=name)
         self.semaphore = semaphore
         self.tickets_sold = 0
-        print(f'Ticket Seller {name} started work\n')
+        tracer.debug('Ticket Seller %s started work', name)
 
     def run(self):
         global tickets_available
@@ -44,33 +50,38 @@ class TicketSeller(threading.Thread):
             else:
                 self.tickets_sold += 1
                 tickets_available -= 1
-                print(f'{self.getName()} sold one ticket, ({tickets_available} left)\n')
+                tracer.debug('%s sold one ticket, (%s left)', self.name, tickets_available)
             self.semaphore.release()
-        print(f'{self.getName()} sold {self.tickets_sold} tickets in total\n')
+        tracer.info('%s sold %s tickets in total', self.name, self.tickets_sold)
 
     @staticmethod
     def random_delay():
         time.sleep(random.randint(0, 4) / 4)
 
 
-semaphore = threading.Semaphore()
+def main():
+    global tickets_available
+
+    semaphore = threading.Semaphore()
+
+    tickets_available = 2000
 
-tickets_available = 2000
-# tickets_available_total = copy.deepcopy(tickets_available)
+    number_of_sellers = 2000
 
-number_of_sellers = 2000
+    sellers = []
+    for i in range(number_of_sellers):
+        seller = TicketSeller(semaphore=semaphore, name=f'seller {i+1}')
+        seller.start()
+        sellers.append(seller)
 
-sellers = []
-for i in range(number_of_sellers):
-    seller = TicketSeller(semaphore=semaphore, name=f'seller {i+1}')
-    seller.start()
-    sellers.append(seller)
+    for seller in sellers:
+        seller.join()
 
+    tickets_sold = sum([seller.tickets_sold for seller in sellers])
 
-for seller in sellers:
-    seller.join()
+    print(f'total number of tickets sold is: {tickets_sold}')
 
-tickets_sold = sum([seller.tickets_sold for seller in sellers])
 
-print(f'total number of tickets sold is: {tickets_sold}')
-# assert tickets_sold == tickets_available_total
+if __name__ == '__main__':
+    enable_tracing()
+    main()
@@ -0,0 +1,51 @@
+"""
+Local HTTP server for the tests, serving from a background thread on a free port of the loopback interface.
+"""
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Type, TypeVar
+
+
+class QuietRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connections alive between requests.
+    protocol_version = 'HTTP/1.1'
+    # The headers and the body are written separately, without this every response waits for a delayed ACK.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler_class: Type[BaseHTTPRequestHandler]):
+        super().__init__(('127.0.0.1', 0), handler_class)
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients giving up on stalled or broken responses are part of the tests, not an error.
+        pass
+
+    def url(self, path: str) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}{path}'
+
+
+Server = TypeVar('Server', bound=LocalHTTPServer)
+
+
+@contextmanager
+def serving(server: Server) -> Iterator[Server]:
+    """
+    Serve requests in a background thread until the block exits, then shut the server down and close it.
+    """
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -0,0 +1,46 @@
+import io
+
+from tracing.trace_sink import disable_tracing, dropped_records, enable_tracing, get_tracer
+
+
+class TestTraceSink:
+    def test_disabled_tracing_does_not_format_messages(self):
+        class ExplodingArgument:
+            def __str__(self):
+                raise AssertionError('Disabled traces must not be formatted')
+
+        get_tracer('test').debug('Value: %s', ExplodingArgument())
+
+    def test_writes_traces_from_background_thread(self):
+        stream = io.StringIO()
+        tracer = get_tracer('test')
+
+        enable_tracing(stream=stream)
+        tracer.debug('Added observer: %s', 'test_name')
+        tracer.info('Total: %s', 5)
+        disable_tracing()
+
+        assert stream.getvalue().splitlines() == ['Added observer: test_name', 'Total: 5']
+
+    def test_respects_level(self):
+        stream = io.StringIO()
+        tracer = get_tracer('test')
+
+        enable_tracing(level=20, stream=stream)
+        tracer.debug('hidden')
+        tracer.info('shown')
+        disable_tracing()
+
+        assert stream.getvalue().splitlines() == ['shown']
+
+    def test_drops_records_instead_of_blocking_when_queue_is_full(self):
+        stream = io.StringIO()
+        tracer = get_tracer('test')
+        number_of_records = 10000
+
+        enable_tracing(stream=stream, max_queued_records=1)
+        for i in range(number_of_records):
+            tracer.debug('Record %s', i)
+        disable_tracing()
+
+        assert len(stream.getvalue().splitlines()) + dropped_records() == number_of_records
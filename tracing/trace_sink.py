@@ -0,0 +1,146 @@
+"""
+Shared trace sink for the hot paths of the examples.
+
+Calling print() for every operation takes the stdout lock and writes to the terminal in the calling thread, which
+quickly dominates the runtime of anything running under load. Instead the examples emit their traces through loggers
+returned by get_tracer():
+
+- The messages are formatted lazily, tracer.debug('Added observer: %s', name) only builds the string if tracing is
+enabled for that level, so disabled tracing costs a single level check.
+- When tracing is enabled the calling thread only puts the record on a bounded queue and a background writer thread
+formats and writes it. If the writer falls behind the queue fills up and new records are dropped (and counted) instead
+of blocking the traced thread.
+
+Tracing is disabled until enable_tracing() is called, the examples enable it in their __main__ blocks.
+Forked child processes get their own writer thread, processes started with spawn begin with tracing disabled.
+"""
+import atexit
+import logging
+import multiprocessing.util
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from threading import Lock
+from typing import Optional, TextIO, Tuple
+
+TRACE_LOGGER_NAME = 'concurrency_course'
+DEFAULT_MAX_QUEUED_RECORDS = 10000
+
+_root_tracer = logging.getLogger(TRACE_LOGGER_NAME)
+_root_tracer.addHandler(logging.NullHandler())
+_root_tracer.propagate = False
+_root_tracer.setLevel(logging.CRITICAL + 1)
+
+_state_lock = Lock()
+_queue_handler: Optional['NonBlockingQueueHandler'] = None
+_listener: Optional['DrainingQueueListener'] = None
+_settings: Optional[Tuple[int, TextIO, int]] = None
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, record_queue: queue.Queue):
+        super().__init__(record_queue)
+        self.dropped_records = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Leave formatting to the writer thread, the record is passed between threads of the same process as it is.
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped_records += 1
+
+
+class DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Block instead of failing when the queue is full, the writer thread is still draining it.
+        self.queue.put(self._sentinel)
+
+
+def get_tracer(name: str) -> logging.Logger:
+    return _root_tracer.getChild(name)
+
+
+def enable_tracing(
+    level: int = logging.DEBUG,
+    stream: Optional[TextIO] = None,
+    max_queued_records: int = DEFAULT_MAX_QUEUED_RECORDS,
+):
+    """
+    Start writing traces of the given level and above to the stream (stdout by default) from a background thread.
+    """
+    with _state_lock:
+        _stop_writer()
+        stream = stream if stream is not None else sys.stdout
+        _start_writer(level=level, stream=stream, max_queued_records=max_queued_records)
+
+
+def disable_tracing():
+    """
+    Stop tracing, the records queued so far are written out before this returns.
+    """
+    global _settings
+
+    with _state_lock:
+        _root_tracer.setLevel(logging.CRITICAL + 1)
+        _stop_writer()
+        _settings = None
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped_records if _queue_handler is not None else 0
+
+
+def _start_writer(level: int, stream: TextIO, max_queued_records: int):
+    global _queue_handler, _listener, _settings
+
+    record_queue = queue.Queue(maxsize=max_queued_records)
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(logging.Formatter('%(message)s'))
+    _queue_handler = NonBlockingQueueHandler(record_queue)
+    _listener = DrainingQueueListener(record_queue, stream_handler)
+    _listener.start()
+    _root_tracer.addHandler(_queue_handler)
+    _root_tracer.setLevel(level)
+    _settings = (level, stream, max_queued_records)
+
+
+def _stop_writer():
+    global _listener
+
+    if _listener is None:
+        return
+    _root_tracer.removeHandler(_queue_handler)
+    # Stopping the listener waits for the writer thread to drain the queue.
+    _listener.stop()
+    _listener = None
+
+
+def _restart_writer_in_child():
+    """
+    The writer thread does not survive a fork, so a forked child would only fill up the inherited queue.
+    """
+    global _state_lock, _listener
+
+    _state_lock = Lock()
+    if _listener is None:
+        return
+    _root_tracer.removeHandler(_queue_handler)
+    _listener = None
+    level, stream, max_queued_records = _settings
+    _start_writer(level=level, stream=stream, max_queued_records=max_queued_records)
+
+
+def _flush_at_child_process_exit(_):
+    # multiprocessing children leave with os._exit() and skip atexit, but they do run the multiprocessing finalizers.
+    if _listener is not None:
+        multiprocessing.util.Finalize(None, disable_tracing, exitpriority=0)
+
+
+atexit.register(disable_tracing)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_writer_in_child)
+multiprocessing.util.register_after_fork(_root_tracer, _flush_at_child_process_exit)